@@ -0,0 +1,108 @@
+"""Vectorized report aggregation against a pure-Python baseline.
+
+Builds a synthetic fleet of 1 Hz series and computes hourly means, hourly
+p95 and per-host counter rates both with :mod:`sysmaint.reporting.aggregate`
+and with a per-sample Python loop, checks the results agree and reports
+samples per second for each.
+
+    python -m benchmarks.aggregate [--hosts N] [--samples N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from sysmaint.reporting.aggregate import aggregate
+
+
+def make_fleet(hosts: int, samples: int, seed: int = 0) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000.0 + np.arange(samples, dtype=float)
+    fleet = {}
+    for i in range(hosts):
+        values = np.cumsum(rng.integers(0, 1000, samples)).astype(float)
+        values[rng.random(samples) < 0.001] = np.nan
+        fleet[f"host{i:04d}"] = ts, values
+    return fleet
+
+
+def _python_bucket(ts, values, width, reducer):
+    buckets: dict[float, list[float]] = {}
+    for t, v in zip(ts, values):
+        if v == v:
+            buckets.setdefault(math.floor(t / width) * width, []).append(v)
+    out = {}
+    for key, vals in buckets.items():
+        if reducer == "mean":
+            out[key] = sum(vals) / len(vals)
+        else:
+            vals.sort()
+            pos = 0.95 * (len(vals) - 1)
+            lo = int(pos)
+            hi = min(lo + 1, len(vals) - 1)
+            out[key] = vals[lo] + (vals[hi] - vals[lo]) * (pos - lo)
+    return out
+
+
+def _python_rate(ts, values):
+    out = []
+    for i in range(1, len(values)):
+        dv, dt = values[i] - values[i - 1], ts[i] - ts[i - 1]
+        out.append(dv / dt if dv >= 0 and dt > 0 else math.nan)
+    return out
+
+
+def _python_baseline(fleet):
+    for ts, values in fleet.values():
+        ts_list, value_list = ts.tolist(), values.tolist()
+        _python_bucket(ts_list, value_list, 3600, "mean")
+        _python_bucket(ts_list, value_list, 3600, "p95")
+        _python_rate(ts_list, value_list)
+
+
+def _vectorized(fleet):
+    aggregate(fleet, bucket=3600, reducer="mean")
+    aggregate(fleet, bucket=3600, reducer="p95")
+    aggregate(fleet, bucket=None, reducer="mean", transform="rate")
+
+
+def run(hosts: int = 20, samples: int = 100_000) -> dict[str, float]:
+    fleet = make_fleet(hosts, samples)
+    total = hosts * samples
+
+    ts, values = next(iter(fleet.values()))
+    expected = _python_bucket(ts.tolist(), values.tolist(), 3600, "p95")
+    keys, got = aggregate({"h": (ts, values)}, bucket=3600, reducer="p95")["h"]
+    assert np.allclose(got, [expected[k] for k in keys.tolist()])
+
+    t0 = time.perf_counter()
+    _vectorized(fleet)
+    numpy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _python_baseline(fleet)
+    python_s = time.perf_counter() - t0
+
+    return {
+        "samples": total,
+        "numpy_samples_per_sec": total / numpy_s,
+        "python_samples_per_sec": total / python_s,
+        "speedup": python_s / numpy_s,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=100_000)
+    args = parser.parse_args(argv)
+    for key, value in run(args.hosts, args.samples).items():
+        print(f"{key:24} {value:,.1f}" if isinstance(value, float) else f"{key:24} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Evaluation cost of :class:`AlertEngine` for a fleet-sized rule set.
+
+Builds ``--rules`` rules (``rate()`` for the counter metrics, most with a
+"for" window) over ``--metrics`` metrics and evaluates ``--hosts`` hosts per
+tick.  Each host holds a steady level per metric with some noise and thresholds
+sit near the edges of the range, so a few percent of checks are true and
+few change state per tick, as on a healthy fleet.
+
+    python -m benchmarks.alerts [--hosts 500] [--metrics 200] [--rules 2000] [--ticks 30]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from sysmaint.monitoring.alerts import AlertEngine
+
+
+def run(hosts: int = 500, metrics: int = 200, rules: int = 2000, ticks: int = 30, seed: int = 0) -> dict[str, float]:
+    rng = np.random.default_rng(seed)
+    names = [f"m{i}" for i in range(metrics)]
+    texts = []
+    for i in range(rules):
+        metric = names[i % metrics]
+        expr = f"rate({metric})" if i % metrics % 3 == 0 else metric
+        op = ">" if i % 2 else "<"
+        threshold = 97 if op == ">" else 3
+        texts.append(f"{expr} {op} {threshold} for {(i % 4) * 60}s")
+    engine = AlertEngine(texts, names)
+    host_names = [f"host{i:04d}" for i in range(hosts)]
+    # Each host hovers around its own level per metric, with a little noise.
+    levels = rng.uniform(0, 100, (hosts, metrics))
+    counters = np.zeros((hosts, metrics))
+    events = 0
+    elapsed = 0.0
+    for tick in range(ticks):
+        gauges = levels + rng.normal(0, 1, (hosts, metrics))
+        counters += 10 * (levels + rng.normal(0, 1, (hosts, metrics))).clip(0)
+        values = np.where(np.arange(metrics) % 3 == 0, counters, gauges)
+        started = time.perf_counter()
+        events += len(engine.evaluate(tick * 10.0, host_names, values))
+        elapsed += time.perf_counter() - started
+    checks = len(engine) * hosts
+    return {
+        "checks_per_tick": checks,
+        "ms_per_tick": elapsed / ticks * 1000,
+        "checks_per_sec": checks * ticks / elapsed,
+        "events_per_tick": events / ticks,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--metrics", type=int, default=200)
+    parser.add_argument("--rules", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=30)
+    args = parser.parse_args(argv)
+    for key, value in run(args.hosts, args.metrics, args.rules, args.ticks).items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Disk health collection: smartctl per disk in turn versus on a pool with a cache.
+
+Builds a fake ``smartctl`` for ``--disks`` disks (see
+:func:`benchmarks.fixtures.make_smartctl`) whose every call takes
+``--delay`` seconds, the time a real one spends waking and querying a
+drive.  Health of all disks is read once with one worker, as a sequential
+check loop would, and once with ``--workers``; a second pooled read within
+the TTL is answered from the cache.  ``statvfs`` of every local mount is
+timed for comparison.
+
+    python -m benchmarks.disks [--disks 24] [--delay 0.5] [--workers 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_smartctl
+from sysmaint.monitoring.disks import DiskHealth, FilesystemStats
+
+
+def _timed(health: DiskHealth) -> tuple[float, int]:
+    started = time.perf_counter()
+    metrics = health.collect()
+    return time.perf_counter() - started, len(metrics)
+
+
+def run(disks: int = 24, delay: float = 0.5, workers: int = 8, fixtures: str | None = None) -> dict[str, float]:
+    root = make_smartctl(
+        fixtures or os.path.join(tempfile.gettempdir(), "sysmaint-bench", "smartctl"), disks=disks, delay=delay
+    )
+    options = {"smartctl": os.path.join(root, "bin", "smartctl"), "sysfs": os.path.join(root, "sys")}
+    with DiskHealth(workers=1, **options) as health:
+        sequential, metrics = _timed(health)
+    with DiskHealth(workers=workers, **options) as health:
+        pooled, _ = _timed(health)
+        cached, _ = _timed(health)
+        calls = health.calls
+    filesystems = FilesystemStats()
+    started = time.perf_counter()
+    mounts = len(filesystems.collect()) // 5
+    statvfs = time.perf_counter() - started
+    return {
+        "disks": disks,
+        "metrics": metrics,
+        "sequential_s": sequential,
+        "pooled_s": pooled,
+        "cached_ms": cached * 1000,
+        "smartctl_calls": calls,
+        "speedup": sequential / pooled,
+        "mounts": mounts,
+        "statvfs_all_ms": statvfs * 1000,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--disks", type=int, default=24)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--fixtures", help="directory for the fake smartctl (default: a temp dir, reused)")
+    args = parser.parse_args(argv)
+    result = run(args.disks, args.delay, args.workers, args.fixtures)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
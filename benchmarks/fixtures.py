@@ -0,0 +1,317 @@
+"""Synthetic inputs for the benchmarks: a file tree, a /proc, a store, disks and logs.
+
+Every builder writes into a directory it is given and leaves a small
+``.fixture.json`` there describing what it built, so a second run with the
+same parameters reuses the existing fixture instead of rebuilding it (a
+million-file tree takes a while to create).  Contents are derived from a
+seed, so two machines building the same fixture get the same data.
+
+* :func:`make_tree` creates empty sparse files of log-uniform sizes and
+  modification times spread over the last ``max_age_days``, a hundred files
+  per directory under two levels of directories.
+* :func:`make_proc` writes ``stat``, ``meminfo``, ``diskstats``, ``net/dev``
+  and per-process ``stat``/``io``/``statm`` files in the kernel's formats,
+  for :class:`ProcCollector` and :class:`ProcessSampler` to read with
+  ``root=``.
+* :func:`make_series` fills one :class:`SeriesStore` per host with days of
+  samples: counters, gauges and constants.
+* :func:`make_smartctl` writes a fake ``smartctl`` that answers ``--json -a``
+  for ATA and NVMe disks after a delay, and a ``sys/block`` listing those
+  disks, for :class:`DiskHealth` to use with ``smartctl=`` and ``sysfs=``.
+* :func:`make_syslog` writes a syslog-format file of mostly routine
+  messages with a small share of errors and warnings.
+
+    python -m benchmarks.fixtures tree /tmp/tree --files 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from typing import Any
+
+__all__ = ["make_proc", "make_series", "make_smartctl", "make_syslog", "make_tree"]
+
+_MARKER = ".fixture.json"
+
+
+def _reuse(root: str, params: dict[str, Any]) -> bool:
+    """True if ``root`` already holds this fixture; otherwise clear it."""
+    try:
+        with open(os.path.join(root, _MARKER)) as f:
+            if json.load(f) == params:
+                return True
+    except (OSError, ValueError):
+        pass
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+    return False
+
+
+def _done(root: str, params: dict[str, Any]) -> None:
+    with open(os.path.join(root, _MARKER), "w") as f:
+        json.dump(params, f, sort_keys=True)
+
+
+def make_tree(
+    root: str, files: int = 1_000_000, *, per_dir: int = 100, max_age_days: float = 90.0, seed: int = 0
+) -> str:
+    """A tree of ``files`` sparse files under ``root``; returns ``root``."""
+    params = {"kind": "tree", "files": files, "per_dir": per_dir, "max_age_days": max_age_days, "seed": seed}
+    if _reuse(root, params):
+        return root
+    rng = random.Random(seed)
+    now = time.time()
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC
+    dirs = -(-files // per_dir)
+    made = 0
+    for d in range(dirs):
+        directory = os.path.join(root, f"a{d // 100:04d}", f"b{d % 100:02d}")
+        os.makedirs(directory, exist_ok=True)
+        for f in range(min(per_dir, files - made)):
+            fd = os.open(os.path.join(directory, f"f{f:03d}.dat"), flags, 0o644)
+            try:
+                os.ftruncate(fd, int(2 ** rng.uniform(0, 24)))
+                mtime = now - rng.uniform(0, max_age_days * 86400)
+                os.utime(fd, (mtime, mtime))
+            finally:
+                os.close(fd)
+        made += min(per_dir, files - made)
+    _done(root, params)
+    return root
+
+
+def make_proc(
+    root: str, *, cpus: int = 16, disks: int = 8, nics: int = 4, processes: int = 500, seed: int = 0
+) -> str:
+    """A procfs-shaped directory under ``root``; returns ``root``."""
+    params = {"kind": "proc", "cpus": cpus, "disks": disks, "nics": nics, "processes": processes, "seed": seed}
+    if _reuse(root, params):
+        return root
+    rng = random.Random(seed)
+
+    def write(name: str, text: str) -> None:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def cpu_line(name: str) -> str:
+        return f"{name} " + " ".join(str(rng.randrange(10**6, 10**8)) for _ in range(8)) + " 0 0\n"
+
+    write(
+        "stat",
+        cpu_line("cpu ")
+        + "".join(cpu_line(f"cpu{i}") for i in range(cpus))
+        + f"intr {rng.randrange(10**9)} 0 0\nctxt {rng.randrange(10**9)}\nbtime 1700000000\n"
+        + f"processes {rng.randrange(10**6)}\nprocs_running 3\nprocs_blocked 0\nsoftirq 0 0\n",
+    )
+    meminfo = (
+        *("MemTotal", "MemFree", "MemAvailable", "Buffers", "Cached", "SwapCached", "Active", "Inactive"),
+        *("Dirty", "Writeback", "SwapTotal", "SwapFree", "Slab", "PageTables"),
+    )
+    write("meminfo", "".join(f"{key + ':':<16}{rng.randrange(10**4, 10**8):>8} kB\n" for key in meminfo))
+    write(
+        "diskstats",
+        "".join(
+            f" 259 {i * 2:7d} {name} " + " ".join(str(rng.randrange(10**9)) for _ in range(17)) + "\n"
+            for i, name in enumerate([*(f"nvme{i}n1" for i in range(disks)), "loop0", "loop1"])
+        ),
+    )
+    write(
+        "net/dev",
+        "Inter-|   Receive                                                |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls "
+        "carrier compressed\n"
+        + "".join(
+            f"{name:>6}: " + " ".join(str(rng.randrange(10**10)) for _ in range(16)) + "\n"
+            for name in ["lo", *(f"eth{i}" for i in range(nics))]
+        ),
+    )
+    for pid in range(1, processes + 1):
+        fields = ["S", str(max(pid - 1, 1)), *(str(rng.randrange(10**6)) for _ in range(48))]
+        fields[17] = str(rng.randrange(1, 64))  # threads
+        fields[19] = str(rng.randrange(10**7))  # starttime
+        write(f"{pid}/stat", f"{pid} (proc-{pid % 50}) " + " ".join(fields) + "\n")
+        write(
+            f"{pid}/io",
+            "".join(
+                f"{key}: {rng.randrange(10**9)}\n"
+                for key in ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes", "cancelled_write_bytes")
+            ),
+        )
+        write(f"{pid}/statm", " ".join(str(rng.randrange(10**5)) for _ in range(7)) + "\n")
+    _done(root, params)
+    return root
+
+
+def make_series(
+    root: str, *, hosts: int = 2, days: int = 30, metrics: int = 20, interval: float = 10.0, seed: int = 0
+) -> dict[str, Any]:
+    """One store per host under ``root``, ending now; returns ``{host: SeriesStore}``.
+
+    The last day is left unsealed, as in a store that is still being written.
+    """
+    import numpy as np
+
+    from sysmaint.monitoring.store import SeriesStore
+
+    names = [f"host{h:03d}" for h in range(hosts)]
+    origin = time.time() // 86400 * 86400 - (days - 1) * 86400
+    params = {
+        "kind": "series",
+        "hosts": hosts,
+        "days": days,
+        "metrics": metrics,
+        "interval": interval,
+        "seed": seed,
+        "origin": origin,
+    }
+    if not _reuse(root, params):
+        rng = np.random.default_rng(seed)
+        for host in names:
+            with SeriesStore(os.path.join(root, host)) as store:
+                for day in range(days):
+                    ts = origin + day * 86400 + np.arange(0, 86400, interval)
+                    columns = {}
+                    for i in range(metrics):
+                        if i % 4 == 0:
+                            columns[f"m{i:03d}"] = np.cumsum(rng.integers(0, 10_000, ts.size)).astype(np.float64)
+                        elif i % 4 == 3:
+                            columns[f"m{i:03d}"] = np.full(ts.size, float(i))
+                        else:
+                            columns[f"m{i:03d}"] = np.round(rng.random(ts.size) * 100, 1)
+                    store.append_columns(ts, columns)
+        _done(root, params)
+    return {host: SeriesStore(os.path.join(root, host)) for host in names}
+
+
+_FAKE_SMARTCTL = """#!{python}
+import json, sys, time, zlib
+
+device = sys.argv[-1].rsplit("/", 1)[-1]
+if device not in {disks!r}:
+    print(json.dumps({{"smartctl": {{"exit_status": 2}}}}))
+    sys.exit(2)
+time.sleep({delay!r})
+n = zlib.crc32(device.encode()) + {seed!r}
+data = {{
+    "device": {{"name": sys.argv[-1]}},
+    "smart_status": {{"passed": n % 23 != 0}},
+    "temperature": {{"current": 30 + n % 25}},
+    "power_on_time": {{"hours": n % 50000}},
+}}
+if device.startswith("nvme"):
+    data["nvme_smart_health_information_log"] = {{
+        "critical_warning": int(n % 23 == 0),
+        "available_spare": 100 - n % 10,
+        "percentage_used": n % 40,
+        "media_errors": n % 7 // 6,
+        "num_err_log_entries": n % 100,
+        "unsafe_shutdowns": n % 30,
+    }}
+else:
+    data["ata_smart_attributes"] = {{"table": [
+        {{"id": i, "raw": {{"value": n % (i + 3) // (i + 2) * (n % 13)}}}} for i in (5, 9, 187, 188, 197, 198, 199)
+    ]}}
+print(json.dumps(data))
+sys.exit(4 if n % 23 == 0 else 0)
+"""
+
+
+def make_smartctl(root: str, *, disks: int = 24, nvme: int = 4, delay: float = 0.5, seed: int = 0) -> str:
+    """A fake ``bin/smartctl`` and ``sys/block`` for ``disks`` disks under ``root``; returns ``root``.
+
+    ``nvme`` of the disks are NVMe drives; every call sleeps ``delay`` seconds.
+    """
+    params = {"kind": "smartctl", "disks": disks, "nvme": nvme, "delay": delay, "seed": seed}
+    if _reuse(root, params):
+        return root
+    names = [f"nvme{i}n1" for i in range(nvme)]
+    names += [f"sd{chr(97 + i // 26) if i >= 26 else ''}{chr(97 + i % 26)}" for i in range(disks - nvme)]
+    for name in names:
+        os.makedirs(os.path.join(root, "sys", "block", name, "device"))
+    os.makedirs(os.path.join(root, "sys", "block", "loop0"))
+    os.makedirs(os.path.join(root, "bin"))
+    script = os.path.join(root, "bin", "smartctl")
+    with open(script, "w") as f:
+        f.write(_FAKE_SMARTCTL.format(python=sys.executable, disks=sorted(names), delay=delay, seed=seed))
+    os.chmod(script, 0o755)
+    _done(root, params)
+    return root
+
+
+_ROUTINE = (
+    "systemd[1]: Started Session {n} of user app.",
+    "CRON[{n}]: (root) CMD (command -v debian-sa1 > /dev/null && debian-sa1 1 1)",
+    "nginx[{n}]: 10.0.{a}.{b} - - \"GET /api/v1/items/{n} HTTP/1.1\" 200 {n} \"-\" \"curl/8.0\"",
+    "kernel: [{n}.{a}] eth0: link up, 10000Mbps, full-duplex",
+    "postgres[{n}]: LOG:  checkpoint complete: wrote {a} buffers ({b}.0%)",
+    "sshd[{n}]: Accepted publickey for deploy from 10.0.{a}.{b} port {n} ssh2",
+)
+_NOTABLE = (
+    "kernel: [{n}.{a}] Out of memory: Killed process {n} (java) total-vm:{n}kB",
+    "kernel: [{n}.{a}] blk_update_request: I/O error, dev sdb, sector {n}",
+    "sshd[{n}]: Failed password for invalid user admin from 10.0.{a}.{b} port {n} ssh2",
+    "systemd[1]: Failed to start Daily apt upgrade and clean activities.",
+    "app[{n}]: ERROR request {n} timed out after {a}ms",
+    "app[{n}]: WARNING slow query took {n}ms",
+)
+
+
+def make_syslog(root: str, *, lines: int = 2_000_000, notable: float = 0.002, seed: int = 0) -> str:
+    """A ``root/syslog`` of ``lines`` lines, a ``notable`` share of them errors or warnings; returns its path."""
+    params = {"kind": "syslog", "lines": lines, "notable": notable, "seed": seed}
+    path = os.path.join(root, "syslog")
+    if _reuse(root, params):
+        return path
+    rng = random.Random(seed)
+    start = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    with open(path, "w") as f:
+        batch = []
+        for i in range(lines):
+            stamp = time.strftime("%b %d %H:%M:%S", time.localtime(start + i * 0.05))
+            templates = _NOTABLE if rng.random() < notable else _ROUTINE
+            message = rng.choice(templates).format(n=rng.randrange(100000), a=rng.randrange(256), b=rng.randrange(256))
+            batch.append(f"{stamp} web01 {message}\n")
+            if len(batch) == 10000:
+                f.write("".join(batch))
+                batch.clear()
+        f.write("".join(batch))
+    _done(root, params)
+    return path
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=["tree", "proc", "series", "smartctl", "syslog"])
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--disks", type=int, default=24)
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.kind == "tree":
+        make_tree(args.root, args.files)
+    elif args.kind == "proc":
+        make_proc(args.root, processes=args.processes)
+    elif args.kind == "series":
+        make_series(args.root, hosts=args.hosts, days=args.days)
+    elif args.kind == "smartctl":
+        make_smartctl(args.root, disks=args.disks)
+    else:
+        make_syslog(args.root, lines=args.lines)
+    print(f"{args.kind} fixture in {args.root} ready after {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
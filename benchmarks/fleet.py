@@ -0,0 +1,83 @@
+"""Fleet-wide call latency: a connection per request versus pooled connections.
+
+Starts ``--hosts`` :class:`FakeAgent` servers on localhost whose connections
+pay ``--connect-ms`` of setup (standing in for an SSH handshake) and whose
+requests take ``--latency-ms``.  Each round calls ``collect`` on every host,
+once opening a fresh connection per host and request, and once through a
+:class:`Fleet` whose connections stay open between rounds.
+
+    python -m benchmarks.fleet [--hosts 200] [--rounds 5] [--connect-ms 50] [--latency-ms 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from sysmaint.fleet.agent import FakeAgent
+from sysmaint.fleet.client import AgentConnection, Fleet
+
+
+async def _run(hosts: int, rounds: int, connect_delay: float, latency: float, concurrency: int) -> dict[str, float]:
+    agents = [FakeAgent(f"host{i:04d}", latency=latency, connect_delay=connect_delay) for i in range(hosts)]
+    servers = [await agent.serve() for agent in agents]
+    ports = {agent.name: server.sockets[0].getsockname()[1] for agent, server in zip(agents, servers)}
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one_shot(name: str) -> object:
+        async with limit:
+            conn = AgentConnection.tcp(name, "127.0.0.1", ports[name])
+            try:
+                return await conn.call("collect")
+            finally:
+                await conn.close()
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(one_shot(name) for name in ports))
+    fresh = (time.perf_counter() - started) / rounds
+
+    fleet = Fleet((AgentConnection.tcp(name, "127.0.0.1", port) for name, port in ports.items()), concurrency=concurrency)
+    started = time.perf_counter()
+    await fleet.call("ping")
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results = await fleet.call("collect")
+    pooled = (time.perf_counter() - started) / rounds
+    failures = sum(isinstance(r, Exception) for r in results.values())
+    await fleet.close()
+    for server in servers:
+        server.close()
+    return {
+        "hosts": hosts,
+        "fresh_ms_per_round": fresh * 1000,
+        "pooled_first_round_ms": first * 1000,
+        "pooled_ms_per_round": pooled * 1000,
+        "speedup": fresh / pooled,
+        "failures": failures,
+    }
+
+
+def run(
+    hosts: int = 200, rounds: int = 5, connect_ms: float = 50.0, latency_ms: float = 2.0, concurrency: int = 64
+) -> dict[str, float]:
+    return asyncio.run(_run(hosts, rounds, connect_ms / 1000, latency_ms / 1000, concurrency))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--connect-ms", type=float, default=50.0)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args(argv)
+    result = run(args.hosts, args.rounds, args.connect_ms, args.latency_ms, args.concurrency)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Log scanning: decode and match every line versus the chunked prefilter.
+
+Writes a syslog file of ``--lines`` lines (see
+:func:`benchmarks.fixtures.make_syslog`) in which ``--notable`` of them are
+errors or warnings, then summarises it twice: once the straightforward way,
+reading it line by line and running every rule over every decoded line, and
+once with :class:`LogScanner`.  A second scanner run with the cursor file
+of the first shows the cost of a daily report when nothing was appended.
+
+    python -m benchmarks.logscan [--lines 2000000] [--notable 0.002]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from benchmarks.fixtures import make_syslog
+from sysmaint.reporting.logscan import DEFAULT_RULES, LogScanner
+
+
+def _naive(path: str) -> int:
+    rules = [(name, re.compile(pattern)) for name, pattern in DEFAULT_RULES.items()]
+    matches = 0
+    with open(path, errors="replace") as f:
+        for line in f:
+            for _, pattern in rules:
+                if pattern.search(line):
+                    matches += 1
+                    break
+    return matches
+
+
+def run(lines: int = 2_000_000, notable: float = 0.002, fixtures: str | None = None) -> dict[str, float]:
+    path = make_syslog(
+        fixtures or os.path.join(tempfile.gettempdir(), "sysmaint-bench", "syslog"), lines=lines, notable=notable
+    )
+    size = os.path.getsize(path)
+    started = time.perf_counter()
+    naive_matches = _naive(path)
+    naive = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        state = os.path.join(tmp, "cursor.json")
+        scanner = LogScanner(state=state)
+        started = time.perf_counter()
+        scanner.scan_file(path)
+        scanned = time.perf_counter() - started
+        scanner.save()
+        again = LogScanner(state=state)
+        started = time.perf_counter()
+        again.scan_file(path)
+        resumed = time.perf_counter() - started
+    return {
+        "lines": scanner.lines,
+        "mib": size / 2**20,
+        "naive_s": naive,
+        "naive_matches": naive_matches,
+        "scanner_s": scanned,
+        "scanner_matches": sum(scanner.counts.values()),
+        "scanner_candidates": scanner.candidates,
+        "scanner_mib_per_s": size / 2**20 / scanned,
+        "speedup": naive / scanned,
+        "resumed_ms": resumed * 1000,
+        "resumed_bytes": again.bytes,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--notable", type=float, default=0.002)
+    parser.add_argument("--fixtures", help="directory for the syslog file (default: a temp dir, reused)")
+    args = parser.parse_args(argv)
+    result = run(args.lines, args.notable, args.fixtures)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
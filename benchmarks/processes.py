@@ -0,0 +1,60 @@
+"""Snapshot cost of :class:`ProcessSampler` on this host's process table.
+
+Reports the wall time of one snapshot, the cost per process, the time a
+20k-process host would take at that per-process cost, and the time spent
+computing rates between two snapshots.  Runs with and without the
+``/proc/[pid]/io`` reads, which are the most expensive files to generate.
+
+The projection is compared with the 100 ms snapshot budget for such hosts,
+and that budget is not met.  On a single-vCPU VM the cost is about 14 us per
+process with ``io`` and about 8 us without, so a 20k table takes about
+280 ms and about 160 ms.  See :mod:`sysmaint.monitoring.processes` for
+where the time goes.
+
+    python -m benchmarks.processes [--snapshots N] [--root /proc]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from sysmaint.monitoring.processes import ProcessSampler
+
+BUDGET_20K_MS = 100.0
+
+
+def run(snapshots: int = 100, root: str = "/proc") -> dict[str, float]:
+    result: dict[str, float] = {}
+    for label, io in (("io", True), ("no_io", False)):
+        sampler = ProcessSampler(root, io=io)
+        previous = sampler.snapshot()
+        started = time.perf_counter()
+        for _ in range(snapshots):
+            current = sampler.snapshot()
+        per_snapshot = (time.perf_counter() - started) / snapshots
+        started = time.perf_counter()
+        for _ in range(snapshots):
+            sampler.rates(previous, current)
+        per_rates = (time.perf_counter() - started) / snapshots
+        per_process = per_snapshot / max(len(current), 1)
+        result["processes"] = len(current)
+        result[f"{label}_snapshot_ms"] = per_snapshot * 1000
+        result[f"{label}_us_per_process"] = per_process * 1e6
+        result[f"{label}_projected_20k_ms"] = per_process * 20000 * 1000
+        result[f"{label}_within_budget"] = int(per_process * 20000 * 1000 <= BUDGET_20K_MS)
+        result[f"{label}_rates_ms"] = per_rates * 1000
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshots", type=int, default=100)
+    parser.add_argument("--root", default="/proc")
+    args = parser.parse_args(argv)
+    for key, value in run(args.snapshots, args.root).items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
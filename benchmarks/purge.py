@@ -0,0 +1,74 @@
+"""Wall time of a maintenance window: targets one after another versus concurrently.
+
+Stands in for a host with ``--tools`` slow cleanup tools (each a ``sleep``
+of ``--tool-seconds``, the time ``apt-get clean`` or ``docker image prune``
+spends waiting) and ``--caches`` cache directories of ``--files`` files
+each.  The cache targets run as dry runs (the tools still run), so the
+fixture trees survive and are reused.  The window is timed once with every
+target run on its own and once through :func:`run_targets`, which overlaps
+them on the io and subprocess lanes.
+
+    python -m benchmarks.purge [--tools 4] [--tool-seconds 1] [--caches 3] [--files 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_tree
+from sysmaint.cleanup.targets import CommandTarget, DirectoryTarget, TargetResult, run_targets
+
+
+class _Tool(CommandTarget):
+    """A command target that runs its tool even in a dry run."""
+
+    def run(self, *, dry_run: bool = False) -> TargetResult:
+        return super().run()
+
+
+def run(
+    tools: int = 4, tool_seconds: float = 1.0, caches: int = 3, files: int = 20_000, fixtures: str | None = None
+) -> dict[str, float]:
+    root = fixtures or os.path.join(tempfile.gettempdir(), "sysmaint-bench", "purge")
+    targets = [_Tool(f"tool{i}", ["sleep", str(tool_seconds)]) for i in range(tools)]
+    for i in range(caches):
+        tree = make_tree(os.path.join(root, f"cache{i}"), files, seed=i)
+        targets.append(DirectoryTarget(f"cache{i}", [tree], pattern="*.dat"))
+
+    started = time.perf_counter()
+    for target in targets:
+        run_targets([target], dry_run=True)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = run_targets(targets, dry_run=True)
+    concurrent = time.perf_counter() - started
+    return {
+        "targets": len(targets),
+        "files": sum(r.files for r in results),
+        "sequential_s": sequential,
+        "concurrent_s": concurrent,
+        "slowest_target_s": max(r.elapsed for r in results),
+        "speedup": sequential / concurrent,
+        "failures": sum(not r.ok for r in results),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=4)
+    parser.add_argument("--tool-seconds", type=float, default=1.0)
+    parser.add_argument("--caches", type=int, default=3)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--fixtures", help="directory for the cache trees (default: a temp dir, reused)")
+    args = parser.parse_args(argv)
+    result = run(args.tools, args.tool_seconds, args.caches, args.files, args.fixtures)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
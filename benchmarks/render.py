@@ -0,0 +1,96 @@
+"""Peak memory of streaming report rendering against loading the whole range.
+
+Writes ``--days`` days of ``--metrics`` metrics sampled every ``--interval``
+seconds for ``--hosts`` hosts, then renders a summary and a bucketed
+section (to ``/dev/null``) over the last day and over the whole range,
+measuring peak traced allocations of each.  For comparison it also reads the
+whole range with :meth:`SeriesStore.read`, which is what a report that loads
+every record first would do.  The streaming peaks should match however many
+days the range covers.
+
+The full report is then rendered twice more with an :class:`AggregateCache`:
+the first run fills it, the second reuses every sealed day and computes only
+the newest, unsealed one.
+
+    python -m benchmarks.render [--days 30] [--hosts 2] [--metrics 20] [--interval 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fixtures import make_series
+from sysmaint.reporting.cache import AggregateCache
+from sysmaint.reporting.render import Section, bucket_rows, render, summary_rows
+
+
+def _peak(fn) -> tuple[float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+def run(days: int = 30, hosts: int = 2, metrics: int = 20, interval: float = 10.0) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as root:
+        stores = make_series(os.path.join(root, "series"), hosts=hosts, days=days, metrics=metrics, interval=interval)
+        end = max(store.last_timestamp or 0.0 for store in stores.values()) + 1
+
+        def report(start: float, cache: AggregateCache | None = None) -> None:
+            summary = summary_rows(stores, None, start, end, cache=cache)
+            buckets = bucket_rows(stores, "m000", start, end, reducer="p95", cache=cache)
+            sections = [
+                Section("Summary", ["host", "metric", "samples", "min", "mean", "max", "last"], summary),
+                Section("m000", ["host", "bucket", "value"], buckets),
+            ]
+            with open(os.devnull, "w") as out:
+                render(sections, out, format="html")
+
+        def load_all() -> None:
+            for store in stores.values():
+                store.read(end - days * 86400, end)
+
+        day_mib, day_s = _peak(lambda: report(end - 86400))
+        full_mib, full_s = _peak(lambda: report(end - days * 86400))
+        load_mib, _ = _peak(load_all)
+        cache = AggregateCache(os.path.join(root, "cache.db"))
+        start = (end - days * 86400) // 86400 * 86400  # whole segments, so all of them can be cached
+        _, cold_s = _peak(lambda: report(start, cache))
+        _, warm_s = _peak(lambda: report(start, cache))
+        hits, misses = cache.hits, cache.misses
+        cache.close()
+    return {
+        "rows_per_host": int(days * 86400 / interval),
+        "stream_1_day_peak_mib": day_mib,
+        "stream_full_peak_mib": full_mib,
+        "load_full_peak_mib": load_mib,
+        "stream_1_day_s": day_s,
+        "stream_full_s": full_s,
+        "cache_cold_s": cold_s,
+        "cache_warm_s": warm_s,
+        "cache_hits": hits,
+        "cache_misses": misses,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--metrics", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    result = run(args.days, args.hosts, args.metrics, args.interval)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
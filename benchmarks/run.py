@@ -0,0 +1,335 @@
+"""Benchmark suite for the monitoring, cleanup and reporting hot paths.
+
+Every case runs against the synthetic fixtures of :mod:`benchmarks.fixtures`
+(built once under ``--fixtures`` and reused): a file tree of ``--files``
+files for the scanner, the disk usage tree and the scan index; a synthetic
+/proc for the collectors; and ``--days`` of stored samples for reports and
+the wire format.  A case is set up outside the timed region, run once to
+warm up and then ``--repeat`` times; the median and the fastest run are
+reported together with items per second.
+
+Results go to ``--output`` as JSON, together with the fixture sizes and a
+description of the machine.  With ``--baseline`` (an earlier output file)
+each case is compared with its baseline median, and the run fails (exit
+status 1) if any case got slower by more than ``--tolerance``.  Timings
+only compare between runs on the same machine; scans run with a warm page
+cache, as the tree has just been built or scanned.
+
+    python -m benchmarks.run [--quick] [--only scan,report] [--output now.json] [--baseline base.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from benchmarks.fixtures import make_proc, make_series, make_tree
+
+Run = Callable[[], int]
+
+
+@dataclass
+class Fixtures:
+    root: str
+    files: int
+    processes: int
+    days: int
+
+    def tree(self) -> str:
+        return make_tree(os.path.join(self.root, "tree"), self.files)
+
+    def proc(self) -> str:
+        return make_proc(os.path.join(self.root, "proc"), processes=self.processes)
+
+    def series(self) -> dict:
+        return make_series(os.path.join(self.root, "series"), days=self.days)
+
+    def scratch(self, name: str) -> str:
+        path = os.path.join(self.root, "scratch", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return path
+
+
+# -- cleanup -------------------------------------------------------------
+
+
+def scan(fx: Fixtures) -> Run:
+    from sysmaint.cleanup.scanner import scan
+
+    root = fx.tree()
+    return lambda: sum(1 for _ in scan(root, workers=8))
+
+
+def scan_older_than(fx: Fixtures) -> Run:
+    from sysmaint.cleanup.scanner import older_than, scan
+
+    root = fx.tree()
+
+    def run() -> int:
+        for _ in scan(root, workers=8, predicate=older_than(30 * 86400)):
+            pass
+        return fx.files
+
+    return run
+
+
+def du(fx: Fixtures) -> Run:
+    from sysmaint.cleanup.usage import UsageTree
+
+    root = fx.tree()
+
+    def run() -> int:
+        tree = UsageTree()
+        tree.scan([root], workers=8)
+        return fx.files
+
+    return run
+
+
+def index_rescan(fx: Fixtures) -> Run:
+    from sysmaint.cleanup.index import ScanIndex
+
+    root = fx.tree()
+    index = ScanIndex(fx.scratch("index.db"))
+
+    def run() -> int:
+        for _ in index.scan([root], workers=8):
+            pass
+        return fx.files
+
+    run()
+    return run
+
+
+# -- monitoring ----------------------------------------------------------
+
+
+def collector(fx: Fixtures) -> Run:
+    from sysmaint.monitoring.collector import ProcCollector
+
+    proc = ProcCollector(fx.proc())
+    previous = proc.collect()
+
+    def run() -> int:
+        for _ in range(1000):
+            proc.collect(previous)
+        return 1000
+
+    return run
+
+
+def process_table(fx: Fixtures) -> Run:
+    from sysmaint.monitoring.processes import ProcessSampler
+
+    sampler = ProcessSampler(fx.proc())
+    previous = sampler.snapshot()
+
+    def run() -> int:
+        current = sampler.snapshot()
+        sampler.rates(previous, current)
+        return len(current.columns["pid"])
+
+    return run
+
+
+def wire(fx: Fixtures) -> Run:
+    from sysmaint.monitoring.wire import decode_batch, encode_batch
+
+    store = next(iter(fx.series().values()))
+    segment = store.segments()[0]
+    ts, columns = store.read(segment.start, segment.start + 86400)
+
+    def run() -> int:
+        decode_batch(encode_batch(ts, columns))
+        return ts.size * len(columns)
+
+    return run
+
+
+# -- reporting -----------------------------------------------------------
+
+
+def _report(fx: Fixtures, cache: object = None) -> Run:
+    from sysmaint.reporting.render import Section, bucket_rows, render, summary_rows
+
+    stores = fx.series()
+    rows = fx.days * 86400 // 10 * len(stores)
+
+    def run() -> int:
+        summary = summary_rows(stores, cache=cache)
+        buckets = bucket_rows(stores, "m000", bucket=3600, reducer="p95", transform="rate", cache=cache)
+        sections = [
+            Section("Summary", ["host", "metric", "samples", "min", "mean", "max", "last"], summary),
+            Section("m000", ["host", "bucket", "value"], buckets),
+        ]
+        with open(os.devnull, "w") as out:
+            render(sections, out, format="html")
+        return rows
+
+    return run
+
+
+def report(fx: Fixtures) -> Run:
+    return _report(fx)
+
+
+def report_cached(fx: Fixtures) -> Run:
+    from sysmaint.reporting.cache import AggregateCache
+
+    return _report(fx, AggregateCache())
+
+
+def aggregate(fx: Fixtures) -> Run:
+    from sysmaint.reporting.aggregate import aggregate, load_series
+
+    stores = fx.series()
+
+    def run() -> int:
+        series = load_series(stores, "m001")
+        aggregate(series, bucket=3600, reducer="p95")
+        return sum(ts.size for ts, _ in series.values())
+
+    return run
+
+
+CASES: dict[str, tuple[Callable[[Fixtures], Run], str]] = {
+    "scan": (scan, "files"),
+    "scan_older_than": (scan_older_than, "files"),
+    "du": (du, "files"),
+    "index_rescan": (index_rescan, "files"),
+    "collector": (collector, "samples"),
+    "process_table": (process_table, "processes"),
+    "wire": (wire, "values"),
+    "aggregate": (aggregate, "samples"),
+    "report": (report, "rows"),
+    "report_cached": (report_cached, "rows"),
+}
+
+
+def _machine() -> dict[str, object]:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "revision": revision,
+        "time": time.time(),
+    }
+
+
+def run(
+    fixtures: str,
+    *,
+    files: int = 1_000_000,
+    processes: int = 500,
+    days: int = 30,
+    repeat: int = 5,
+    only: list[str] | None = None,
+) -> dict[str, object]:
+    fx = Fixtures(fixtures, files, processes, days)
+    results = {}
+    for name, (setup, unit) in CASES.items():
+        if only and not any(word in name for word in only):
+            continue
+        fn = setup(fx)
+        items = fn()
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+        median = statistics.median(times)
+        results[name] = {
+            "median_s": median,
+            "min_s": min(times),
+            "runs": repeat,
+            "items": items,
+            "unit": unit,
+            "per_sec": items / median if median else 0.0,
+        }
+        print(f"{name:18} {median * 1000:10.2f} ms  {items / median:14,.0f} {unit}/s", file=sys.stderr)
+    return {
+        "machine": _machine(),
+        "fixtures": {"files": files, "processes": processes, "days": days},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print a comparison table; return the names of cases that regressed."""
+    if current["fixtures"] != baseline.get("fixtures"):
+        print(f"warning: fixtures differ from the baseline ({baseline.get('fixtures')})")
+    regressed = []
+    print(f"{'case':18} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:18} {result['median_s'] * 1000:10.2f} {'-':>10} {'new':>8}")
+            continue
+        change = result["median_s"] / base["median_s"] - 1
+        flag = ""
+        if change > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:18} {result['median_s'] * 1000:10.2f} {base['median_s'] * 1000:10.2f} {change:+8.1%}{flag}")
+    return regressed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "sysmaint-bench"))
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="small fixtures (20,000 files, 7 days)")
+    parser.add_argument("--only", help="comma-separated substrings of case names")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.files, args.days = 20_000, 7
+    result = run(
+        args.fixtures,
+        files=args.files,
+        processes=args.processes,
+        days=args.days,
+        repeat=args.repeat,
+        only=args.only.split(",") if args.only else None,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(result, json.load(f), args.tolerance)
+        if regressed:
+            print(f"FAIL: {', '.join(regressed)} slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Cold-start regression check for the command line entry point.
+
+Runs ``python -X importtime -m sysmaint status`` several times and takes the
+fastest run.  The check fails (exit status 1) when that run's wall time goes
+over the budget, or when ``status`` imports any module it should never need
+(NumPy, compression libraries, asyncio, the thread/process pools, SQLite).
+The wall time includes interpreter start-up, so the import time of the
+``sysmaint`` modules is printed separately to show what this project adds.
+
+    python -m benchmarks.startup [--budget-ms 50] [--runs 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+FORBIDDEN = ("numpy", "zstandard", "asyncio", "concurrent", "sqlite3", "gzip", "json")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def _run_once(command: list[str], env: dict[str, str]) -> tuple[float, str]:
+    started = time.perf_counter()
+    proc = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, proc.stderr
+
+
+def run(runs: int = 10, command: str = "status") -> dict[str, object]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    argv = [sys.executable, "-X", "importtime", "-m", "sysmaint", *command.split()]
+    best, best_log = min((_run_once(argv, env) for _ in range(runs)), key=lambda r: r[0])
+
+    imported = []
+    own_us = 0
+    for line in best_log.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if not m:
+            continue
+        name = m[4]
+        imported.append(name)
+        if name.split(".")[0] == "sysmaint" and len(m[3]) == 1:
+            own_us += int(m[2])
+    forbidden = sorted({name for name in imported if name.split(".")[0] in FORBIDDEN})
+    return {
+        "wall_ms": best * 1000,
+        "sysmaint_import_ms": own_us / 1000,
+        "modules": len(imported),
+        "forbidden": forbidden,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--command", default="status")
+    args = parser.parse_args(argv)
+    result = run(args.runs, args.command)
+    print(f"wall_ms              {result['wall_ms']:.1f} (budget {args.budget_ms:.0f})")
+    print(f"sysmaint_import_ms   {result['sysmaint_import_ms']:.1f}")
+    print(f"modules              {result['modules']}")
+    failed = False
+    if result["forbidden"]:
+        print(f"FAIL: {args.command} imported {', '.join(result['forbidden'])}")
+        failed = True
+    if result["wall_ms"] > args.budget_ms:
+        print(f"FAIL: cold start {result['wall_ms']:.1f}ms exceeds {args.budget_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
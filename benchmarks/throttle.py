@@ -0,0 +1,149 @@
+"""Maintenance throughput and device latency: fixed worker counts versus AIMD.
+
+Simulates one disk shared by production traffic and a maintenance job.  A
+synthetic /proc/diskstats is rewritten every few milliseconds: request
+latency is the production baseline of the current phase plus ``--cost-ms``
+for every maintenance worker busy at that moment.  Production alternates
+between a quiet phase (``--quiet-ms``) and a busy one (``--busy-ms``).
+
+The maintenance job runs ``--workers`` threads doing short tasks, once with
+all of them always allowed (fast, but latency far above the target while
+production is busy), once with a single one (polite, but slow while it is
+quiet) and once under an :class:`AdaptiveThrottle` with a
+``--target-ms`` latency target.  For each run and phase it reports tasks
+completed and the mean latency production saw.
+
+    python -m benchmarks.throttle [--phase-s 2] [--workers 8] [--target-ms 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sysmaint.cleanup.throttle import AdaptiveThrottle
+
+_TICK = 0.005
+
+
+class _Disk:
+    """Synthetic diskstats for one device whose latency follows the load."""
+
+    def __init__(self, root: str, cost_ms: float) -> None:
+        self.cost_ms = cost_ms
+        self.base_ms = 0.0
+        self.active = 0
+        self.lock = threading.Lock()
+        self.counters = [0] * 11
+        self.latency_sum = 0.0
+        self.ticks = 0
+        self.fd = os.open(os.path.join(root, "diskstats"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._write()
+
+    def _write(self) -> None:
+        data = (" 259       0 nvme0n1 " + " ".join(map(str, self.counters)) + " 0 0 0 0 0 0\n").encode()
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, data, 0)
+
+    def tick(self) -> None:
+        with self.lock:
+            latency = self.base_ms + self.cost_ms * self.active
+        requests = 50
+        c = self.counters
+        c[0] += requests
+        c[3] += int(requests * latency)
+        c[9] += int(_TICK * 1000 * min(1.0, latency / 40))
+        c[10] += int(requests * latency)
+        self.latency_sum += latency
+        self.ticks += 1
+        self._write()
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _run_case(disk: _Disk, limit: AdaptiveThrottle | int, workers: int, phases: list[tuple[str, float, float]]):
+    stop = threading.Event()
+    done = [0]
+    gate = limit if isinstance(limit, AdaptiveThrottle) else threading.BoundedSemaphore(limit)
+
+    def worker() -> None:
+        while not stop.is_set():
+            with gate.slot() if isinstance(gate, AdaptiveThrottle) else gate:
+                with disk.lock:
+                    disk.active += 1
+                time.sleep(0.002)
+                with disk.lock:
+                    disk.active -= 1
+                done[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    results = {}
+    for name, base_ms, seconds in phases:
+        disk.base_ms = base_ms
+        tasks, ticks, latency = done[0], disk.ticks, disk.latency_sum
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            disk.tick()
+            time.sleep(_TICK)
+        results[name] = (done[0] - tasks, (disk.latency_sum - latency) / max(1, disk.ticks - ticks))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run(
+    phase_s: float = 2.0,
+    workers: int = 8,
+    target_ms: float = 20.0,
+    quiet_ms: float = 2.0,
+    busy_ms: float = 14.0,
+    cost_ms: float = 2.0,
+) -> dict[str, float]:
+    phases = [("quiet", quiet_ms, phase_s), ("busy", busy_ms, phase_s), ("quiet_again", quiet_ms, phase_s)]
+    out: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as root:
+        disk = _Disk(root, cost_ms)
+        cases: dict[str, AdaptiveThrottle | int] = {
+            "fixed_max": workers,
+            "fixed_1": 1,
+            "adaptive": AdaptiveThrottle(
+                max_workers=workers, target_latency_ms=target_ms, max_util=1.0, interval=0.1, root=root
+            ),
+        }
+        for case, limit in cases.items():
+            if isinstance(limit, AdaptiveThrottle):
+                with limit:
+                    results = _run_case(disk, limit, workers, phases)
+                out["adaptive_backoffs"] = limit.backoffs
+            else:
+                results = _run_case(disk, limit, workers, phases)
+            for phase, (tasks, latency) in results.items():
+                out[f"{case}_{phase}_tasks"] = tasks
+                out[f"{case}_{phase}_ms"] = latency
+        disk.close()
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phase-s", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    parser.add_argument("--quiet-ms", type=float, default=2.0)
+    parser.add_argument("--busy-ms", type=float, default=14.0)
+    parser.add_argument("--cost-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+    result = run(args.phase_s, args.workers, args.target_ms, args.quiet_ms, args.busy_ms, args.cost_ms)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
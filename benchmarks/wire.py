@@ -0,0 +1,101 @@
+"""Wire format size and speed against JSON for a batch of metric samples.
+
+Builds ``--samples`` samples of ``--metrics`` metrics taken every
+``--interval`` seconds: mostly counters that grow at random rates, some
+gauges with one decimal of precision and some constants, the mix a
+:class:`ProcCollector` produces.  Reports encoded sizes (JSON also after
+zlib, for reference), bytes per value and encode/decode throughput.
+
+    python -m benchmarks.wire [--samples 360] [--metrics 200] [--interval 10] [--repeat 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import zlib
+
+import numpy as np
+
+from sysmaint.monitoring.wire import decode_batch, encode_batch, encode_samples
+
+
+def _series(samples: int, metrics: int, interval: float, seed: int = 0) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.arange(samples) * interval + rng.integers(0, 3, samples) / 1000
+    columns = {}
+    for i in range(metrics):
+        kind = i % 10
+        if kind < 6:
+            rate = rng.uniform(1, 10_000)
+            values = np.cumsum(rng.poisson(rate * interval, samples)).astype(np.float64) + rng.integers(0, 2**40)
+        elif kind < 9:
+            values = np.round(rng.uniform(0, 100) + np.cumsum(rng.normal(0, 0.5, samples)), 1)
+        else:
+            values = np.full(samples, float(rng.integers(0, 1 << 20)))
+        columns[f"metric.{i:04d}"] = values
+    return timestamps, columns
+
+
+def _timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(samples: int = 360, metrics: int = 200, interval: float = 10.0, repeat: int = 20) -> dict[str, float]:
+    timestamps, columns = _series(samples, metrics, interval)
+    names = list(columns)
+    matrix = np.stack([columns[name] for name in names], axis=1)
+    records = [
+        {"time": ts, "metrics": {name: (int(v) if v.is_integer() else v) for name, v in zip(names, row)}}
+        for ts, row in zip(timestamps.tolist(), matrix.tolist())
+    ]
+    pairs = [(r["time"], r["metrics"]) for r in records]
+
+    text = json.dumps(records, separators=(",", ":")).encode()
+    data = encode_batch(timestamps, columns)
+    decoded_ts, decoded = decode_batch(data)
+    assert np.allclose(decoded_ts, timestamps, rtol=0, atol=1e-3)
+    assert all(np.array_equal(decoded[name], columns[name]) for name in names)
+
+    values = samples * metrics
+    mb = values * 8 / 1e6
+    json_encode = _timed(lambda: json.dumps(records, separators=(",", ":")), repeat)
+    json_decode = _timed(lambda: json.loads(text), repeat)
+    wire_encode = _timed(lambda: encode_batch(timestamps, columns), repeat)
+    wire_decode = _timed(lambda: decode_batch(data), repeat)
+    samples_encode = _timed(lambda: encode_samples(pairs), repeat)
+    return {
+        "values": values,
+        "json_bytes": len(text),
+        "json_zlib_bytes": len(zlib.compress(text, 6)),
+        "wire_bytes": len(data),
+        "wire_bytes_per_value": len(data) / values,
+        "ratio_vs_json": len(text) / len(data),
+        "json_encode_ms": json_encode * 1000,
+        "json_decode_ms": json_decode * 1000,
+        "wire_encode_ms": wire_encode * 1000,
+        "wire_decode_ms": wire_decode * 1000,
+        "wire_encode_samples_ms": samples_encode * 1000,
+        "wire_encode_mb_per_s": mb / wire_encode,
+        "wire_decode_mb_per_s": mb / wire_decode,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=360)
+    parser.add_argument("--metrics", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    result = run(args.samples, args.metrics, args.interval, args.repeat)
+    for key, value in result.items():
+        print(f"{key:28} {value:,.3f}" if isinstance(value, float) else f"{key:28} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
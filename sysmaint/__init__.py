@@ -0,0 +1,3 @@
+"""System maintenance automation: monitoring, cleanup and reporting."""
+
+__version__ = "0.1.0"
@@ -0,0 +1,5 @@
+import sys
+
+from sysmaint.cli import main
+
+sys.exit(main())
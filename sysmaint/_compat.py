@@ -0,0 +1,20 @@
+"""Helpers for optional dependencies.
+
+Heavy or optional packages are imported at the point of use so that commands
+which never touch them do not pay for the import.
+"""
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+
+__all__ = ["require"]
+
+
+def require(module: str, feature: str) -> ModuleType:
+    """Import ``module`` or raise an ImportError naming the feature that needs it."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as exc:
+        raise ImportError(f"{feature} requires the optional dependency {module!r}") from exc
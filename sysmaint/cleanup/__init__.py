@@ -0,0 +1,60 @@
+"""Cleanup: finding, planning and removing reclaimable files.
+
+Names are imported from their modules on first access, so importing this
+package (for example from the command line entry point) stays cheap.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sysmaint.cleanup.dedupe import DedupeStats, DuplicateFinder, DuplicateGroup, HashCache
+    from sysmaint.cleanup.delete import DeletionPipeline, DeletionStats
+    from sysmaint.cleanup.index import ScanIndex
+    from sysmaint.cleanup.logrotate import LogRotator, compress_file, rotate
+    from sysmaint.cleanup.plan import Plan, apply_plan
+    from sysmaint.cleanup.scanner import ParallelScanner, ScanEntry, older_than, scan
+    from sysmaint.cleanup.targets import CommandTarget, DirectoryTarget, Target, TargetResult, make_targets, run_targets
+    from sysmaint.cleanup.usage import UsageTree
+
+_EXPORTS = {
+    "CommandTarget": "sysmaint.cleanup.targets",
+    "DedupeStats": "sysmaint.cleanup.dedupe",
+    "DeletionPipeline": "sysmaint.cleanup.delete",
+    "DeletionStats": "sysmaint.cleanup.delete",
+    "DirectoryTarget": "sysmaint.cleanup.targets",
+    "DuplicateFinder": "sysmaint.cleanup.dedupe",
+    "DuplicateGroup": "sysmaint.cleanup.dedupe",
+    "HashCache": "sysmaint.cleanup.dedupe",
+    "LogRotator": "sysmaint.cleanup.logrotate",
+    "ParallelScanner": "sysmaint.cleanup.scanner",
+    "Plan": "sysmaint.cleanup.plan",
+    "ScanEntry": "sysmaint.cleanup.scanner",
+    "ScanIndex": "sysmaint.cleanup.index",
+    "Target": "sysmaint.cleanup.targets",
+    "TargetResult": "sysmaint.cleanup.targets",
+    "UsageTree": "sysmaint.cleanup.usage",
+    "apply_plan": "sysmaint.cleanup.plan",
+    "compress_file": "sysmaint.cleanup.logrotate",
+    "make_targets": "sysmaint.cleanup.targets",
+    "older_than": "sysmaint.cleanup.scanner",
+    "rotate": "sysmaint.cleanup.logrotate",
+    "run_targets": "sysmaint.cleanup.targets",
+    "scan": "sysmaint.cleanup.scanner",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module), name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
@@ -0,0 +1,372 @@
+"""Duplicate file detection with staged hashing.
+
+Hashing every byte of a large volume is what makes naive duplicate finders
+take days, and almost all of it is wasted: files only need comparing with
+files of the same size, and most same-size files already differ in their
+first or last block.  :class:`DuplicateFinder` therefore narrows candidates
+in three stages:
+
+1. group by size, dropping sizes held by a single file;
+2. hash the first and last 64 KiB of each remaining file and regroup;
+3. compute a full BLAKE2b digest only for files still sharing a partial hash.
+
+Files no larger than the two partial blocks are fully hashed in stage 2.
+Hashing runs on a thread pool (``hashlib`` releases the GIL on large
+buffers); full hashes read through ``mmap`` so the data is hashed straight
+from the page cache without copies.  Hard links are recognised by
+``(dev, inode)`` and hashed once; a group reports every path of every
+duplicate inode.
+
+With a :class:`HashCache`, digests are stored by ``(dev, inode)`` together
+with the size and mtime they were computed for, so a repeat run over
+unchanged files reads nothing but the cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sysmaint.cleanup.scanner import ScanEntry
+
+__all__ = ["DedupeStats", "DuplicateFinder", "DuplicateGroup", "HashCache"]
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_BYTES = 64 * 1024
+_CHUNK = 8 * 1024 * 1024
+_O_NOATIME = getattr(os, "O_NOATIME", 0)
+
+_Key = tuple[int, int]
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial BLOB,
+    full BLOB,
+    PRIMARY KEY (dev, inode)
+) WITHOUT ROWID
+"""
+
+
+class HashCache:
+    """SQLite store of partial and full digests keyed by file identity.
+
+    A cached digest is only returned while the file's size and mtime still
+    match.  Like :class:`~sysmaint.cleanup.index.ScanIndex`, an unreadable
+    database is moved aside and rebuilt, which only costs a rehash.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            self._db = self._open()
+        except sqlite3.DatabaseError as exc:
+            broken = path + ".corrupt"
+            logger.warning("hash cache %s is unusable (%s); moving it to %s and rebuilding", path, exc, broken)
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.replace(path + suffix, broken + suffix)
+            self._db = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path)
+        try:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version not in (0, _SCHEMA_VERSION):
+                raise sqlite3.DatabaseError(f"unsupported schema version {version}")
+            with db:
+                db.execute(_SCHEMA)
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def get(self, entry: ScanEntry) -> tuple[bytes | None, bytes | None]:
+        """Cached ``(partial, full)`` digests for ``entry``, ``None`` when unknown."""
+        row = self._db.execute(
+            "SELECT size, mtime_ns, partial, full FROM hashes WHERE dev = ? AND inode = ?",
+            (entry.dev, entry.inode),
+        ).fetchone()
+        if row is None or row[0] != entry.size or row[1] != entry.mtime_ns:
+            return None, None
+        return row[2], row[3]
+
+    def put(self, rows: Iterable[tuple[ScanEntry, bytes | None, bytes | None]]) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                ((e.dev, e.inode, e.size, e.mtime_ns, partial, full) for e, partial, full in rows),
+            )
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT count(*) FROM hashes").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> HashCache:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@dataclass(frozen=True, slots=True)
+class DuplicateGroup:
+    """Files with identical content; ``entries`` includes every hard link."""
+
+    size: int
+    digest: bytes
+    entries: tuple[ScanEntry, ...]
+
+    @property
+    def inodes(self) -> int:
+        return len({(e.dev, e.inode) for e in self.entries})
+
+    @property
+    def reclaimable(self) -> int:
+        """Bytes freed by keeping a single copy."""
+        return self.size * (self.inodes - 1)
+
+
+@dataclass
+class DedupeStats:
+    """Counters for one :meth:`DuplicateFinder.find` run."""
+
+    files: int = 0
+    candidates: int = 0
+    partial_hashed: int = 0
+    full_hashed: int = 0
+    cache_hits: int = 0
+    bytes_hashed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+
+def _open(entry: ScanEntry) -> int | None:
+    """Open ``entry`` for reading if it is still the file that was scanned.
+
+    ``O_NOATIME`` keeps hashing from refreshing access times that cleanup
+    policies may rely on; it is only permitted for the owner, so fall back.
+    """
+    flags = os.O_RDONLY | os.O_NOFOLLOW | os.O_CLOEXEC
+    try:
+        fd = os.open(entry.path, flags | _O_NOATIME)
+    except PermissionError:
+        if not _O_NOATIME:
+            raise
+        fd = os.open(entry.path, flags)
+    st = os.fstat(fd)
+    if st.st_ino != entry.inode or st.st_size != entry.size or st.st_mtime_ns != entry.mtime_ns:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DuplicateFinder:
+    """Find groups of files with identical content.
+
+    ``min_size`` skips small files (empty files are never reported).
+    ``use_mmap=False`` reads full hashes with ``readinto`` instead; use it on
+    volumes where files may be truncated while being hashed, since touching a
+    truncated mapping kills the process with ``SIGBUS``.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 8,
+        min_size: int = 1,
+        cache: HashCache | None = None,
+        partial_bytes: int = PARTIAL_BYTES,
+        use_mmap: bool = True,
+        on_error: Callable[[OSError], None] | None = None,
+    ) -> None:
+        self.workers = workers
+        self.min_size = max(1, min_size)
+        self.cache = cache
+        self.partial_bytes = partial_bytes
+        self.use_mmap = use_mmap
+        self.on_error = on_error
+        self.stats = DedupeStats()
+        self._lock = threading.Lock()
+
+    # -- hashing (pool workers) ------------------------------------------
+
+    def _partial(self, entry: ScanEntry) -> bytes | None:
+        """Digest of the head and tail blocks, or of the whole small file."""
+        try:
+            fd = _open(entry)
+            if fd is None:
+                return None
+            try:
+                if entry.size <= 2 * self.partial_bytes:
+                    return self._hash_fd(fd, entry.size)
+                h = hashlib.blake2b(digest_size=16)
+                h.update(os.pread(fd, self.partial_bytes, 0))
+                h.update(os.pread(fd, self.partial_bytes, entry.size - self.partial_bytes))
+                return h.digest()
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            self._error(exc)
+            return None
+
+    def _full(self, entry: ScanEntry) -> bytes | None:
+        try:
+            fd = _open(entry)
+            if fd is None:
+                return None
+            try:
+                return self._hash_fd(fd, entry.size)
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            self._error(exc)
+            return None
+
+    def _hash_fd(self, fd: int, size: int) -> bytes:
+        h = hashlib.blake2b()
+        if self.use_mmap and size:
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as m:
+                if hasattr(m, "madvise"):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(m) as view:
+                    for offset in range(0, size, _CHUNK):
+                        with view[offset : offset + _CHUNK] as chunk:
+                            h.update(chunk)
+        else:
+            buf = bytearray(min(size, _CHUNK) or 1)
+            with os.fdopen(os.dup(fd), "rb", buffering=0) as f, memoryview(buf) as view:
+                while n := f.readinto(buf):
+                    h.update(view[:n])
+        return h.digest()
+
+    def _error(self, exc: OSError) -> None:
+        with self._lock:
+            self.stats.errors += 1
+        if self.on_error is not None:
+            self.on_error(exc)
+        else:
+            logger.debug("cannot hash: %s", exc)
+
+    # -- stages ----------------------------------------------------------
+
+    def _hash_stage(
+        self,
+        pool: ThreadPoolExecutor,
+        reps: list[ScanEntry],
+        known: dict[_Key, bytes | None],
+        func: Callable[[ScanEntry], bytes | None],
+    ) -> dict[_Key, bytes]:
+        """Digest every representative, from ``known`` where possible."""
+        digests: dict[_Key, bytes] = {}
+        todo = []
+        for entry in reps:
+            key = (entry.dev, entry.inode)
+            digest = known.get(key)
+            if digest is not None:
+                digests[key] = digest
+                self.stats.cache_hits += 1
+            else:
+                todo.append(entry)
+        for entry, digest in zip(todo, pool.map(func, todo)):
+            if digest is not None:
+                digests[(entry.dev, entry.inode)] = digest
+        return digests
+
+    def find(self, entries: Iterable[ScanEntry]) -> list[DuplicateGroup]:
+        """Group ``entries`` by content, largest reclaimable space first."""
+        started = time.monotonic()
+        stats = self.stats = DedupeStats()
+        by_size: dict[int, dict[_Key, list[ScanEntry]]] = {}
+        for entry in entries:
+            stats.files += 1
+            if entry.size >= self.min_size:
+                by_size.setdefault(entry.size, {}).setdefault((entry.dev, entry.inode), []).append(entry)
+
+        links: dict[_Key, list[ScanEntry]] = {}
+        for inodes in by_size.values():
+            if len(inodes) > 1:
+                links.update(inodes)
+        reps = [paths[0] for paths in links.values()]
+        stats.candidates = len(reps)
+
+        cached: dict[_Key, tuple[bytes | None, bytes | None]] = {}
+        if self.cache is not None:
+            for entry in reps:
+                cached[(entry.dev, entry.inode)] = self.cache.get(entry)
+
+        small = 2 * self.partial_bytes
+        groups: list[DuplicateGroup] = []
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="sysmaint-hash") as pool:
+            # Stage 2: head and tail (full digest for small files).
+            known = {key: full if links[key][0].size <= small else partial for key, (partial, full) in cached.items()}
+            partials = self._hash_stage(pool, reps, known, self._partial)
+            hashed = [e for e in reps if (e.dev, e.inode) in partials and known.get((e.dev, e.inode)) is None]
+            stats.partial_hashed = len(hashed)
+            stats.bytes_hashed += sum(min(e.size, small) for e in hashed)
+
+            by_partial: dict[tuple[int, bytes], list[ScanEntry]] = {}
+            for entry in reps:
+                digest = partials.get((entry.dev, entry.inode))
+                if digest is not None:
+                    by_partial.setdefault((entry.size, digest), []).append(entry)
+
+            # Stage 3: full digests for large files still colliding.
+            large = [e for (size, _), group in by_partial.items() if size > small and len(group) > 1 for e in group]
+            known = {key: full for key, (_, full) in cached.items()}
+            fulls = self._hash_stage(pool, large, known, self._full)
+            hashed_full = [e for e in large if (e.dev, e.inode) in fulls and known.get((e.dev, e.inode)) is None]
+            stats.full_hashed = len(hashed_full)
+            stats.bytes_hashed += sum(e.size for e in hashed_full)
+
+        if self.cache is not None:
+            updates = []
+            for entry in reps:
+                key = (entry.dev, entry.inode)
+                if key not in partials:
+                    continue
+                if entry.size <= small:
+                    row = (None, partials[key])
+                else:
+                    row = (partials[key], fulls.get(key) or cached.get(key, (None, None))[1])
+                if row != cached.get(key):
+                    updates.append((entry, *row))
+            self.cache.put(updates)
+
+        for (size, digest), group in by_partial.items():
+            if len(group) < 2:
+                continue
+            if size <= small:
+                groups.append(self._group(size, digest, group, links))
+                continue
+            by_full: dict[bytes, list[ScanEntry]] = {}
+            for entry in group:
+                full = fulls.get((entry.dev, entry.inode))
+                if full is not None:
+                    by_full.setdefault(full, []).append(entry)
+            groups.extend(self._group(size, full, same, links) for full, same in by_full.items() if len(same) > 1)
+
+        groups.sort(key=lambda g: g.reclaimable, reverse=True)
+        stats.elapsed = time.monotonic() - started
+        return groups
+
+    @staticmethod
+    def _group(size: int, digest: bytes, reps: list[ScanEntry], links: dict[_Key, list[ScanEntry]]) -> DuplicateGroup:
+        entries = sorted((e for rep in reps for e in links[(rep.dev, rep.inode)]), key=lambda e: e.path)
+        return DuplicateGroup(size, digest, tuple(entries))
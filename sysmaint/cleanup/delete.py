@@ -0,0 +1,280 @@
+"""Batched, rate-limited deletion of files found by a scan.
+
+Files are grouped by directory and each group is unlinked by a pool worker
+through one directory file descriptor (``unlinkat``), so the kernel resolves
+the directory once per batch instead of once per file.  That descriptor is
+opened one path component at a time from ``/`` with ``O_NOFOLLOW``: a
+directory swapped for a symlink after the scan (say ``/tmp/x`` pointed at
+``/etc`` by another user) fails the batch instead of redirecting the
+deletion, so paths given to the pipeline must not contain symlinks.  A path
+submitted twice is deleted once.  Optional token buckets cap files and
+bytes per second across all workers (dry runs are not limited), which keeps
+the pipeline from saturating a volume shared with production services; an
+:class:`~sysmaint.cleanup.throttle.AdaptiveThrottle` instead limits how many
+batches are deleted at once, following the live latency of the device.
+
+With ``verify``, a file given as a scan record is stat'ed again (through
+the same directory descriptor) just before it is unlinked and skipped unless
+its inode, device, size and mtime still match the record, so candidates
+found long before the deletion, such as those of a saved
+:class:`~sysmaint.cleanup.plan.Plan`, cannot take a file that was replaced
+or rewritten in the meantime.
+
+Directories emptied by the deletion are removed afterwards, deepest first,
+but only below the roots given as ``prune_under``; the roots themselves and
+anything outside them are never removed.  Their parents are opened the same
+way as the batches' directories.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sysmaint.cleanup.scanner import ScanEntry
+from sysmaint.cleanup.throttle import AdaptiveThrottle, TokenBucket
+from sysmaint.profiling import phase
+
+__all__ = ["DeletionPipeline", "DeletionStats"]
+
+_Item = tuple[str, "int | None", "tuple[int, int, int, int] | None"]
+_DIR_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC
+
+
+def _open_dir(path: str) -> int:
+    """Open the absolute directory ``path`` without following a symlink in any component."""
+    fd = os.open("/", _DIR_FLAGS)
+    try:
+        for name in path.split("/"):
+            if name:
+                parent, fd = fd, -1
+                try:
+                    fd = os.open(name, _DIR_FLAGS, dir_fd=parent)
+                finally:
+                    os.close(parent)
+    except OSError as exc:
+        if fd >= 0:
+            os.close(fd)
+        raise OSError(exc.errno, exc.strerror, path) from None
+    return fd
+
+
+@dataclass
+class DeletionStats:
+    """Counters for one pipeline run."""
+
+    files: int = 0
+    bytes: int = 0
+    dirs: int = 0
+    missing: int = 0
+    duplicates: int = 0
+    changed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def merge(self, other: DeletionStats) -> None:
+        self.files += other.files
+        self.bytes += other.bytes
+        self.dirs += other.dirs
+        self.missing += other.missing
+        self.duplicates += other.duplicates
+        self.changed += other.changed
+        self.errors += other.errors
+
+
+class DeletionPipeline:
+    """Delete files in per-directory batches on a bounded worker pool.
+
+    ``max_files_per_sec`` and ``max_bytes_per_sec`` are shared limits across
+    all workers.  With ``throttle`` (started by the caller), each batch
+    takes one of its slots, so at most ``throttle.limit`` of the
+    ``workers`` delete at a time.  With ``dry_run`` nothing is unlinked and
+    nothing is rate limited, but the counters are filled as if it had been.
+    With ``verify``, scan records whose file changed since the scan are
+    skipped and counted in ``changed`` (see the module docstring).  Errors
+    other than "already gone" go to ``on_error`` and are counted.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        batch_size: int = 256,
+        max_files_per_sec: float | None = None,
+        max_bytes_per_sec: float | None = None,
+        prune_under: Iterable[str] = (),
+        dry_run: bool = False,
+        verify: bool = False,
+        throttle: AdaptiveThrottle | None = None,
+        on_error: Callable[[OSError], None] | None = None,
+    ) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.file_limit = TokenBucket(max_files_per_sec) if max_files_per_sec else None
+        self.byte_limit = TokenBucket(max_bytes_per_sec) if max_bytes_per_sec else None
+        self.prune_under = tuple(os.path.realpath(root) for root in prune_under)
+        self.dry_run = dry_run
+        self.verify = verify
+        self.throttle = throttle
+        self.on_error = on_error
+
+    def run(self, entries: Iterable[ScanEntry | str]) -> DeletionStats:
+        """Delete ``entries`` (scan records or paths) and return the counters."""
+        stats = DeletionStats()
+        lock = threading.Lock()
+        touched: set[str] = set()
+        seen: set[str] = set()
+        groups: dict[str, list[_Item]] = {}
+        # Bound the batches queued ahead of the workers so a fast producer
+        # does not buffer the whole candidate list.
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        futures: list[Future[None]] = []
+        started = time.perf_counter()
+
+        def finished(batch_stats: DeletionStats, directory: str) -> None:
+            with lock:
+                stats.merge(batch_stats)
+                if batch_stats.files:
+                    touched.add(directory)
+
+        def submit(executor: ThreadPoolExecutor, directory: str, items: list[_Item]) -> None:
+            slots.acquire()
+            future = executor.submit(self._delete_batch, directory, items, finished)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+
+        with phase("delete"), ThreadPoolExecutor(self.workers, thread_name_prefix="sysmaint-delete") as executor:
+            for entry in entries:
+                if isinstance(entry, ScanEntry):
+                    path, size = entry.path, entry.size
+                    expected = (entry.inode, entry.dev, entry.size, entry.mtime_ns) if self.verify else None
+                else:
+                    path, size, expected = entry, None, None
+                path = os.path.abspath(path)
+                if path in seen:
+                    stats.duplicates += 1
+                    continue
+                seen.add(path)
+                directory, name = os.path.split(path)
+                group = groups.setdefault(directory, [])
+                group.append((name, size, expected))
+                if len(group) >= self.batch_size:
+                    submit(executor, directory, groups.pop(directory))
+            for directory, items in groups.items():
+                submit(executor, directory, items)
+        for future in futures:
+            future.result()
+
+        if self.prune_under and not self.dry_run:
+            with phase("prune"):
+                stats.dirs = self._prune(touched)
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _delete_batch(
+        self,
+        directory: str,
+        items: list[_Item],
+        finished: Callable[[DeletionStats, str], None],
+    ) -> None:
+        if self.throttle is not None:
+            with self.throttle.slot():
+                self._unlink_batch(directory, items, finished)
+        else:
+            self._unlink_batch(directory, items, finished)
+
+    def _unlink_batch(
+        self,
+        directory: str,
+        items: list[_Item],
+        finished: Callable[[DeletionStats, str], None],
+    ) -> None:
+        stats = DeletionStats()
+        try:
+            dir_fd = _open_dir(directory)
+        except FileNotFoundError:
+            stats.missing += len(items)
+            finished(stats, directory)
+            return
+        except OSError as exc:
+            self._error(exc)
+            stats.errors += len(items)
+            finished(stats, directory)
+            return
+        try:
+            for name, size, expected in items:
+                try:
+                    if expected is not None:
+                        st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+                        if (st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns) != expected:
+                            stats.changed += 1
+                            continue
+                    elif size is None:
+                        size = os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_size
+                    if not self.dry_run:
+                        if self.file_limit is not None:
+                            self.file_limit.acquire()
+                        if self.byte_limit is not None and size:
+                            self.byte_limit.acquire(size)
+                        os.unlink(name, dir_fd=dir_fd)
+                except FileNotFoundError:
+                    stats.missing += 1
+                    continue
+                except OSError as exc:
+                    self._error(exc)
+                    stats.errors += 1
+                    continue
+                stats.files += 1
+                stats.bytes += size
+        finally:
+            os.close(dir_fd)
+        finished(stats, directory)
+
+    def _prune(self, touched: Iterable[str]) -> int:
+        """Remove emptied directories bottom-up, staying strictly below the roots."""
+        roots = self.prune_under
+        prefixes = tuple(root.rstrip("/") + "/" for root in roots)
+
+        def inside(path: str) -> bool:
+            return path not in roots and path.startswith(prefixes)
+
+        heap = [(-path.count("/"), path) for path in set(touched) if inside(path)]
+        heapq.heapify(heap)
+        queued = {path for _, path in heap}
+        removed = 0
+        while heap:
+            _, path = heapq.heappop(heap)
+            parent, name = os.path.split(path)
+            try:
+                # Through the parent opened like the batches', so a parent
+                # swapped for a symlink is not followed here either.
+                dir_fd = _open_dir(parent)
+                try:
+                    os.rmdir(name, dir_fd=dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except OSError:
+                continue
+            removed += 1
+            parent = os.path.dirname(path)
+            if parent not in queued and inside(parent):
+                queued.add(parent)
+                heapq.heappush(heap, (-parent.count("/"), parent))
+        return removed
+
+    def _error(self, exc: OSError) -> None:
+        if self.on_error is not None:
+            self.on_error(exc)
@@ -0,0 +1,224 @@
+"""Persistent directory index for incremental cleanup scans.
+
+The index stores one ``(path, mtime, inode, subdirectories, files)`` record
+per directory in SQLite, the files with the mtime and atime they had when
+last seen.  A directory's mtime only moves when entries are added, removed
+or renamed directly inside it, so a directory whose record still matches
+does not need to be listed again: the scanner stats its known
+subdirectories and continues below them, and takes its files from the
+record instead of from ``getdents``.
+
+Files of an unchanged directory are still emitted.  Their stored times are
+run through the scanner's predicate first, and only the files that pass
+are stat'ed again and checked against it with their current metadata.  A
+file that has aged past an ``older_than`` cutoff since the last run is
+therefore found, and one rewritten in place is judged by its new mtime.
+This relies on the predicate only becoming true as a file is left alone,
+which holds for age predicates: a rewrite or read moves the times forward,
+so a file the stored times reject is rejected by its current ones too.
+Without a predicate every known file is stat'ed, which still saves the
+listing of every unchanged directory.
+
+Paths are stored as bytes so names that are not valid UTF-8 round-trip.  The
+database is checked when it is opened; if it is unreadable, has a foreign
+schema or fails ``PRAGMA quick_check`` it is moved aside and rebuilt empty,
+which only costs the next run a full scan.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+
+from sysmaint.cleanup.scanner import ParallelScanner, ScanEntry
+
+__all__ = ["ScanIndex"]
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path BLOB PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    children BLOB NOT NULL,
+    files BLOB NOT NULL,
+    times BLOB NOT NULL
+) WITHOUT ROWID
+"""
+
+# (name, mtime_ns, atime_ns) of a regular file directly inside a directory.
+FileTimes = tuple[str, int, int]
+# Files are kept encoded: NUL-separated names, and their times as a
+# little-endian int64 array of (mtime_ns, atime_ns) pairs.
+_Record = tuple[int, int, tuple[str, ...], bytes, bytes]
+
+
+def _encode_files(files: Sequence[FileTimes]) -> tuple[bytes, bytes]:
+    times = array("q")
+    for _, mtime_ns, atime_ns in files:
+        times.append(mtime_ns)
+        times.append(atime_ns)
+    if sys.byteorder == "big":
+        times.byteswap()
+    return b"\0".join(os.fsencode(name) for name, _, _ in files), times.tobytes()
+
+
+def _decode_files(names: bytes, data: bytes) -> list[FileTimes]:
+    if not names:
+        return []
+    times = array("q", data)
+    if sys.byteorder == "big":
+        times.byteswap()
+    return [
+        (os.fsdecode(name), times[2 * i], times[2 * i + 1]) for i, name in enumerate(names.split(b"\0"))
+    ]
+
+
+class ScanIndex:
+    """Directory records from the previous scan, plus those seen in this one.
+
+    The previous run's records are loaded into memory on open; records from
+    the current run collect separately and are only written by
+    :meth:`commit`, so an interrupted scan leaves the stored index untouched.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db = self._connect()
+        self._known: dict[str, _Record] = self._load()
+        self._seen: dict[str, _Record] = {}
+        self.changed: set[str] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            return self._open_checked()
+        except sqlite3.DatabaseError as exc:
+            broken = self.path + ".corrupt"
+            logger.warning("scan index %s is unusable (%s); moving it to %s and rebuilding", self.path, exc, broken)
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.replace(self.path + suffix, broken + suffix)
+            return self._open_checked()
+
+    def _open_checked(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version not in (0, _SCHEMA_VERSION):
+                raise sqlite3.DatabaseError(f"unsupported schema version {version}")
+            (status,) = db.execute("PRAGMA quick_check").fetchone()
+            if status != "ok":
+                raise sqlite3.DatabaseError(status)
+            with db:
+                db.execute(_SCHEMA)
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def _load(self) -> dict[str, _Record]:
+        known: dict[str, _Record] = {}
+        try:
+            rows = self._db.execute("SELECT path, mtime_ns, inode, children, files, times FROM dirs").fetchall()
+        except sqlite3.DatabaseError as exc:
+            logger.warning("scan index %s could not be read (%s); starting empty", self.path, exc)
+            return known
+        for path, mtime_ns, inode, children, files, times in rows:
+            names = tuple(os.fsdecode(name) for name in children.split(b"\0")) if children else ()
+            known[os.fsdecode(path)] = (mtime_ns, inode, names, files, times)
+        return known
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def lookup(self, path: str, st: os.stat_result) -> tuple[tuple[str, ...], list[FileTimes]] | None:
+        """Return the recorded subdirectories and files of ``path`` if it is unchanged.
+
+        Directories reported as changed are collected in :attr:`changed`,
+        which other structures (such as a usage tree) can use to refresh
+        just those directories.
+        """
+        record = self._known.get(path)
+        if record is None or record[0] != st.st_mtime_ns or record[1] != st.st_ino:
+            self.changed.add(path)
+            return None
+        return record[2], _decode_files(record[3], record[4])
+
+    def record(
+        self, path: str, st: os.stat_result, children: tuple[str, ...], files: Sequence[FileTimes] = ()
+    ) -> None:
+        """Note the state of a directory visited in the current scan."""
+        self._seen[path] = (st.st_mtime_ns, st.st_ino, children, *_encode_files(files))
+
+    def invalidate(self, paths: Iterable[str]) -> None:
+        """Force the next scan to list ``paths`` again."""
+        for path in paths:
+            self._known.pop(path, None)
+            self._seen.pop(path, None)
+
+    def reset(self) -> None:
+        """Forget every record, making the next scan a full one."""
+        self._known.clear()
+        self._seen.clear()
+        with self._db:
+            self._db.execute("DELETE FROM dirs")
+
+    def commit(self, roots: Iterable[str]) -> None:
+        """Replace the stored records under ``roots`` with this scan's records.
+
+        Directories under the roots that were not visited (deleted, or pruned
+        by the scanner) are dropped.  Records for other roots are kept.
+        """
+        roots = list(roots)
+        with self._db:
+            for root in roots:
+                key = os.fsencode(root)
+                prefix = key.rstrip(b"/") + b"/"
+                self._db.execute(
+                    "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                    (key, prefix, prefix[:-1] + b"0"),
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (os.fsencode(path), mtime_ns, inode, b"\0".join(map(os.fsencode, children)), files, times)
+                    for path, (mtime_ns, inode, children, files, times) in self._seen.items()
+                ),
+            )
+        prefixes = tuple(root.rstrip("/") + "/" for root in roots)
+        self._known = {
+            path: record
+            for path, record in self._known.items()
+            if path not in roots and not path.startswith(prefixes)
+        }
+        self._known.update(self._seen)
+        self._seen = {}
+
+    def scan(self, roots: str | Iterable[str], **options: object) -> Iterator[ScanEntry]:
+        """Scan ``roots`` incrementally and commit the index once exhausted.
+
+        ``options`` are passed to :class:`ParallelScanner`.  Closing the
+        generator before the end discards this run's records, and a root
+        that could not be listed keeps its stored records.
+        """
+        roots = [os.fspath(roots)] if isinstance(roots, (str, os.PathLike)) else [os.fspath(r) for r in roots]
+        self._seen = {}
+        self.changed = set()
+        yield from ParallelScanner(index=self, **options).scan(roots)  # type: ignore[arg-type]
+        self.commit([root for root in roots if root in self._seen])
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> ScanIndex:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
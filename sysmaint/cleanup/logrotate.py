@@ -0,0 +1,255 @@
+"""Log rotation and streaming compression.
+
+Rotation only renames files, so it runs inline; compression of the rotated
+files is spread over a process pool, one file per task, which uses every
+core without contending for the GIL.
+
+A daemon holding the log open keeps writing into the renamed file until it
+is told to reopen its log, so rotation follows logrotate's safeguards: a
+``postrotate`` command or callback runs once after all logs are renamed
+(to signal or reload the daemons), and by default the newest generation
+``.1`` stays uncompressed until the next rotation moves it to ``.2``
+("delaycompress"), so late writes into it are kept.  For daemons that
+cannot reopen their logs, ``copytruncate`` copies the log to ``.1`` and
+truncates it in place instead of renaming it; lines written between the
+copy and the truncation are lost.
+
+Files are streamed through the compressor in fixed-size chunks, so memory
+stays at a few chunks per worker regardless of file size.  An
+:class:`~sysmaint.cleanup.throttle.AdaptiveThrottle` can hold back how many
+files are compressed at once while the disks are busy.  Output is written
+to a temporary name and renamed into place once complete; the source is
+removed only after that.
+
+zstd is used when the optional ``zstandard`` package is installed and gzip
+otherwise.
+"""
+
+from __future__ import annotations
+
+import gzip
+import importlib.util
+import logging
+import os
+import shutil
+import subprocess
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING
+
+from sysmaint._compat import require
+from sysmaint.profiling import phase
+
+if TYPE_CHECKING:
+    from sysmaint.cleanup.throttle import AdaptiveThrottle
+
+__all__ = ["CODECS", "CompressResult", "LogRotator", "available_codec", "compress_file", "rotate"]
+
+logger = logging.getLogger(__name__)
+
+CODECS = {"zstd": ".zst", "gzip": ".gz"}
+DEFAULT_CHUNK = 1 << 20
+
+
+def available_codec(preferred: str = "zstd") -> str:
+    """Return ``preferred`` if it can be used here, else ``"gzip"``."""
+    if preferred == "zstd" and importlib.util.find_spec("zstandard") is None:
+        return "gzip"
+    if preferred not in CODECS:
+        raise ValueError(f"unknown codec {preferred!r}")
+    return preferred
+
+
+@dataclass(frozen=True)
+class CompressResult:
+    source: str
+    output: str
+    bytes_in: int
+    bytes_out: int
+    seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+
+
+def compress_file(
+    path: str,
+    codec: str = "gzip",
+    *,
+    level: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK,
+    remove: bool = True,
+) -> CompressResult:
+    """Compress ``path`` to ``path + suffix`` in ``chunk_size`` pieces.
+
+    Mode and timestamps are copied to the output.  With ``remove`` the
+    source is deleted once the output is complete.
+    """
+    output = path + CODECS[codec]
+    tmp = output + ".tmp"
+    started = time.perf_counter()
+    bytes_in = 0
+    with open(path, "rb") as src, open(tmp, "wb") as raw:
+        try:
+            if codec == "zstd":
+                zstandard = require("zstandard", "zstd compression")
+                sink = zstandard.ZstdCompressor(level=3 if level is None else level).stream_writer(raw, closefd=False)
+            else:
+                sink = gzip.GzipFile(
+                    filename=os.path.basename(path),
+                    mode="wb",
+                    fileobj=raw,
+                    compresslevel=6 if level is None else level,
+                    mtime=int(os.fstat(src.fileno()).st_mtime),
+                )
+            with sink:
+                while chunk := src.read(chunk_size):
+                    sink.write(chunk)
+                    bytes_in += len(chunk)
+            raw.flush()
+            os.fsync(raw.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    shutil.copystat(path, tmp)
+    os.replace(tmp, output)
+    if remove:
+        os.unlink(path)
+    return CompressResult(path, output, bytes_in, os.path.getsize(output), time.perf_counter() - started)
+
+
+def rotate(path: str, keep: int = 7, *, create: bool = True, copytruncate: bool = False) -> str | None:
+    """Rotate ``path`` to ``path.1``, shifting older generations up by one.
+
+    Generations are recognised with or without a compression suffix; the
+    oldest beyond ``keep`` is deleted.  With ``create`` an empty file with
+    the original mode and ownership takes the place of the log.  With
+    ``copytruncate`` the log is copied to ``path.1`` and truncated instead
+    of renamed, so writers keep their file.  Returns the rotated file, or
+    None if ``path`` is missing or empty.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if st.st_size == 0:
+        return None
+    suffixes = ("", *CODECS.values())
+    for n in range(keep, 0, -1):
+        for suffix in suffixes:
+            src = f"{path}.{n}{suffix}"
+            if not os.path.exists(src):
+                continue
+            if n == keep:
+                os.unlink(src)
+            else:
+                os.replace(src, f"{path}.{n + 1}{suffix}")
+    rotated = f"{path}.1"
+    if copytruncate:
+        tmp = rotated + ".tmp"
+        shutil.copyfile(path, tmp)
+        shutil.copystat(path, tmp)
+        os.replace(tmp, rotated)
+        os.truncate(path, 0)
+    else:
+        os.replace(path, rotated)
+    if create and not copytruncate:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, st.st_mode & 0o7777)
+        try:
+            if hasattr(os, "fchown"):
+                try:
+                    os.fchown(fd, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+        finally:
+            os.close(fd)
+    return rotated
+
+
+class LogRotator:
+    """Rotate logs and compress the rotated files on a process pool.
+
+    ``codec`` defaults to the best one available (see
+    :func:`available_codec`).  ``workers`` bounds the number of files
+    compressed at once; with ``throttle`` (started by the caller) a file is
+    only handed to the pool while one of its slots is free.
+
+    ``postrotate`` is a shell command, or a callable given the rotated
+    logs, run once after renaming and before compressing; if it fails
+    nothing is compressed.  With ``delaycompress`` (the default) the
+    generation compressed is ``.2``, the one the previous rotation left,
+    rather than the ``.1`` just made.  ``copytruncate`` is passed to
+    :func:`rotate`.
+    """
+
+    def __init__(
+        self,
+        *,
+        codec: str | None = None,
+        level: int | None = None,
+        keep: int = 7,
+        workers: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK,
+        throttle: AdaptiveThrottle | None = None,
+        postrotate: str | Callable[[list[str]], None] | None = None,
+        delaycompress: bool = True,
+        copytruncate: bool = False,
+    ) -> None:
+        self.codec = codec or available_codec()
+        self.level = level
+        self.keep = keep
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.throttle = throttle
+        self.postrotate = postrotate
+        self.delaycompress = delaycompress
+        self.copytruncate = copytruncate
+
+    def compress(self, paths: Iterable[str]) -> list[CompressResult]:
+        """Compress ``paths`` in parallel, removing each source when done."""
+        paths = list(paths)
+        if not paths:
+            return []
+        with phase("compress"):
+            return self._compress(paths)
+
+    def _compress(self, paths: list[str]) -> list[CompressResult]:
+        job = partial(compress_file, codec=self.codec, level=self.level, chunk_size=self.chunk_size)
+        throttle = self.throttle
+        if len(paths) == 1 or self.workers == 1:
+            if throttle is None:
+                return [job(path) for path in paths]
+            results = []
+            for path in paths:
+                with throttle.slot():
+                    results.append(job(path))
+            return results
+        with ProcessPoolExecutor(min(self.workers, len(paths))) as pool:
+            if throttle is None:
+                return list(pool.map(job, paths))
+            futures = []
+            for path in paths:
+                throttle.acquire()
+                future = pool.submit(job, path)
+                future.add_done_callback(lambda _: throttle.release())
+                futures.append(future)
+            return [future.result() for future in futures]
+
+    def rotate(self, paths: Iterable[str]) -> list[CompressResult]:
+        """Rotate every log in ``paths`` and compress the generations due."""
+        with phase("rotate"):
+            logs = [path for path in paths if rotate(path, self.keep, copytruncate=self.copytruncate) is not None]
+        if not logs:
+            return []
+        with phase("postrotate"):
+            if callable(self.postrotate):
+                self.postrotate(logs)
+            elif self.postrotate is not None:
+                logger.debug("running postrotate: %s", self.postrotate)
+                subprocess.run(self.postrotate, shell=True, check=True, stdin=subprocess.DEVNULL)
+        generation = 2 if self.delaycompress else 1
+        return self.compress(p for p in (f"{log}.{generation}" for log in logs) if os.path.isfile(p))
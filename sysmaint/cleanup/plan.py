@@ -0,0 +1,198 @@
+"""Cleanup plans: scan once, review, then delete without scanning again.
+
+A :class:`Plan` records the files a scan selected together with the stat
+fields that identify them (device, inode, size, mtime) and the totals they
+add up to.  It is written to a small binary file, reviewed or approved, and
+applied later by :func:`apply_plan`, which hands the records to a
+:class:`~sysmaint.cleanup.delete.DeletionPipeline` with ``verify`` on: each
+file is stat'ed once more just before it is unlinked and left alone if it
+is no longer the file that was planned.  Approval followed by deletion then
+costs one tree walk instead of the two of a dry run followed by a real run.
+
+Records are kept column-wise in :mod:`array` buffers, and paths are front
+coded (each stores only what differs from the previous path, which the
+scanner's per-directory batches make short), so even a plan of millions of
+files stays compact in memory and on disk.  The file layout, all integers
+little-endian, is::
+
+    header   magic "SMPL", version, created, files, bytes, disk bytes,
+             length of the roots, length of the body
+    roots    NUL-separated root paths
+    body     zlib: device, inode, size and blocks columns (u64), mtime_ns
+             (i64), shared prefix lengths (u16) and the NUL-terminated
+             remainders of the paths
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from sysmaint.cleanup.delete import DeletionPipeline, DeletionStats
+from sysmaint.cleanup.scanner import ScanEntry
+
+__all__ = ["Plan", "apply_plan"]
+
+_MAGIC = b"SMPL"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBdQQQII")
+_MAX_PREFIX = 0xFFFF
+
+
+def _shared(a: bytes, b: bytes) -> int:
+    """Length of the common prefix of ``a`` and ``b`` (bisected, capped)."""
+    lo, hi = 0, min(len(a), len(b), _MAX_PREFIX)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class Plan:
+    """Files selected for deletion, with the guards needed to delete them later."""
+
+    def __init__(self, roots: Iterable[str] = (), *, created: float | None = None) -> None:
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.created = time.time() if created is None else created
+        self.bytes = 0
+        self.disk_bytes = 0
+        self._dev = array("Q")
+        self._inode = array("Q")
+        self._size = array("Q")
+        self._blocks = array("Q")
+        self._mtime = array("q")
+        self._prefix = array("H")
+        self._names = bytearray()
+        self._last = b""
+
+    @classmethod
+    def build(cls, entries: Iterable[ScanEntry], roots: Iterable[str] = ()) -> Plan:
+        """A plan of ``entries``, typically the output of a scan of ``roots``."""
+        plan = cls(roots)
+        for entry in entries:
+            plan.add(entry)
+        return plan
+
+    def add(self, entry: ScanEntry) -> None:
+        path = os.fsencode(entry.path)
+        shared = _shared(path, self._last)
+        self._prefix.append(shared)
+        self._names += path[shared:]
+        self._names.append(0)
+        self._last = path
+        self._dev.append(entry.dev)
+        self._inode.append(entry.inode)
+        self._size.append(entry.size)
+        self._blocks.append(entry.blocks)
+        self._mtime.append(entry.mtime_ns)
+        self.bytes += entry.size
+        self.disk_bytes += entry.disk_bytes
+
+    @property
+    def files(self) -> int:
+        return len(self._prefix)
+
+    def __len__(self) -> int:
+        return len(self._prefix)
+
+    def __iter__(self) -> Iterator[ScanEntry]:
+        """Yield the planned files as scan records (``atime_ns`` is not kept)."""
+        names = self._names
+        path = b""
+        start = 0
+        for i, shared in enumerate(self._prefix):
+            end = names.index(0, start)
+            path = path[:shared] + names[start:end]
+            start = end + 1
+            yield ScanEntry(
+                os.fsdecode(path), self._size[i], self._mtime[i], 0, self._inode[i], self._dev[i], self._blocks[i]
+            )
+
+    def _columns(self) -> list[array]:
+        return [self._dev, self._inode, self._size, self._blocks, self._mtime, self._prefix]
+
+    def to_bytes(self) -> bytes:
+        parts = []
+        for column in self._columns():
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        parts.append(bytes(self._names))
+        body = zlib.compress(b"".join(parts), 6)
+        roots = b"\0".join(os.fsencode(root) for root in self.roots)
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, self.created, self.files, self.bytes, self.disk_bytes, len(roots), len(body)
+        )
+        return header + roots + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Plan:
+        if len(data) < _HEADER.size:
+            raise ValueError("truncated cleanup plan")
+        magic, version, created, files, total, disk, roots_len, body_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("not a cleanup plan")
+        if version != _VERSION:
+            raise ValueError(f"unsupported cleanup plan version {version}")
+        offset = _HEADER.size
+        if len(data) != offset + roots_len + body_len:
+            raise ValueError("truncated cleanup plan")
+        roots = data[offset : offset + roots_len]
+        plan = cls([os.fsdecode(root) for root in roots.split(b"\0")] if roots else [], created=created)
+        try:
+            body = zlib.decompress(data[offset + roots_len :])
+        except zlib.error as exc:
+            raise ValueError(f"corrupt cleanup plan: {exc}") from None
+        view = memoryview(body)
+        position = 0
+        for column in plan._columns():
+            end = position + files * column.itemsize
+            if end > len(body):
+                raise ValueError("corrupt cleanup plan: short column")
+            column.frombytes(view[position:end])
+            if sys.byteorder == "big":
+                column.byteswap()
+            position = end
+        plan._names = bytearray(view[position:])
+        if plan._names.count(0) != files:
+            raise ValueError("corrupt cleanup plan: path count does not match")
+        plan.bytes, plan.disk_bytes = total, disk
+        return plan
+
+    def dump(self, path: str) -> int:
+        """Write the plan to ``path`` atomically; returns its size in bytes."""
+        data = self.to_bytes()
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    @classmethod
+    def load(cls, path: str) -> Plan:
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def __repr__(self) -> str:
+        return f"Plan({self.files} files, {self.bytes} bytes, roots={self.roots!r})"
+
+
+def apply_plan(plan: Plan, *, prune: bool = False, **options: Any) -> DeletionStats:
+    """Delete the files of ``plan`` that are unchanged since it was made.
+
+    ``options`` are passed to :class:`DeletionPipeline`; with ``prune``,
+    directories emptied below the plan's roots are removed.  Files that
+    changed are counted in ``DeletionStats.changed``.
+    """
+    pipeline = DeletionPipeline(verify=True, prune_under=plan.roots if prune else (), **options)
+    return pipeline.run(plan)
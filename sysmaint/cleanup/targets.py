@@ -0,0 +1,372 @@
+"""Cleanup targets: package caches, temporary files, the journal and images.
+
+A :class:`Target` is one place a maintenance window reclaims space from, and
+declares the lane it runs in.  ``io`` targets (:class:`DirectoryTarget`)
+remove files themselves with the scanner and a :class:`DeletionPipeline`;
+``subprocess`` targets (:class:`CommandTarget`) spend their time waiting on
+a tool such as ``apt-get``, ``journalctl`` or ``docker``.  :func:`run_targets`
+starts every target at once on one bounded thread pool per lane, so a slow
+``docker image prune`` overlaps with emptying pip's cache and the window
+takes about as long as its slowest target instead of the sum of all of them.
+
+Targets whose directories or tools are missing on the host are skipped.
+Space freed by a tool is taken from its output where it reports it and is
+otherwise measured as the shrinkage of the directories it manages.
+
+The built-in targets are registered by name in :data:`TARGETS`; further
+ones are added with :func:`register`:
+
+    ==========  ==========  ==============================================
+    apt         subprocess  ``apt-get clean``
+    dnf         subprocess  ``dnf clean packages``
+    pip         io          pip's HTTP and wheel cache
+    npm         io          npm's content cache (``~/.npm/_cacache``)
+    tmp         io          files in ``/tmp`` unused for ``tmp_days``
+    journal     subprocess  ``journalctl --vacuum-size/--vacuum-time``
+    containers  subprocess  ``docker`` (or ``podman``) ``image prune -f``
+    ==========  ==========  ==============================================
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import time
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any
+
+from sysmaint.cleanup.delete import DeletionPipeline
+from sysmaint.cleanup.scanner import ScanEntry, older_than, scan
+
+__all__ = [
+    "TARGETS",
+    "CommandTarget",
+    "DirectoryTarget",
+    "Target",
+    "TargetResult",
+    "make_targets",
+    "register",
+    "run_targets",
+]
+
+DEFAULT_LIMITS = {"io": 4, "subprocess": 4}
+
+
+@dataclass
+class TargetResult:
+    """Outcome of one target; ``bytes`` is what was (or would be) freed."""
+
+    target: str
+    kind: str
+    ok: bool = True
+    skipped: bool = False
+    files: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+    error: str | None = None
+    detail: str = ""
+
+
+class Target:
+    """Base class for cleanup targets.
+
+    Subclasses set ``name`` and ``kind`` (the lane: ``"io"`` or
+    ``"subprocess"``) and implement :meth:`run`.  :meth:`available` returns
+    false when the target does not apply to this host.
+    """
+
+    name: str
+    kind: str = "io"
+
+    def available(self) -> bool:
+        return True
+
+    def run(self, *, dry_run: bool = False) -> TargetResult:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class DirectoryTarget(Target):
+    """Delete the files under ``paths``, keeping the ``paths`` themselves.
+
+    ``pattern`` restricts deletion to matching file names and ``max_age``
+    (seconds) to files neither modified nor, with ``use_atime``, accessed in
+    that time.  Subdirectories whose names match one of ``keep_dirs`` are
+    not entered.  Directories emptied below ``paths`` are removed.  Files
+    are deleted with ``verify`` on (see
+    :class:`~sysmaint.cleanup.delete.DeletionPipeline`), so one replaced
+    since the scan is left alone.
+    """
+
+    kind = "io"
+
+    def __init__(
+        self,
+        name: str,
+        paths: Iterable[str],
+        *,
+        pattern: str | None = None,
+        max_age: float | None = None,
+        use_atime: bool = False,
+        keep_dirs: Sequence[str] = (),
+        workers: int = 4,
+    ) -> None:
+        self.name = name
+        # Resolved, since the deletion pipeline refuses paths through symlinks.
+        self.paths = [os.path.realpath(path) for path in paths]
+        self.pattern = pattern
+        self.max_age = max_age
+        self.use_atime = use_atime
+        self.keep_dirs = tuple(keep_dirs)
+        self.workers = workers
+
+    def _roots(self) -> list[str]:
+        return [path for path in self.paths if os.path.isdir(path)]
+
+    def available(self) -> bool:
+        return bool(self._roots())
+
+    def _predicate(self) -> Callable[[ScanEntry], bool] | None:
+        checks = []
+        if self.max_age is not None:
+            checks.append(older_than(self.max_age, use_atime=self.use_atime))
+        if self.pattern is not None:
+            pattern = self.pattern
+            checks.append(lambda entry: fnmatch.fnmatch(os.path.basename(entry.path), pattern))
+        if not checks:
+            return None
+        return lambda entry: all(check(entry) for check in checks)
+
+    def run(self, *, dry_run: bool = False) -> TargetResult:
+        roots = self._roots()
+        keep = self.keep_dirs
+        entries = scan(
+            roots,
+            workers=self.workers,
+            predicate=self._predicate(),
+            skip_dir=(lambda path: any(fnmatch.fnmatch(os.path.basename(path), k) for k in keep)) if keep else None,
+        )
+        # These trees are often writable by every user (/tmp), so each file is
+        # checked to still be the one scanned before it is unlinked.
+        pipeline = DeletionPipeline(workers=self.workers, prune_under=roots, dry_run=dry_run, verify=True)
+        stats = pipeline.run(entries)
+        return TargetResult(
+            self.name,
+            self.kind,
+            ok=not stats.errors,
+            files=stats.files,
+            bytes=stats.bytes,
+            error=f"{stats.errors} files could not be removed" if stats.errors else None,
+            detail=", ".join(roots),
+        )
+
+
+class CommandTarget(Target):
+    """Run a cleanup tool, killing it after ``timeout`` seconds.
+
+    Freed space is ``parse(stdout)`` when ``parse`` is given and returns a
+    number, and otherwise the shrinkage of the ``measure`` directories.  A
+    dry run only reports the command it would have run.
+    """
+
+    kind = "subprocess"
+
+    def __init__(
+        self,
+        name: str,
+        argv: Sequence[str],
+        *,
+        measure: Iterable[str] = (),
+        parse: Callable[[str], int | None] | None = None,
+        timeout: float | None = 600.0,
+    ) -> None:
+        self.name = name
+        self.argv = list(argv)
+        self.measure = list(measure)
+        self.parse = parse
+        self.timeout = timeout
+
+    def available(self) -> bool:
+        return shutil.which(self.argv[0]) is not None
+
+    def _usage(self) -> int:
+        roots = [path for path in self.measure if os.path.isdir(path)]
+        return sum(entry.disk_bytes for entry in scan(roots, workers=4)) if roots else 0
+
+    def run(self, *, dry_run: bool = False) -> TargetResult:
+        command = shlex.join(self.argv)
+        if dry_run:
+            return TargetResult(self.name, self.kind, detail=f"would run: {command}")
+        before = self._usage() if self.measure else 0
+        try:
+            proc = subprocess.run(
+                self.argv, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            return TargetResult(self.name, self.kind, ok=False, error=f"timed out after {self.timeout:g}s")
+        if proc.returncode:
+            lines = (proc.stderr or proc.stdout).strip().splitlines()
+            error = f"exit status {proc.returncode}" + (f": {lines[-1]}" if lines else "")
+            return TargetResult(self.name, self.kind, ok=False, error=error, detail=command)
+        freed = self.parse(proc.stdout) if self.parse is not None else None
+        if freed is None and self.measure:
+            freed = max(0, before - self._usage())
+        return TargetResult(self.name, self.kind, bytes=freed or 0, detail=command)
+
+
+_UNITS = {"B": 1, "kB": 10**3, "KB": 10**3, "MB": 10**6, "GB": 10**9, "TB": 10**12}
+_RECLAIMED = re.compile(r"Total reclaimed space:\s*([\d.]+)\s*([kKMGT]?B)")
+
+
+def _reclaimed(output: str) -> int | None:
+    """Parse docker's ``Total reclaimed space: 1.2GB`` (decimal units)."""
+    match = _RECLAIMED.search(output)
+    if match is None:
+        return None
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def _cache_home() -> str:
+    return os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+
+TARGETS: dict[str, Callable[..., Target]] = {}
+
+
+def register(name: str) -> Callable[[Callable[..., Target]], Callable[..., Target]]:
+    """Decorator registering a target factory under ``name``.
+
+    Factories are called with the keyword options given to
+    :func:`make_targets` and must accept (and may ignore) any of them.
+    """
+
+    def decorate(factory: Callable[..., Target]) -> Callable[..., Target]:
+        TARGETS[name] = factory
+        return factory
+
+    return decorate
+
+
+@register("apt")
+def _apt(*, timeout: float | None = 600.0, **_: Any) -> Target:
+    return CommandTarget("apt", ["apt-get", "clean"], measure=["/var/cache/apt/archives"], timeout=timeout)
+
+
+@register("dnf")
+def _dnf(*, timeout: float | None = 600.0, **_: Any) -> Target:
+    return CommandTarget("dnf", ["dnf", "clean", "packages"], measure=["/var/cache/dnf"], timeout=timeout)
+
+
+@register("pip")
+def _pip(**_: Any) -> Target:
+    root = os.environ.get("PIP_CACHE_DIR") or os.path.join(_cache_home(), "pip")
+    return DirectoryTarget("pip", [os.path.join(root, name) for name in ("http", "http-v2", "wheels")])
+
+
+@register("npm")
+def _npm(**_: Any) -> Target:
+    root = os.environ.get("npm_config_cache") or os.path.expanduser("~/.npm")
+    return DirectoryTarget("npm", [os.path.join(root, "_cacache")])
+
+
+@register("tmp")
+def _tmp(*, tmp_days: float = 10.0, **_: Any) -> Target:
+    # Like systemd-tmpfiles: only files neither written nor read for the
+    # whole period, and never the X11/ICE socket dirs or private tmp dirs.
+    return DirectoryTarget(
+        "tmp",
+        ["/tmp"],
+        max_age=tmp_days * 86400,
+        use_atime=True,
+        keep_dirs=(".X11-unix", ".ICE-unix", ".XIM-unix", ".font-unix", "systemd-private-*"),
+    )
+
+
+@register("journal")
+def _journal(
+    *, journal_size: str | None = "500M", journal_time: str | None = None, timeout: float | None = 600.0, **_: Any
+) -> Target:
+    argv = ["journalctl"]
+    if journal_size:
+        argv.append(f"--vacuum-size={journal_size}")
+    if journal_time:
+        argv.append(f"--vacuum-time={journal_time}")
+    return CommandTarget("journal", argv, measure=["/var/log/journal", "/run/log/journal"], timeout=timeout)
+
+
+@register("containers")
+def _containers(*, timeout: float | None = 600.0, **_: Any) -> Target:
+    tool = "docker" if shutil.which("docker") or not shutil.which("podman") else "podman"
+    return CommandTarget("containers", [tool, "image", "prune", "-f"], parse=_reclaimed, timeout=timeout)
+
+
+def make_targets(names: Iterable[str] | None = None, **options: Any) -> list[Target]:
+    """Build the registered targets called ``names`` (default: all of them)."""
+    targets = []
+    for name in TARGETS if names is None else names:
+        factory = TARGETS.get(name)
+        if factory is None:
+            raise ValueError(f"unknown cleanup target {name!r} (known: {', '.join(sorted(TARGETS))})")
+        targets.append(factory(**options))
+    return targets
+
+
+def _run(target: Target, dry_run: bool) -> TargetResult:
+    started = time.perf_counter()
+    try:
+        if not target.available():
+            result = TargetResult(target.name, target.kind, skipped=True, detail="not present on this host")
+        else:
+            result = target.run(dry_run=dry_run)
+    except Exception as exc:
+        result = TargetResult(target.name, target.kind, ok=False, error=f"{type(exc).__name__}: {exc}")
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_targets(
+    targets: Iterable[Target],
+    *,
+    dry_run: bool = False,
+    limits: Mapping[str, int] | None = None,
+    on_result: Callable[[TargetResult], None] | None = None,
+) -> list[TargetResult]:
+    """Run ``targets`` concurrently, each on the pool of its lane.
+
+    ``limits`` maps lanes to their number of threads (see
+    :data:`DEFAULT_LIMITS`).  ``on_result`` is called as each target
+    finishes; the returned results are in the order of ``targets``.  A
+    target that raises yields a failed result and does not stop the others.
+    """
+    targets = list(targets)
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    for target in targets:
+        if target.kind not in limits:
+            raise ValueError(f"target {target.name!r} uses unknown lane {target.kind!r}")
+    executors: dict[str, ThreadPoolExecutor] = {}
+    futures: dict[Future[TargetResult], int] = {}
+    results: list[TargetResult | None] = [None] * len(targets)
+    try:
+        for i, target in enumerate(targets):
+            executor = executors.get(target.kind)
+            if executor is None:
+                executor = executors[target.kind] = ThreadPoolExecutor(
+                    limits[target.kind], thread_name_prefix=f"sysmaint-{target.kind}"
+                )
+            futures[executor.submit(_run, target, dry_run)] = i
+        for future in as_completed(futures):
+            result = results[futures[future]] = future.result()
+            if on_result is not None:
+                on_result(result)
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+    return results  # type: ignore[return-value]
@@ -0,0 +1,236 @@
+"""Rate and concurrency limiting for cleanup workers.
+
+:class:`TokenBucket` caps a rate fixed in advance.  :class:`AdaptiveThrottle`
+instead follows the devices underneath: it limits how many workers run at
+once and moves that limit with the request latency and utilisation the
+kernel reports in /proc/diskstats.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+__all__ = ["AdaptiveThrottle", "DeviceLoad", "TokenBucket", "device_names"]
+
+logger = logging.getLogger(__name__)
+
+_LOAD_FIELDS = ("reads", "writes", "read_ms", "write_ms", "io_ms", "weighted_io_ms")
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled at ``rate`` tokens per second.
+
+    ``burst`` caps how many tokens accumulate while idle (one second's worth
+    by default).  Requests larger than the bucket are allowed and put it in
+    debt, so a single large request is delayed rather than refused.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens``, sleeping until they are available; returns the wait."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+@dataclass(frozen=True)
+class DeviceLoad:
+    """Load of the watched block devices over one sampling interval.
+
+    ``latency_ms`` is the mean time a completed request spent queued and in
+    service, ``util`` the fraction of the interval the device was busy and
+    ``queue`` the mean number of requests in flight; each is the worst over
+    the watched devices.
+    """
+
+    latency_ms: float = 0.0
+    util: float = 0.0
+    queue: float = 0.0
+
+
+def device_names(paths: Iterable[str], *, sysfs: str = "/sys") -> list[str]:
+    """Names of the block devices (whole disks, as in /proc/diskstats) holding ``paths``.
+
+    Paths on filesystems without a backing block device (tmpfs, overlay,
+    btrfs subvolumes) contribute nothing.
+    """
+    names = set()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        node = os.path.join(sysfs, "dev", "block", f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}")
+        if not os.path.exists(node):
+            continue
+        node = os.path.realpath(node)
+        if os.path.exists(os.path.join(node, "partition")):
+            node = os.path.dirname(node)
+        names.add(os.path.basename(node))
+    return sorted(names)
+
+
+class AdaptiveThrottle:
+    """Concurrency limit for maintenance workers that backs off under device load.
+
+    Workers take a slot (``with throttle.slot():``) around each unit of work;
+    at most :attr:`limit` slots are held at once.  While the throttle is
+    running (as a context manager, or between :meth:`start` and
+    :meth:`stop`), a thread samples /proc/diskstats through
+    :class:`~sysmaint.monitoring.collector.ProcCollector` every ``interval``
+    seconds and adjusts the limit AIMD-style: when the request latency of
+    any watched device exceeds ``target_latency_ms`` or its utilisation
+    exceeds ``max_util``, the limit is multiplied by ``decrease``; otherwise
+    it grows by one, up to ``max_workers``.  Maintenance thus takes the
+    headroom a device actually has instead of a fixed rate that is too slow
+    at night and too aggressive at peak.
+
+    ``devices`` are diskstats names (see :func:`device_names`); by default
+    every disk the collector reports is watched.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[str] | None = None,
+        *,
+        min_workers: int = 1,
+        max_workers: int = 8,
+        initial: int | None = None,
+        target_latency_ms: float = 20.0,
+        max_util: float = 0.9,
+        decrease: float = 0.5,
+        interval: float = 1.0,
+        root: str = "/proc",
+    ) -> None:
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError("need 1 <= min_workers <= max_workers")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.devices = list(devices) if devices is not None else None
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.target_latency_ms = target_latency_ms
+        self.max_util = max_util
+        self.decrease = decrease
+        self.interval = interval
+        self.root = root
+        self.limit = max(min_workers, min(max_workers, max_workers // 2 if initial is None else initial))
+        self.load = DeviceLoad()
+        self.backoffs = 0
+        self._active = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def update(self, load: DeviceLoad) -> int:
+        """Apply one AIMD step for ``load`` and return the new limit."""
+        with self._cond:
+            self.load = load
+            if load.latency_ms > self.target_latency_ms or load.util > self.max_util:
+                limit = max(self.min_workers, int(self.limit * self.decrease))
+                if limit < self.limit:
+                    self.backoffs += 1
+            else:
+                limit = min(self.max_workers, self.limit + 1)
+            if limit != self.limit:
+                logger.debug("throttle %d -> %d workers (%s)", self.limit, limit, load)
+                self.limit = limit
+                self._cond.notify_all()
+            return limit
+
+    def _load(self, before: Mapping[str, int], after: Mapping[str, int], elapsed: float) -> DeviceLoad:
+        devices = self.devices
+        if devices is None:
+            devices = [key[5:-6] for key in after if key.startswith("disk.") and key.endswith(".reads")]
+        worst = DeviceLoad()
+        for dev in devices:
+            prefix = f"disk.{dev}."
+            try:
+                delta = {f: after[prefix + f] - before[prefix + f] for f in _LOAD_FIELDS}
+            except KeyError:
+                continue
+            requests = delta["reads"] + delta["writes"]
+            latency = (delta["read_ms"] + delta["write_ms"]) / requests if requests > 0 else 0.0
+            util = delta["io_ms"] / (elapsed * 1000) if elapsed > 0 else 0.0
+            queue = delta["weighted_io_ms"] / (elapsed * 1000) if elapsed > 0 else 0.0
+            worst = DeviceLoad(max(worst.latency_ms, latency), max(worst.util, util), max(worst.queue, queue))
+        return worst
+
+    def _run(self) -> None:
+        from sysmaint.monitoring.collector import ProcCollector
+
+        with ProcCollector(self.root) as collector:
+            before = dict(collector.collect())
+            stamp = time.monotonic()
+            while not self._stopping.wait(self.interval):
+                after = dict(collector.collect())
+                now = time.monotonic()
+                self.update(self._load(before, after, now - stamp))
+                before, stamp = after, now
+
+    def start(self) -> AdaptiveThrottle:
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="sysmaint-throttle", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> AdaptiveThrottle:
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
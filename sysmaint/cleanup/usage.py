@@ -0,0 +1,268 @@
+"""Per-directory disk usage tree, kept current incrementally.
+
+The tree holds, for every directory that (transitively) contains files, the
+bytes and file count of the files directly inside it and the totals of its
+whole subtree.  A full build streams one scan through
+:class:`~sysmaint.cleanup.scanner.ParallelScanner` and folds totals
+bottom-up once at the end.  After that, :meth:`UsageTree.refresh` re-lists
+only the directories known to have changed (from a change feed, which also
+reports files modified in place) and pushes the difference up to the
+ancestors, so answering "largest 50 directories under /var" never touches
+the disk.
+
+A file that grows in place does not change its directory's mtime, so the
+directories a scan index reports as changed are not enough to keep sizes
+current.  A rebuild through an index (``scan(roots, index=...)``) instead
+skips listing the unchanged directories but still stats every file in
+them, which costs a fraction of a full walk and counts every file at its
+current size.
+
+Sizes are allocated bytes (``st_blocks``), as ``du`` reports them, unless
+the tree is created with ``apparent=True``.  Hard-linked files are counted
+once per link.  Trees persist to a small SQLite file holding only the
+per-directory figures; subtree totals are recomputed on load.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import sqlite3
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from sysmaint.cleanup.scanner import ParallelScanner, ScanEntry
+
+if TYPE_CHECKING:
+    from sysmaint.cleanup.index import ScanIndex
+
+__all__ = ["UsageTree"]
+
+
+class _Node:
+    __slots__ = ("own_bytes", "own_files", "total_bytes", "total_files", "children")
+
+    def __init__(self) -> None:
+        self.own_bytes = 0
+        self.own_files = 0
+        self.total_bytes = 0
+        self.total_files = 0
+        self.children: set[str] = set()
+
+
+def _depth(path: str) -> int:
+    return path.count("/")
+
+
+def _ancestors(path: str) -> Iterator[str]:
+    parent = os.path.dirname(path)
+    while parent != path:
+        yield parent
+        path, parent = parent, os.path.dirname(parent)
+
+
+class UsageTree:
+    """Aggregated disk usage per directory.
+
+    Paths are absolute and normalised.  Every tracked directory has its
+    ancestors tracked too, up to ``/``, so totals can be asked for at any
+    level above the scanned roots.
+    """
+
+    def __init__(self, *, apparent: bool = False) -> None:
+        self.apparent = apparent
+        self._nodes: dict[str, _Node] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.abspath(path) in self._nodes
+
+    def _size(self, entry: ScanEntry) -> int:
+        return entry.size if self.apparent else entry.disk_bytes
+
+    # -- queries ---------------------------------------------------------
+
+    def usage(self, path: str) -> tuple[int, int]:
+        """Total ``(bytes, files)`` below ``path``; zeros if untracked."""
+        node = self._nodes.get(os.path.abspath(path))
+        return (node.total_bytes, node.total_files) if node else (0, 0)
+
+    def largest(self, n: int, under: str | None = None) -> list[tuple[str, int]]:
+        """The ``n`` directories with the most bytes below them, largest first.
+
+        With ``under`` only strict descendants of that directory qualify.
+        """
+        items = self._nodes.items()
+        if under is not None:
+            under = os.path.abspath(under)
+            prefix = under.rstrip("/") + "/"
+            items = ((path, node) for path, node in items if path.startswith(prefix) and path != under)
+        return [(path, size) for size, path in heapq.nlargest(n, ((node.total_bytes, path) for path, node in items))]
+
+    # -- building --------------------------------------------------------
+
+    def scan(self, roots: str | Iterable[str], *, index: ScanIndex | None = None, **options: object) -> None:
+        """(Re)build the subtrees under ``roots`` from a full scan.
+
+        With ``index`` the scan is an incremental one through
+        :meth:`ScanIndex.scan` (see the module docstring), which commits the
+        index.  ``options`` are passed to :class:`ParallelScanner`.
+        """
+        roots = [os.path.abspath(r) for r in ([roots] if isinstance(roots, str) else roots)]
+        if index is not None:
+            entries = index.scan(roots, **options)
+        else:
+            entries = ParallelScanner(**options).scan(roots)  # type: ignore[arg-type]
+        own: dict[str, list[int]] = {}
+        for entry in entries:
+            counts = own.get(directory := os.path.dirname(entry.path))
+            if counts is None:
+                counts = own[directory] = [0, 0]
+            counts[0] += self._size(entry)
+            counts[1] += 1
+        for root in roots:
+            self.remove(root)
+        self._merge(own)
+
+    def _merge(self, own: dict[str, list[int]]) -> None:
+        """Attach fresh per-directory figures and fold them into the totals."""
+        nodes = self._nodes
+        fresh: dict[str, _Node] = {}
+        for path, (size, files) in own.items():
+            node = fresh[path] = _Node()
+            node.own_bytes = node.total_bytes = size
+            node.own_files = node.total_files = files
+        # Create missing intermediate directories between fresh nodes.
+        for path in list(fresh):
+            parent = os.path.dirname(path)
+            while parent != path and parent not in fresh and parent not in nodes:
+                fresh[parent] = _Node()
+                path, parent = parent, os.path.dirname(parent)
+        for path in sorted(fresh, key=_depth, reverse=True):
+            node = fresh[path]
+            parent = os.path.dirname(path)
+            if parent == path:
+                continue
+            parent_node = fresh.get(parent)
+            if parent_node is not None:
+                parent_node.total_bytes += node.total_bytes
+                parent_node.total_files += node.total_files
+                parent_node.children.add(path)
+        for path, node in fresh.items():
+            existing = nodes.get(path)
+            if existing is not None:
+                node.children |= existing.children
+            nodes[path] = node
+        # Fresh subtrees hanging below existing nodes: link them and
+        # propagate their totals up the existing ancestors.
+        for path, node in fresh.items():
+            parent = os.path.dirname(path)
+            if parent != path and parent not in fresh and parent in nodes:
+                nodes[parent].children.add(path)
+                self._propagate(parent, node.total_bytes, node.total_files)
+
+    def _propagate(self, path: str, size: int, files: int) -> None:
+        nodes = self._nodes
+        while True:
+            node = nodes[path]
+            node.total_bytes += size
+            node.total_files += files
+            parent = os.path.dirname(path)
+            if parent == path or parent not in nodes:
+                return
+            path = parent
+
+    # -- incremental updates ---------------------------------------------
+
+    def remove(self, path: str) -> None:
+        """Drop ``path`` and everything below it."""
+        path = os.path.abspath(path)
+        node = self._nodes.get(path)
+        if node is None:
+            return
+        parent = os.path.dirname(path)
+        if parent != path and parent in self._nodes:
+            self._nodes[parent].children.discard(path)
+            self._propagate(parent, -node.total_bytes, -node.total_files)
+        stack = [path]
+        while stack:
+            gone = self._nodes.pop(stack.pop(), None)
+            if gone is not None:
+                stack.extend(gone.children)
+
+    def refresh(self, directories: Iterable[str], **options: object) -> None:
+        """Re-list ``directories`` and update their figures in place.
+
+        Only the listed directories are read.  Subdirectories that appeared
+        since the last look are scanned in full and tracked even when they
+        hold no files; ones that disappeared are dropped.  ``options`` go to
+        the scanner used for new subdirectories.
+        """
+        new_dirs: list[str] = []
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            size = files = 0
+            subdirs: set[str] = set()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            size += st.st_size if self.apparent else st.st_blocks * 512
+                            files += 1
+            except (FileNotFoundError, NotADirectoryError):
+                self.remove(directory)
+                continue
+            node = self._nodes.get(directory)
+            if node is None:
+                new_dirs.append(directory)
+                continue
+            self._propagate(directory, size - node.own_bytes, files - node.own_files)
+            node.own_bytes, node.own_files = size, files
+            for gone in node.children - subdirs:
+                self.remove(gone)
+            new_dirs.extend(subdirs - node.children)
+        if new_dirs:
+            # Scan only the outermost new directories; nested ones come along.
+            pending = set(new_dirs)
+            self.scan([path for path in pending if not any(a in pending for a in _ancestors(path))], **options)
+            # Directories without files get an empty node, so the next
+            # refresh of their parent does not take them for new again.
+            self._merge({path: [0, 0] for path in pending if path not in self._nodes})
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write the per-directory figures to ``path`` atomically."""
+        tmp = path + ".tmp"
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        db = sqlite3.connect(tmp)
+        try:
+            with db:
+                db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+                db.execute("INSERT INTO meta VALUES ('apparent', ?)", (str(int(self.apparent)),))
+                db.execute("CREATE TABLE usage (path BLOB PRIMARY KEY, own_bytes INTEGER, own_files INTEGER) WITHOUT ROWID")
+                db.executemany(
+                    "INSERT INTO usage VALUES (?, ?, ?)",
+                    ((os.fsencode(p), n.own_bytes, n.own_files) for p, n in self._nodes.items()),
+                )
+        finally:
+            db.close()
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> UsageTree:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'apparent'").fetchone()
+            tree = cls(apparent=bool(int(row[0])) if row else False)
+            own = {os.fsdecode(p): [size, files] for p, size, files in db.execute("SELECT * FROM usage")}
+        finally:
+            db.close()
+        tree._merge(own)
+        return tree
@@ -0,0 +1,856 @@
+"""Command line entry point: ``sysmaint <command> ...``.
+
+The entry point is run from cron and systemd timers many times a day, so it
+imports as little as possible up front.  Argument parsing needs only
+:mod:`argparse`; each command imports the subsystem it uses inside its
+handler, and heavy optional dependencies such as NumPy or zstandard load
+only in the commands that touch them.  ``benchmarks/startup.py`` guards the
+cold-start budget of ``status``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+__all__ = ["build_parser", "main"]
+
+
+def _human(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(n) < 1024 or unit == "TiB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n:.0f} B"
+        n /= 1024
+    raise AssertionError("unreachable")
+
+
+def _meminfo() -> dict[str, int]:
+    info = {}
+    with open("/proc/meminfo", "rb") as f:
+        for line in f:
+            key, _, rest = line.partition(b":")
+            info[key.decode()] = int(rest.split()[0]) * 1024
+    return info
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    """Print load, memory and root filesystem usage."""
+    rows = [("host", os.uname().nodename)]
+    try:
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        rows.append(("uptime", f"{int(uptime // 86400)}d {int(uptime % 86400 // 3600)}h {int(uptime % 3600 // 60)}m"))
+    except OSError:
+        pass
+    load = os.getloadavg()
+    rows.append(("load", f"{load[0]:.2f} {load[1]:.2f} {load[2]:.2f} ({os.cpu_count()} cpus)"))
+    try:
+        mem = _meminfo()
+    except OSError:
+        mem = {}
+    if "MemTotal" in mem:
+        total, avail = mem["MemTotal"], mem.get("MemAvailable", mem.get("MemFree", 0))
+        rows.append(("memory", f"{_human(avail)} available of {_human(total)} ({100 - 100 * avail / total:.0f}% used)"))
+    if mem.get("SwapTotal"):
+        total, free = mem["SwapTotal"], mem.get("SwapFree", 0)
+        rows.append(("swap", f"{_human(total - free)} used of {_human(total)}"))
+    for mount in args.mounts:
+        try:
+            st = os.statvfs(mount)
+        except OSError as exc:
+            rows.append((mount, f"unavailable ({exc.strerror or exc})"))
+            continue
+        total, free = st.f_blocks * st.f_frsize, st.f_bavail * st.f_frsize
+        used = total - st.f_bfree * st.f_frsize
+        pct = 100 * used / (used + free) if used + free else 0.0
+        rows.append((mount, f"{_human(free)} free of {_human(total)} ({pct:.0f}% used)"))
+    for key, value in rows:
+        print(f"{key:10} {value}")
+    return 0
+
+
+def cmd_collect(args: argparse.Namespace) -> int:
+    """Sample /proc counters, printing them or appending them to a store."""
+    from sysmaint.monitoring.collector import ProcCollector
+
+    store = None
+    if args.store:
+        from sysmaint.monitoring.store import SeriesStore
+
+        store = SeriesStore(args.store)
+    filesystems = health = None
+    if args.disks:
+        from sysmaint.monitoring.disks import DiskHealth, FilesystemStats
+
+        filesystems, health = FilesystemStats(), DiskHealth(ttl=args.smart_ttl)
+    sample: dict[str, float] = {}
+    with ProcCollector(args.proc) as collector:
+        n = 0
+        next_at = time.monotonic()
+        while args.count <= 0 or n < args.count:
+            collector.collect(sample)
+            if filesystems is not None and health is not None:
+                filesystems.collect(sample)
+                # Only the first sample waits for SMART; later ones use the
+                # cached values while stale disks refresh in the background.
+                health.collect(sample, wait=n == 0)
+            ts = time.time()
+            if store is not None:
+                store.append(ts, dict(sample))
+            else:
+                print(" ".join(f"{k}={v}" for k, v in sample.items()), flush=True)
+            n += 1
+            if args.count > 0 and n >= args.count:
+                break
+            next_at += args.interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+    if health is not None:
+        health.close()
+    if store is not None:
+        store.close()
+    return 0
+
+
+def cmd_disks(args: argparse.Namespace) -> int:
+    """Show SMART/NVMe health of the disks and usage of every filesystem."""
+    from sysmaint.monitoring.disks import DiskHealth, FilesystemStats
+
+    with DiskHealth(timeout=args.timeout, workers=args.workers) as health:
+        metrics = health.collect()
+    FilesystemStats(args.mounts or None).collect(metrics)
+    if args.json:
+        import json
+
+        print(json.dumps(metrics, indent=2, sort_keys=True))
+    else:
+        rows: dict[str, dict[str, float]] = {}
+        for key, value in metrics.items():
+            name, _, field = key.rpartition(".")
+            rows.setdefault(name, {})[field] = value
+        for name, fields in rows.items():
+            if name.startswith("fs."):
+                print(
+                    f"{name[3:]:24} {fields['used_pct']:5.1f}% used, {_human(fields['avail'])} free "
+                    f"of {_human(fields['total'])}"
+                )
+            else:
+                print(f"{name[6:]:24} " + " ".join(f"{field}={value:g}" for field, value in fields.items()))
+    failing = [key for key, value in metrics.items() if key.endswith(".healthy") and not value]
+    for key in failing:
+        print(f"warning: {key[6:-8]} reports a failing SMART status", file=sys.stderr)
+    return 1 if failing else 0
+
+
+def _scan_options(args: argparse.Namespace) -> dict[str, object]:
+    from sysmaint.cleanup.scanner import older_than
+
+    options: dict[str, object] = {"workers": args.workers}
+    if args.older_than is not None:
+        options["predicate"] = older_than(args.older_than * 86400)
+    return options
+
+
+def _scan(args: argparse.Namespace):
+    from sysmaint.cleanup.scanner import scan
+
+    # Resolved, since the deletion pipeline refuses paths through symlinks.
+    roots = [os.path.realpath(root) for root in args.roots]
+    if args.index:
+        from sysmaint.cleanup.index import ScanIndex
+
+        with ScanIndex(args.index) as index:
+            yield from index.scan(roots, **_scan_options(args))
+    else:
+        yield from scan(roots, **_scan_options(args))
+
+
+def cmd_scan(args: argparse.Namespace) -> int:
+    """List files under the roots, optionally only stale ones."""
+    count = total = 0
+    for entry in _scan(args):
+        count += 1
+        total += entry.size
+        if not args.quiet:
+            print(f"{entry.size}\t{entry.path}")
+    print(f"{count} files, {_human(total)}", file=sys.stderr)
+    return 0
+
+
+def _throttle(args: argparse.Namespace, paths: list[str], workers: int):
+    """An adaptive throttle for the devices under ``paths`` with ``--adaptive``, else a null context."""
+    if not args.adaptive:
+        return contextlib.nullcontext()
+    from sysmaint.cleanup.throttle import AdaptiveThrottle, device_names
+
+    return AdaptiveThrottle(
+        device_names(paths) or None,
+        max_workers=workers,
+        target_latency_ms=args.target_latency,
+        max_util=args.max_util,
+    )
+
+
+def _report_throttle(throttle) -> None:
+    if throttle is not None:
+        print(f"adaptive: backed off {throttle.backoffs} times, ended at {throttle.limit} workers", file=sys.stderr)
+
+
+def cmd_clean(args: argparse.Namespace) -> int:
+    """Delete stale files under the roots."""
+    from sysmaint.cleanup.delete import DeletionPipeline
+
+    with _throttle(args, args.roots, args.workers) as throttle:
+        pipeline = DeletionPipeline(
+            workers=args.workers,
+            max_files_per_sec=args.max_files_per_sec,
+            max_bytes_per_sec=args.max_bytes_per_sec,
+            prune_under=args.roots if args.prune else (),
+            dry_run=args.dry_run,
+            throttle=throttle,
+            on_error=lambda exc: print(f"error: {exc}", file=sys.stderr),
+        )
+        stats = pipeline.run(_scan(args))
+    _report_throttle(throttle)
+    verb = "would delete" if args.dry_run else "deleted"
+    print(
+        f"{verb} {stats.files} files ({_human(stats.bytes)}), removed {stats.dirs} dirs, "
+        f"{stats.errors} errors in {stats.elapsed:.1f}s "
+        f"({stats.files_per_sec:.0f} files/s, {_human(stats.bytes_per_sec)}/s)"
+    )
+    return 1 if stats.errors else 0
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    """Scan for stale files once and save them as a cleanup plan."""
+    from sysmaint.cleanup.plan import Plan
+
+    started = time.perf_counter()
+    plan = Plan.build(_scan(args), args.roots)
+    size = plan.dump(args.output)
+    print(
+        f"planned {plan.files} files, {_human(plan.bytes)} reclaimable ({_human(plan.disk_bytes)} on disk) "
+        f"in {time.perf_counter() - started:.1f}s; plan written to {args.output} ({_human(size)})"
+    )
+    return 0
+
+
+def cmd_apply(args: argparse.Namespace) -> int:
+    """Delete the files of a saved plan that have not changed since."""
+    from sysmaint.cleanup.plan import Plan, apply_plan
+
+    plan = Plan.load(args.plan)
+    age = (time.time() - plan.created) / 3600
+    print(f"plan of {plan.files} files, {_human(plan.bytes)}, made {age:.1f}h ago under {', '.join(plan.roots)}")
+    if args.list:
+        for entry in plan:
+            print(f"{entry.size}\t{entry.path}")
+        return 0
+    with _throttle(args, plan.roots, args.workers) as throttle:
+        stats = apply_plan(
+            plan,
+            prune=args.prune,
+            workers=args.workers,
+            max_files_per_sec=args.max_files_per_sec,
+            max_bytes_per_sec=args.max_bytes_per_sec,
+            dry_run=args.dry_run,
+            throttle=throttle,
+            on_error=lambda exc: print(f"error: {exc}", file=sys.stderr),
+        )
+    _report_throttle(throttle)
+    verb = "would delete" if args.dry_run else "deleted"
+    print(
+        f"{verb} {stats.files} files ({_human(stats.bytes)}), skipped {stats.changed} changed and "
+        f"{stats.missing} missing, removed {stats.dirs} dirs, {stats.errors} errors in {stats.elapsed:.1f}s"
+    )
+    return 1 if stats.errors else 0
+
+
+def cmd_du(args: argparse.Namespace) -> int:
+    """Show the directories using the most space."""
+    from sysmaint.cleanup.usage import UsageTree
+
+    roots = [os.path.abspath(root) for root in args.roots]
+    cached = args.cache and os.path.exists(args.cache) and not args.rebuild
+    tree = UsageTree.load(args.cache) if cached else UsageTree(apparent=args.apparent)
+    if tree.apparent != args.apparent:
+        counted = "file sizes" if tree.apparent else "allocated blocks"
+        print(f"{args.cache} counts {counted}; rescanning", file=sys.stderr)
+        cached = False
+        tree = UsageTree(apparent=args.apparent)
+    if args.index:
+        from sysmaint.cleanup.index import ScanIndex
+
+        # Unchanged directories are not listed again, but their files are
+        # stat'ed, so files that grew in place are counted at their size now.
+        with ScanIndex(args.index) as index:
+            if not cached:
+                index.reset()
+            tree.scan(roots, index=index, workers=args.workers)
+    elif cached:
+        written = time.strftime("%Y-%m-%d %H:%M", time.localtime(os.path.getmtime(args.cache)))
+        print(f"usage as cached at {written}; pass --index or --rebuild to update it", file=sys.stderr)
+    else:
+        tree.scan(roots, workers=args.workers)
+    if args.cache:
+        tree.save(args.cache)
+    for root in roots:
+        size, files = tree.usage(root)
+        print(f"{_human(size):>10}  {files:>10} files  {root}")
+        for path, size in tree.largest(args.top, under=root):
+            print(f"{_human(size):>10}  {path}")
+    return 0
+
+
+def cmd_dupes(args: argparse.Namespace) -> int:
+    """List groups of files with identical content."""
+    from sysmaint.cleanup.dedupe import DuplicateFinder, HashCache
+
+    cache = HashCache(args.cache) if args.cache else None
+    try:
+        finder = DuplicateFinder(workers=args.workers, min_size=args.min_size, cache=cache)
+        groups = finder.find(_scan(args))
+    finally:
+        if cache is not None:
+            cache.close()
+    for group in groups[: args.top] if args.top else groups:
+        print(f"{_human(group.reclaimable)} reclaimable, {group.inodes} copies of {_human(group.size)}")
+        for entry in group.entries:
+            print(f"  {entry.path}")
+    stats = finder.stats
+    print(
+        f"{len(groups)} groups, {_human(sum(g.reclaimable for g in groups))} reclaimable; "
+        f"{stats.files} files, {stats.partial_hashed} partial and {stats.full_hashed} full hashes, "
+        f"{stats.cache_hits} cached, {_human(stats.bytes_hashed)} read in {stats.elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def cmd_rotate(args: argparse.Namespace) -> int:
+    """Rotate logs and compress the older rotated generations."""
+    from sysmaint.cleanup.logrotate import LogRotator
+
+    workers = args.workers or os.cpu_count() or 1
+    with _throttle(args, args.logs, workers) as throttle:
+        rotator = LogRotator(
+            codec=args.codec,
+            keep=args.keep,
+            workers=workers,
+            throttle=throttle,
+            postrotate=args.postrotate,
+            delaycompress=args.delaycompress,
+            copytruncate=args.copytruncate,
+        )
+        for result in rotator.rotate(args.logs):
+            print(f"{result.output}\t{_human(result.bytes_in)} -> {_human(result.bytes_out)} ({result.ratio:.1f}x)")
+    _report_throttle(throttle)
+    return 0
+
+
+def cmd_purge(args: argparse.Namespace) -> int:
+    """Empty package caches, /tmp, the journal and unused container images."""
+    from sysmaint.cleanup.targets import TARGETS, make_targets, run_targets
+
+    if args.list:
+        for name, factory in TARGETS.items():
+            target = factory()
+            state = "available" if target.available() else "not present"
+            print(f"{name}\t{target.kind}\t{state}")
+        return 0
+    targets = make_targets(
+        args.targets or None,
+        tmp_days=args.tmp_days,
+        journal_size=args.journal_size,
+        journal_time=args.journal_time,
+        timeout=args.timeout,
+    )
+
+    def report(result) -> None:
+        if result.skipped:
+            status = "skipped"
+        elif not result.ok:
+            status = f"failed: {result.error}"
+        else:
+            status = f"{result.files} files, {_human(result.bytes)}" if result.files else _human(result.bytes)
+        print(f"{result.target}\t{result.kind}\t{result.elapsed:.1f}s\t{status}\t{result.detail}")
+
+    started = time.perf_counter()
+    limits = {"io": args.io_workers, "subprocess": args.subprocess_workers}
+    results = run_targets(targets, dry_run=args.dry_run, limits=limits, on_result=report)
+    verb = "would free" if args.dry_run else "freed"
+    print(
+        f"{verb} {_human(sum(r.bytes for r in results))} from {len(results)} targets in "
+        f"{time.perf_counter() - started:.1f}s (sum of target times {sum(r.elapsed for r in results):.1f}s)",
+        file=sys.stderr,
+    )
+    return 1 if any(not r.ok for r in results) else 0
+
+
+def _aggregate_cache(args: argparse.Namespace):
+    if not args.cache:
+        return None
+    from sysmaint.reporting.cache import AggregateCache
+
+    return AggregateCache(args.cache)
+
+
+def cmd_report(args: argparse.Namespace) -> int:
+    """Aggregate one metric from a store."""
+    from sysmaint.monitoring.store import SeriesStore
+    from sysmaint.reporting.render import bucket_rows
+
+    end = time.time() if args.end is None else args.end
+    start = end - args.hours * 3600
+    cache = _aggregate_cache(args)
+    rows = bucket_rows(
+        {args.host: SeriesStore(args.store)},
+        args.metric,
+        start,
+        end,
+        bucket=args.bucket,
+        reducer=args.reducer,
+        transform="rate" if args.rate else None,
+        cache=cache,
+    )
+    for host, stamp, value in rows:
+        print(f"{host}\t{stamp}\t{value:.6g}")
+    if cache is not None:
+        cache.close()
+    return 0
+
+
+def cmd_render(args: argparse.Namespace) -> int:
+    """Write a Markdown, HTML or CSV report over stores, job profiles and logs."""
+    from sysmaint.monitoring.store import SeriesStore
+    from sysmaint.profiling import read_profiles
+    from sysmaint.reporting.render import Section, bucket_rows, job_rows, render, summary_rows
+
+    end = time.time() if args.end is None else args.end
+    start = end - args.days * 86400
+    stores = {}
+    for item in args.store:
+        name, sep, path = item.partition("=")
+        if not sep:
+            name, path = os.uname().nodename, item
+        stores[name] = SeriesStore(path)
+    cache = _aggregate_cache(args)
+    scanner = _log_scanner(args) if args.logs or args.journal else None
+
+    def sections():
+        metrics = args.metric or None
+        yield Section(
+            "Summary",
+            ["host", "metric", "samples", "min", "mean", "max", "last"],
+            summary_rows(stores, metrics, start, end, cache=cache),
+        )
+        for metric in args.metric:
+            yield Section(
+                f"{metric} ({args.reducer}{', rate' if args.rate else ''})",
+                ["host", "bucket", "value"],
+                bucket_rows(
+                    stores,
+                    metric,
+                    start,
+                    end,
+                    bucket=args.bucket,
+                    reducer=args.reducer,
+                    transform="rate" if args.rate else None,
+                    cache=cache,
+                ),
+            )
+        for path in args.profiles:
+            yield Section(
+                f"Jobs ({path})",
+                ["job", "runs", "wall s", "mean wall s", "cpu s", "peak rss", "read", "written"],
+                job_rows(read_profiles(path), start, end),
+            )
+        if scanner is not None:
+            yield Section("Log errors and warnings", ["source", "rule", "program", "count", "example"], scanner.rows())
+
+    first, last = (time.strftime("%Y-%m-%d", time.localtime(ts)) for ts in (start, end))
+    title = f"sysmaint report {first} to {last}"
+    if args.output in (None, "-"):
+        render(sections(), sys.stdout, format=args.format, title=title)
+    else:
+        with open(args.output, "w") as out:
+            render(sections(), out, format=args.format, title=title)
+    if cache is not None:
+        cache.close()
+    if scanner is not None:
+        scanner.save()
+    return 0
+
+
+def _log_scanner(args: argparse.Namespace):
+    """A :class:`LogScanner` over ``args.logs`` and, with ``--journal``, the journal."""
+    from sysmaint.reporting.logscan import LogScanner
+
+    rules = dict(rule.partition("=")[::2] for rule in args.rule) or None
+    scanner = LogScanner(rules, keywords=args.keyword or None, state=args.log_state)
+    started = time.perf_counter()
+    for path in args.logs:
+        try:
+            scanner.scan_file(path)
+        except OSError as exc:
+            print(f"warning: {path}: {exc.strerror or exc}", file=sys.stderr)
+    if args.journal:
+        import subprocess
+
+        try:
+            scanner.scan_journal(since=args.since, units=args.unit, timeout=args.log_timeout)
+        except OSError as exc:
+            print(f"warning: {exc.filename or 'journalctl'}: {exc.strerror or exc}", file=sys.stderr)
+        except subprocess.CalledProcessError as exc:
+            detail = exc.stderr.decode(errors="replace").strip() if exc.stderr else f"exit status {exc.returncode}"
+            print(f"warning: journalctl failed: {detail}", file=sys.stderr)
+    print(
+        f"scanned {scanner.lines:,} log lines ({_human(scanner.bytes)}), {scanner.candidates:,} candidates "
+        f"in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+    return scanner
+
+
+def cmd_logs(args: argparse.Namespace) -> int:
+    """Count errors and warnings in log files and the journal since the last run."""
+    if not args.logs:
+        args.journal = True
+    import itertools
+
+    scanner = _log_scanner(args)
+    for source, rule, program, count, example in itertools.islice(scanner.rows(), args.top):
+        print(f"{count:8,}  {rule:14} {program:16} {source}\n          {example}")
+    scanner.save()
+    return 0
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
+    """Roll sealed store segments up to coarser resolutions."""
+    from sysmaint.monitoring.store import SeriesStore
+
+    before = time.time() - args.older_than * 86400
+    compacted = SeriesStore(args.store).compact(before, args.resolutions, drop_raw=args.drop_raw)
+    print(f"compacted {len(compacted)} segments")
+    return 0
+
+
+def _loopback(host: str) -> bool:
+    import ipaddress
+
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def cmd_agent(args: argparse.Namespace) -> int:
+    """Serve fleet requests on TCP or stdin/stdout."""
+    import asyncio
+
+    from sysmaint.fleet.agent import Agent
+
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        host = host.strip("[]") or "127.0.0.1"
+        if not args.allow_remote and not _loopback(host):
+            print(
+                f"error: refusing to serve the unauthenticated agent protocol on {host}; listen on loopback "
+                "and tunnel over ssh, use --stdio, or pass --allow-remote",
+                file=sys.stderr,
+            )
+            return 2
+    agent = Agent(history=args.history)
+
+    async def serve() -> None:
+        sampler = asyncio.create_task(agent.sample_forever(args.sample_interval)) if args.sample_interval else None
+        try:
+            if args.stdio:
+                await agent.serve_stdio()
+                return
+            server = await agent.serve(host, int(port))
+            async with server:
+                await server.serve_forever()
+        finally:
+            if sampler is not None:
+                sampler.cancel()
+
+    asyncio.run(serve())
+    return 0
+
+
+def cmd_fleet(args: argparse.Namespace) -> int:
+    """Call an agent method on many hosts over persistent connections."""
+    import asyncio
+    import json
+
+    from sysmaint.fleet.client import AgentConnection, Fleet
+
+    params = {}
+    for item in args.param:
+        key, _, value = item.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    connections = []
+    for item in args.agent:
+        name, _, address = item.rpartition("=")
+        host, _, port = address.rpartition(":")
+        connections.append(AgentConnection.tcp(name or address, host.strip("[]"), int(port), timeout=args.timeout))
+    for host in args.ssh:
+        argv = ["ssh", "-T", "-o", "BatchMode=yes", host, *args.remote_command.split()]
+        connections.append(AgentConnection.command(host, argv, timeout=args.timeout))
+
+    async def run() -> dict[str, object]:
+        async with Fleet(connections, concurrency=args.concurrency) as fleet:
+            return await fleet.call(args.method, **params)
+
+    failed = 0
+    for name, result in asyncio.run(run()).items():
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"{name}\terror: {result}")
+        elif isinstance(result, bytes):
+            from sysmaint.monitoring.wire import decode_batch
+
+            timestamps, columns = decode_batch(result)
+            series = {"time": timestamps.tolist(), **{metric: values.tolist() for metric, values in columns.items()}}
+            print(f"{name}\t{json.dumps(series, sort_keys=True)}")
+        else:
+            print(f"{name}\t{json.dumps(result, sort_keys=True)}")
+    return 1 if failed else 0
+
+
+def _add_log_arguments(parser: argparse.ArgumentParser, *, state: str) -> None:
+    parser.add_argument("--journal", action="store_true", help="scan the systemd journal")
+    parser.add_argument("--since", default="-24h", help="journal start on the first run (default -24h)")
+    parser.add_argument("--unit", action="append", default=[], help="only this systemd unit's journal")
+    parser.add_argument(
+        f"--{state}", dest="log_state", metavar="PATH", help="resume from and save offsets and the journal cursor"
+    )
+    parser.add_argument("--rule", action="append", default=[], metavar="NAME=REGEX", help="replace the default rules")
+    parser.add_argument(
+        "--keyword", action="append", default=[], help="lower-case literal in every match of the rules (prefilter)"
+    )
+    parser.add_argument("--log-timeout", type=float, help="seconds before journalctl is killed")
+
+
+def _add_throttle_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--adaptive", action="store_true", help="use fewer workers while the disks are busy")
+    parser.add_argument(
+        "--target-latency", type=float, default=20.0, metavar="MS", help="back off above this I/O latency (default 20)"
+    )
+    parser.add_argument(
+        "--max-util", type=float, default=0.9, help="back off above this disk utilisation (default 0.9)"
+    )
+
+
+def _add_scan_arguments(parser: argparse.ArgumentParser, *, older_than_required: bool) -> None:
+    parser.add_argument("roots", nargs="+")
+    parser.add_argument("--older-than", type=float, metavar="DAYS", required=older_than_required)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--index", metavar="DB", help="scan incrementally using this index")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sysmaint", description="System maintenance automation.")
+    parser.add_argument(
+        "--profile-log", metavar="JSONL", help="append the command's wall, CPU and I/O profile to this log"
+    )
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    p = sub.add_parser("status", help=cmd_status.__doc__)
+    p.add_argument("mounts", nargs="*", default=["/"], help="filesystems to report (default: /)")
+    p.set_defaults(handler=cmd_status)
+
+    p = sub.add_parser("collect", help=cmd_collect.__doc__)
+    p.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    p.add_argument("--count", type=int, default=1, help="number of samples, 0 for unlimited")
+    p.add_argument("--store", help="append samples to this store directory instead of printing")
+    p.add_argument("--proc", default="/proc", help=argparse.SUPPRESS)
+    p.add_argument("--disks", action="store_true", help="add filesystem usage and SMART/NVMe health")
+    p.add_argument("--smart-ttl", type=float, default=1800.0, metavar="SECONDS", help="refresh SMART data this often")
+    p.set_defaults(handler=cmd_collect)
+
+    p = sub.add_parser("disks", help=cmd_disks.__doc__)
+    p.add_argument("mounts", nargs="*", help="filesystems to report (default: all)")
+    p.add_argument("--timeout", type=float, default=20.0, help="seconds before a smartctl call is abandoned")
+    p.add_argument("--workers", type=int, default=8, help="smartctl calls run at once")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(handler=cmd_disks)
+
+    p = sub.add_parser("scan", help=cmd_scan.__doc__)
+    _add_scan_arguments(p, older_than_required=False)
+    p.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    p.set_defaults(handler=cmd_scan)
+
+    p = sub.add_parser("clean", help=cmd_clean.__doc__)
+    _add_scan_arguments(p, older_than_required=True)
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--prune", action="store_true", help="remove directories emptied below the roots")
+    p.add_argument("--max-files-per-sec", type=float)
+    p.add_argument("--max-bytes-per-sec", type=float)
+    _add_throttle_arguments(p)
+    p.set_defaults(handler=cmd_clean)
+
+    p = sub.add_parser("plan", help=cmd_plan.__doc__)
+    _add_scan_arguments(p, older_than_required=True)
+    p.add_argument("--output", "-o", required=True, metavar="PLAN", help="file to write the plan to")
+    p.set_defaults(handler=cmd_plan)
+
+    p = sub.add_parser("apply", help=cmd_apply.__doc__)
+    p.add_argument("plan")
+    p.add_argument("--list", action="store_true", help="print the planned files instead of deleting")
+    p.add_argument("--dry-run", action="store_true", help="check the files against the plan without deleting")
+    p.add_argument("--prune", action="store_true", help="remove directories emptied below the plan's roots")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--max-files-per-sec", type=float)
+    p.add_argument("--max-bytes-per-sec", type=float)
+    _add_throttle_arguments(p)
+    p.set_defaults(handler=cmd_apply)
+
+    p = sub.add_parser("du", help=cmd_du.__doc__)
+    p.add_argument("roots", nargs="+")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--apparent", action="store_true", help="count file sizes instead of allocated blocks")
+    p.add_argument("--cache", metavar="DB", help="keep the usage tree in this file between runs")
+    p.add_argument("--index", metavar="DB", help="skip listing directories unchanged since the last run")
+    p.add_argument("--rebuild", action="store_true", help="ignore the cached tree and rescan")
+    p.set_defaults(handler=cmd_du)
+
+    p = sub.add_parser("dupes", help=cmd_dupes.__doc__)
+    _add_scan_arguments(p, older_than_required=False)
+    p.add_argument("--min-size", type=int, default=1, metavar="BYTES")
+    p.add_argument("--cache", metavar="DB", help="reuse file hashes from this cache between runs")
+    p.add_argument("--top", type=int, default=0, help="only print the N largest groups")
+    p.set_defaults(handler=cmd_dupes)
+
+    p = sub.add_parser("rotate", help=cmd_rotate.__doc__)
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--keep", type=int, default=7)
+    p.add_argument("--codec", choices=["zstd", "gzip"])
+    p.add_argument("--workers", type=int)
+    p.add_argument("--postrotate", metavar="COMMAND", help="shell command run after renaming, e.g. to reopen logs")
+    p.add_argument(
+        "--delaycompress",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="leave .1 uncompressed until the next rotation (default: on)",
+    )
+    p.add_argument("--copytruncate", action="store_true", help="copy and truncate logs instead of renaming them")
+    _add_throttle_arguments(p)
+    p.set_defaults(handler=cmd_rotate)
+
+    p = sub.add_parser("purge", help=cmd_purge.__doc__)
+    p.add_argument("targets", nargs="*", help="targets to run (default: all; see --list)")
+    p.add_argument("--list", action="store_true", help="list the targets and whether they apply to this host")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--tmp-days", type=float, default=10.0, help="age of unused /tmp files to remove (default 10)")
+    p.add_argument("--journal-size", default="500M", help="journalctl --vacuum-size (default 500M)")
+    p.add_argument("--journal-time", help="journalctl --vacuum-time, e.g. 4weeks")
+    p.add_argument("--timeout", type=float, default=600.0, help="seconds before a cleanup tool is killed")
+    p.add_argument("--io-workers", type=int, default=4, help="io targets run at once")
+    p.add_argument("--subprocess-workers", type=int, default=4, help="cleanup tools run at once")
+    p.set_defaults(handler=cmd_purge)
+
+    p = sub.add_parser("agent", help=cmd_agent.__doc__)
+    mode = p.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--listen", metavar="HOST:PORT")
+    mode.add_argument("--stdio", action="store_true", help="serve one connection on stdin/stdout (for ssh)")
+    p.add_argument("--sample-interval", type=float, metavar="SECONDS", help="collect in the background for 'samples'")
+    p.add_argument("--history", type=int, default=360, help="samples kept for 'samples' (default 360)")
+    p.add_argument(
+        "--allow-remote", action="store_true", help="allow --listen on a non-loopback address (no authentication)"
+    )
+    p.set_defaults(handler=cmd_agent)
+
+    p = sub.add_parser("fleet", help=cmd_fleet.__doc__)
+    p.add_argument("method", help="agent method, e.g. ping, collect, samples, df")
+    p.add_argument("--agent", action="append", default=[], metavar="NAME=HOST:PORT", help="agent reachable over TCP")
+    p.add_argument("--ssh", action="append", default=[], metavar="HOST", help="run the agent over one ssh session")
+    p.add_argument("--remote-command", default="sysmaint agent --stdio", help=argparse.SUPPRESS)
+    p.add_argument("--param", action="append", default=[], metavar="KEY=VALUE", help="method parameter (JSON value)")
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.set_defaults(handler=cmd_fleet)
+
+    p = sub.add_parser("report", help=cmd_report.__doc__)
+    p.add_argument("metric")
+    p.add_argument("--store", required=True)
+    p.add_argument("--host", default=os.uname().nodename)
+    p.add_argument("--hours", type=float, default=24.0)
+    p.add_argument("--end", type=float, help="end of the range (epoch seconds, default now)")
+    p.add_argument("--bucket", type=float, default=3600.0, help="bucket width in seconds")
+    p.add_argument("--reducer", default="mean")
+    p.add_argument("--rate", action="store_true", help="treat the metric as a counter")
+    p.add_argument("--cache", metavar="PATH", help="reuse aggregates of sealed segments across runs")
+    p.set_defaults(handler=cmd_report)
+
+    p = sub.add_parser("render", help=cmd_render.__doc__)
+    p.add_argument("--store", action="append", required=True, metavar="[HOST=]PATH")
+    p.add_argument("--metric", action="append", default=[], help="metric to bucket (default: summary only)")
+    p.add_argument("--profiles", action="append", default=[], metavar="JSONL", help="job profile log to summarise")
+    p.add_argument("--days", type=float, default=30.0)
+    p.add_argument("--end", type=float, help="end of the range (epoch seconds, default now)")
+    p.add_argument("--bucket", type=float, default=86400.0, help="bucket width in seconds")
+    p.add_argument("--reducer", default="mean")
+    p.add_argument("--rate", action="store_true", help="treat the metrics as counters")
+    p.add_argument("--format", choices=["markdown", "html", "csv"], default="markdown")
+    p.add_argument("--output", "-o", help="output file (default stdout)")
+    p.add_argument("--cache", metavar="PATH", help="reuse aggregates of sealed segments across runs")
+    p.add_argument("--logs", action="append", default=[], metavar="FILE", help="log file to summarise errors from")
+    _add_log_arguments(p, state="log-state")
+    p.set_defaults(handler=cmd_render)
+
+    p = sub.add_parser("logs", help=cmd_logs.__doc__)
+    p.add_argument("logs", nargs="*", metavar="FILE", help="log files to scan (default: the journal only)")
+    _add_log_arguments(p, state="state")
+    p.add_argument("--top", type=int, help="show only the N most frequent")
+    p.set_defaults(handler=cmd_logs)
+
+    p = sub.add_parser("compact", help=cmd_compact.__doc__)
+    p.add_argument("--store", required=True)
+    p.add_argument("--older-than", type=float, default=7.0, metavar="DAYS")
+    p.add_argument("--resolutions", type=int, nargs="+", default=[60, 3600])
+    p.add_argument("--drop-raw", action="store_true")
+    p.set_defaults(handler=cmd_compact)
+    return parser
+
+
+def _run_profiled(args: argparse.Namespace) -> int:
+    """Run the command under a process-wide profile appended to ``--profile-log``."""
+    from sysmaint.profiling import ProfileLog, profile_job
+
+    status: int | None = None
+    try:
+        # Process-wide, so the command's worker threads and child processes count.
+        with profile_job(f"sysmaint {args.command}", scope="process") as profiler:
+            status = args.handler(args)
+    finally:
+        # Failed commands are logged too, with no status.
+        ProfileLog(args.profile_log).write(profiler.profile, ok=status == 0, status=status)
+    return status
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.profile_log:
+            return _run_profiled(args)
+        return args.handler(args)
+    except BrokenPipeError:
+        # Output piped into head(1) and friends.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Fleet collection: agents on remote hosts and pooled connections to them.
+
+Names are imported from their modules on first access, so importing this
+package (for example from the command line entry point) stays cheap.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sysmaint.fleet.agent import Agent, FakeAgent
+    from sysmaint.fleet.client import AgentConnection, Fleet
+    from sysmaint.fleet.protocol import RemoteError
+
+_EXPORTS = {
+    "Agent": "sysmaint.fleet.agent",
+    "AgentConnection": "sysmaint.fleet.client",
+    "FakeAgent": "sysmaint.fleet.agent",
+    "Fleet": "sysmaint.fleet.client",
+    "RemoteError": "sysmaint.fleet.protocol",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module), name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
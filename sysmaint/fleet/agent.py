@@ -0,0 +1,274 @@
+"""Agent side of the fleet protocol.
+
+An :class:`Agent` answers requests on a TCP socket or on stdin/stdout.  TCP
+is unauthenticated and meant for loopback or a tunnel only.  The stdio mode
+is what makes SSH cheap: the collector starts
+``ssh host sysmaint agent --stdio`` once and multiplexes every request over
+that single session instead of paying for a new session per command.  Each
+request on a connection runs as its own task, so a slow request does not
+hold up the ones behind it; ``max_in_flight`` bounds how many run at once.
+
+Every ``collect`` sample is also kept in a bounded history; ``samples``
+returns the history since a given time as one
+:mod:`sysmaint.monitoring.wire` batch, so a collector can poll every few
+minutes and receive the samples taken in between at a few bytes each
+instead of a JSON object per sample.
+
+Handlers are looked up by method name and called with the request params as
+keyword arguments.  A handler that returns bytes is answered with a
+``BINARY`` frame.  Coroutine functions are awaited; plain functions run on
+the event loop and must therefore be quick (``asyncio.to_thread`` is the
+way out for anything blocking).
+
+:class:`FakeAgent` serves synthetic data with configurable delays, so the
+whole collection path can be exercised and benchmarked on one machine.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from sysmaint.fleet.protocol import BINARY, ERROR, RESPONSE, ProtocolError, decode, encode, read_frame, write_frame
+
+__all__ = ["Agent", "FakeAgent"]
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Any]
+
+
+class Agent:
+    """Serve fleet requests with the built-in and any extra handlers.
+
+    Built-in methods: ``ping``, ``collect`` (one :class:`ProcCollector`
+    sample), ``samples`` (the last ``history`` collected samples), ``df``
+    (``statvfs`` of the given mounts), ``disks`` (SMART/NVMe health and
+    usage of every filesystem, see :mod:`sysmaint.monitoring.disks`) and
+    ``methods``.
+    """
+
+    def __init__(
+        self, handlers: Mapping[str, Handler] | None = None, *, max_in_flight: int = 32, history: int = 360
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.handlers: dict[str, Handler] = {
+            "ping": self.ping,
+            "collect": self.collect,
+            "samples": self.samples,
+            "df": self.df,
+            "disks": self.disks,
+            "methods": lambda: sorted(self.handlers),
+        }
+        self.handlers.update(handlers or {})
+        self.history: deque[tuple[float, dict[str, float]]] = deque(maxlen=history)
+        self._collector = None
+        self._health = None
+
+    # -- built-in handlers -------------------------------------------------
+
+    def ping(self) -> dict[str, Any]:
+        return {"host": os.uname().nodename, "time": time.time()}
+
+    def read_metrics(self) -> dict[str, float]:
+        if self._collector is None:
+            from sysmaint.monitoring.collector import ProcCollector
+
+            self._collector = ProcCollector()
+        return self._collector.collect()
+
+    def collect(self) -> dict[str, Any]:
+        now, metrics = time.time(), self.read_metrics()
+        self.history.append((now, metrics))
+        return {"time": now, "metrics": metrics}
+
+    def samples(self, since: float = 0.0, format: str = "wire") -> bytes | list[dict[str, Any]]:
+        """Collected samples newer than ``since``, as a wire batch or JSON."""
+        selected = [(ts, metrics) for ts, metrics in self.history if ts > since]
+        if format == "json":
+            return [{"time": ts, "metrics": metrics} for ts, metrics in selected]
+        if format != "wire":
+            raise ValueError(f"unknown sample format {format!r}")
+        from sysmaint.monitoring.wire import encode_samples
+
+        return encode_samples(selected)
+
+    async def sample_forever(self, interval: float) -> None:
+        """Call :meth:`collect` every ``interval`` seconds to fill the history."""
+        while True:
+            self.collect()
+            await asyncio.sleep(interval - time.time() % interval)
+
+    def df(self, mounts: list[str] | None = None) -> dict[str, dict[str, float]]:
+        result = {}
+        for mount in mounts or ["/"]:
+            st = os.statvfs(mount)
+            total, free, avail = st.f_blocks * st.f_frsize, st.f_bfree * st.f_frsize, st.f_bavail * st.f_frsize
+            used = total - free
+            result[mount] = {
+                "total": total,
+                "avail": avail,
+                "used": used,
+                "used_pct": 100.0 * used / (used + avail) if used + avail else 0.0,
+            }
+        return result
+
+    async def disks(self) -> dict[str, float]:
+        # smartctl runs on the health pool; the event loop keeps serving meanwhile.
+        if self._health is None:
+            from sysmaint.monitoring.disks import DiskHealth
+
+            self._health = DiskHealth()
+        health = self._health
+
+        def read() -> dict[str, float]:
+            from sysmaint.monitoring.disks import FilesystemStats
+
+            return dict(FilesystemStats().collect(health.collect()))
+
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    # -- serving -----------------------------------------------------------
+
+    async def _dispatch(self, payload: bytes) -> Any:
+        request = decode(payload)
+        method = request.get("method")
+        handler = self.handlers.get(method)
+        if handler is None:
+            raise LookupError(f"unknown method {method!r}")
+        result = handler(**request.get("params", {}))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def _respond(
+        self,
+        request_id: int,
+        payload: bytes,
+        writer: asyncio.StreamWriter,
+        drain: asyncio.Lock,
+        slots: asyncio.Semaphore,
+    ) -> None:
+        try:
+            try:
+                result = await self._dispatch(payload)
+                if isinstance(result, bytes):
+                    body, flags = result, RESPONSE | BINARY
+                else:
+                    body, flags = encode(result), RESPONSE
+            except Exception as exc:  # reported to the caller, not fatal to the agent
+                body, flags = encode(f"{type(exc).__name__}: {exc}"), RESPONSE | ERROR
+            write_frame(writer, request_id, flags, body)
+            async with drain:
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one connection until the peer closes it."""
+        slots = asyncio.Semaphore(self.max_in_flight)
+        drain = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+        try:
+            while True:
+                try:
+                    request_id, _flags, payload = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                await slots.acquire()
+                task = asyncio.create_task(self._respond(request_id, payload, writer, drain, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ProtocolError as exc:
+            logger.warning("closing connection: %s", exc)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """Listen on TCP; ``server.sockets[0].getsockname()`` gives the port.
+
+        The protocol has no authentication or encryption: anyone who can
+        reach the port can read the host's metrics, processes and disks.
+        Listen on loopback and reach it through an SSH tunnel, or use
+        :meth:`serve_stdio` over ssh.
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_stdio(self) -> None:
+        """Serve a single connection on stdin/stdout (for ``ssh host ...``)."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout.buffer)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self.handle(reader, writer)
+
+
+class FakeAgent(Agent):
+    """A stand-in agent that answers with synthetic data.
+
+    ``connect_delay`` is added before the first response on each connection
+    (standing in for an SSH handshake) and ``latency`` before every response.
+    ``metrics`` sets the size of the synthetic ``collect`` sample.
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        *,
+        latency: float = 0.0,
+        connect_delay: float = 0.0,
+        metrics: int = 100,
+        max_in_flight: int = 32,
+        history: int = 360,
+    ) -> None:
+        super().__init__(max_in_flight=max_in_flight, history=history)
+        self.name = name
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.requests = 0
+        self._rng = random.Random(name)
+        self._metric_names = [f"fake.m{i:03d}" for i in range(metrics)]
+        self._counters = [0] * metrics
+
+    async def _dispatch(self, payload: bytes) -> Any:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super()._dispatch(payload)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+        await super().handle(reader, writer)
+
+    def ping(self) -> dict[str, Any]:
+        return {"host": self.name, "time": time.time()}
+
+    def read_metrics(self) -> dict[str, float]:
+        rng = self._rng
+        for i in range(len(self._counters)):
+            self._counters[i] += rng.randrange(1000)
+        return dict(zip(self._metric_names, self._counters))
+
+    def df(self, mounts: list[str] | None = None) -> dict[str, dict[str, float]]:
+        total = 1 << 40
+        result = {}
+        for mount in mounts or ["/"]:
+            used = int(total * self._rng.uniform(0.1, 0.95))
+            result[mount] = {"total": total, "avail": total - used, "used": used, "used_pct": 100.0 * used / total}
+        return result
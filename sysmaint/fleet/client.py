@@ -0,0 +1,222 @@
+"""Collector side of the fleet protocol: persistent, multiplexed connections.
+
+An :class:`AgentConnection` is opened once and then shared by every request
+to that agent: requests are numbered, written as they are made, and matched
+to responses by id as those arrive, so many requests are in flight on one
+TCP connection or one SSH session at the same time.  A connection that
+breaks fails its pending requests and is reopened on the next call.
+
+:class:`Fleet` holds one connection per agent and fans a call out across
+all of them with a bound on how many agents are talked to at once.  For a
+fleet-wide health check the cost is then one round trip per host instead
+of one connection setup (an SSH handshake, typically) per host and command.
+
+A connection over a command keeps the child process.  Closing the
+connection, or losing it, closes the child's stdin and waits for it to exit,
+killing it if it has not exited after ``close_timeout`` seconds, so ssh
+sessions are never left behind.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections.abc import Awaitable, Callable, Iterable, Mapping, Sequence
+from typing import Any
+
+from sysmaint.fleet.protocol import BINARY, ERROR, RemoteError, decode, encode, read_frame, write_frame
+
+__all__ = ["AgentConnection", "Fleet"]
+
+logger = logging.getLogger(__name__)
+
+# Returns the streams, and the process behind them for command transports.
+Opener = Callable[
+    [], Awaitable[tuple[asyncio.StreamReader, asyncio.StreamWriter, "asyncio.subprocess.Process | None"]]
+]
+
+
+class AgentConnection:
+    """A persistent connection to one agent.
+
+    Build one with :meth:`tcp` or :meth:`command` (for example
+    ``["ssh", "-T", host, "sysmaint", "agent", "--stdio"]``).  At most
+    ``max_in_flight`` requests are outstanding at once; ``timeout`` applies to
+    each call.
+    """
+
+    close_timeout = 5.0
+
+    def __init__(self, name: str, opener: Opener, *, max_in_flight: int = 16, timeout: float | None = 30.0) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.connects = 0
+        self._opener = opener
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future[tuple[int, bytes]]] = {}
+        self._writer: asyncio.StreamWriter | None = None
+        self._proc: asyncio.subprocess.Process | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._connect_lock = asyncio.Lock()
+        self._drain_lock = asyncio.Lock()
+
+    @classmethod
+    def tcp(cls, name: str, host: str, port: int, **options: Any) -> AgentConnection:
+        async def opener() -> tuple[asyncio.StreamReader, asyncio.StreamWriter, None]:
+            reader, writer = await asyncio.open_connection(host, port)
+            return reader, writer, None
+
+        return cls(name, opener, **options)
+
+    @classmethod
+    def command(cls, name: str, argv: Sequence[str], **options: Any) -> AgentConnection:
+        """Talk to an agent over the stdin/stdout of a command such as ssh."""
+
+        async def opener() -> tuple[asyncio.StreamReader, asyncio.StreamWriter, asyncio.subprocess.Process]:
+            proc = await asyncio.create_subprocess_exec(
+                *argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+            )
+            assert proc.stdin is not None and proc.stdout is not None
+            return proc.stdout, proc.stdin, proc
+
+        return cls(name, opener, **options)
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self.connected:
+                return
+            reader, self._writer, self._proc = await self._opener()
+            self.connects += 1
+            self._reader_task = asyncio.create_task(self._read_loop(reader, self._writer, self._proc))
+
+    async def _reap(self, proc: asyncio.subprocess.Process | None) -> None:
+        """Wait for a transport command whose stdin was closed; kill it if it lingers."""
+        if proc is None:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), self.close_timeout)
+        except asyncio.TimeoutError:
+            logger.debug("%s: transport command did not exit; killing it", self.name)
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    async def _read_loop(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, proc: asyncio.subprocess.Process | None
+    ) -> None:
+        error: BaseException = ConnectionResetError(f"connection to {self.name} closed")
+        try:
+            while True:
+                request_id, flags, payload = await read_frame(reader)
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((flags, payload))
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception as exc:
+            error = exc
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            await self._reap(proc)
+            if self._proc is proc:
+                self._proc = None
+
+    async def request(self, method: str, params: Mapping[str, Any] | None = None, *, flags: int = 0) -> tuple[int, bytes]:
+        """Send one request and return the raw ``(flags, payload)`` response."""
+        async with self._slots:
+            if not self.connected:
+                await self.connect()
+            writer = self._writer
+            assert writer is not None
+            request_id = next(self._ids) & 0xFFFFFFFF
+            future: asyncio.Future[tuple[int, bytes]] = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            try:
+                write_frame(writer, request_id, flags, encode({"method": method, "params": dict(params or {})}))
+                async with self._drain_lock:
+                    await writer.drain()
+                return await asyncio.wait_for(future, self.timeout)
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def call(self, method: str, **params: Any) -> Any:
+        """Call ``method`` on the agent and return its decoded result.
+
+        Binary results (such as ``samples`` in the wire format) are returned
+        as bytes.  Raises :class:`RemoteError` if the agent reports a failure.
+        """
+        flags, payload = await self.request(method, params)
+        if flags & ERROR:
+            raise RemoteError(f"{self.name}: {decode(payload)}")
+        return payload if flags & BINARY else decode(payload)
+
+    async def close(self) -> None:
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        # A transport command that does not exit on EOF would keep the read
+        # loop waiting for its output.
+        await self._reap(self._proc)
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+
+class Fleet:
+    """Connections to many agents, called together.
+
+    ``concurrency`` bounds the number of agents with a call in progress.
+    Results come back per agent name; a failed agent maps to the exception
+    it raised so one bad host never hides the others' results.
+    """
+
+    def __init__(self, connections: Iterable[AgentConnection], *, concurrency: int = 64) -> None:
+        self.connections = {conn.name: conn for conn in connections}
+        self._limit = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    def from_addresses(cls, addresses: Mapping[str, str], **options: Any) -> Fleet:
+        """Build a fleet from ``{name: "host:port"}``; other options go to the connections."""
+        concurrency = options.pop("concurrency", 64)
+        connections = []
+        for name, address in addresses.items():
+            host, _, port = address.rpartition(":")
+            connections.append(AgentConnection.tcp(name, host.strip("[]"), int(port), **options))
+        return cls(connections, concurrency=concurrency)
+
+    async def _call_one(self, conn: AgentConnection, method: str, params: dict[str, Any]) -> Any:
+        async with self._limit:
+            try:
+                return await conn.call(method, **params)
+            except Exception as exc:
+                logger.debug("%s: %s failed: %s", conn.name, method, exc)
+                return exc
+
+    async def call(self, method: str, names: Iterable[str] | None = None, **params: Any) -> dict[str, Any]:
+        """Call ``method`` on every agent (or those in ``names``)."""
+        selected = [self.connections[name] for name in names] if names is not None else list(self.connections.values())
+        results = await asyncio.gather(*(self._call_one(conn, method, params) for conn in selected))
+        return {conn.name: result for conn, result in zip(selected, results)}
+
+    async def close(self) -> None:
+        await asyncio.gather(*(conn.close() for conn in self.connections.values()))
+
+    async def __aenter__(self) -> Fleet:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
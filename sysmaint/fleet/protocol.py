@@ -0,0 +1,76 @@
+"""Framing for the agent protocol.
+
+Every message is one frame: a 9-byte header ``!IIB`` (payload length,
+request id, flags) followed by the payload.  Request ids let any number of
+requests share one connection: the client numbers its requests, the agent
+answers each with the same id in whatever order they complete.
+
+Payloads are JSON unless a flag says otherwise.  A request carries
+``{"method": ..., "params": {...}}``; a response carries the result, or an
+error message when ``ERROR`` is set.  A response with ``BINARY`` set carries
+raw bytes, for example a :mod:`sysmaint.monitoring.wire` batch of samples.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+from typing import Any
+
+__all__ = [
+    "BINARY",
+    "ERROR",
+    "HEADER",
+    "MAX_FRAME",
+    "RESPONSE",
+    "ProtocolError",
+    "RemoteError",
+    "decode",
+    "encode",
+    "read_frame",
+    "write_frame",
+]
+
+HEADER = struct.Struct("!IIB")
+MAX_FRAME = 64 * 1024 * 1024
+
+# Flag bits.
+RESPONSE = 0x01
+ERROR = 0x02
+BINARY = 0x04
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid frame."""
+
+
+class RemoteError(Exception):
+    """The agent reported that a request failed."""
+
+
+def encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def decode(payload: bytes) -> Any:
+    return json.loads(payload)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """Read one frame and return ``(request_id, flags, payload)``.
+
+    Raises :class:`asyncio.IncompleteReadError` when the stream ends.
+    """
+    length, request_id, flags = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ProtocolError(f"frame of {length} bytes exceeds the {MAX_FRAME} byte limit")
+    payload = await reader.readexactly(length) if length else b""
+    return request_id, flags, payload
+
+
+def write_frame(writer: asyncio.StreamWriter, request_id: int, flags: int, payload: bytes) -> None:
+    """Queue one frame on ``writer``; the caller drains."""
+    if len(payload) > MAX_FRAME:
+        raise ProtocolError(f"frame of {len(payload)} bytes exceeds the {MAX_FRAME} byte limit")
+    writer.write(HEADER.pack(len(payload), request_id, flags) + payload)
@@ -0,0 +1,46 @@
+"""Host monitoring: collectors for kernel counters and derived metrics.
+
+Names are imported from their modules on first access, so importing this
+package (for example from the command line entry point) stays cheap.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sysmaint.monitoring.alerts import AlertEngine, AlertEvent, Rule
+    from sysmaint.monitoring.collector import ProcCollector, ProcFile
+    from sysmaint.monitoring.disks import DiskHealth, FilesystemStats
+    from sysmaint.monitoring.processes import ProcessRates, ProcessSampler, ProcessSnapshot
+    from sysmaint.monitoring.store import Segment, SeriesStore
+
+_EXPORTS = {
+    "AlertEngine": "sysmaint.monitoring.alerts",
+    "AlertEvent": "sysmaint.monitoring.alerts",
+    "DiskHealth": "sysmaint.monitoring.disks",
+    "FilesystemStats": "sysmaint.monitoring.disks",
+    "ProcCollector": "sysmaint.monitoring.collector",
+    "ProcFile": "sysmaint.monitoring.collector",
+    "ProcessRates": "sysmaint.monitoring.processes",
+    "ProcessSampler": "sysmaint.monitoring.processes",
+    "ProcessSnapshot": "sysmaint.monitoring.processes",
+    "Rule": "sysmaint.monitoring.alerts",
+    "Segment": "sysmaint.monitoring.store",
+    "SeriesStore": "sysmaint.monitoring.store",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module), name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
@@ -0,0 +1,274 @@
+"""Threshold alert rules evaluated for a whole fleet at once.
+
+Rules are written as ``<metric> <op> <threshold> [for <duration>]`` where
+the left side is a metric name or ``rate(<metric>)`` for counters, ``op`` is
+one of ``> >= < <= == !=`` and the duration takes an ``s``/``m``/``h``/``d``
+suffix::
+
+    disk.sda.io_ms > 900
+    mem.available < 1e9 for 5m
+    rate(net.eth0.rx_errors) > 10
+    rate(disk.*.weighted_io_ms) > 5000 for 1m
+
+Metric names may contain ``*`` wildcards, which expand against the engine's
+metric list into one check per matching metric.
+
+:class:`AlertEngine` compiles all checks into parallel arrays (metric
+column, operator, threshold, hold time) and evaluates a batch of samples as
+a ``hosts x metrics`` matrix: one gather builds the ``hosts x checks``
+value matrix and one comparison per operator decides every check for every
+host.  "for" windows are kept incrementally as a matrix of the times each
+condition became true, so a window never needs past samples.  Only state
+changes turn into Python objects (:class:`AlertEvent`).
+
+A missing value (NaN) makes a condition false and restarts its window;
+``rate()`` of a counter that went backwards, or of a sample whose
+timestamp is not after the previous one, is missing for that sample.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__all__ = ["AlertEngine", "AlertEvent", "Rule"]
+
+_OPS = {
+    ">": "greater",
+    ">=": "greater_equal",
+    "<": "less",
+    "<=": "less_equal",
+    "==": "equal",
+    "!=": "not_equal",
+}
+_OP_CODES = {op: code for code, op in enumerate(_OPS)}
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+_RULE = re.compile(
+    r"""^\s*
+    (?: rate\(\s*(?P<rate>[\w.*:/-]+)\s*\) | (?P<metric>[\w.*:/-]+) )
+    \s*(?P<op>>=|<=|==|!=|>|<)\s*
+    (?P<threshold>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    (?:\s+for\s+(?P<duration>\d+(?:\.\d+)?)\s*(?P<unit>[smhd]?))?
+    \s*$""",
+    re.X,
+)
+
+
+def _numpy():
+    return require("numpy", "alert evaluation")
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """One parsed alert rule."""
+
+    metric: str
+    op: str
+    threshold: float
+    duration: float = 0.0
+    rate: bool = False
+    name: str = ""
+
+    @classmethod
+    def parse(cls, text: str, name: str | None = None) -> Rule:
+        m = _RULE.match(text)
+        if m is None:
+            raise ValueError(f"invalid alert rule {text!r}")
+        duration = float(m["duration"]) * _UNITS[m["unit"]] if m["duration"] else 0.0
+        return cls(
+            metric=m["rate"] or m["metric"],
+            op=m["op"],
+            threshold=float(m["threshold"]),
+            duration=duration,
+            rate=m["rate"] is not None,
+            name=name if name is not None else " ".join(text.split()),
+        )
+
+    def __str__(self) -> str:
+        expr = f"rate({self.metric})" if self.rate else self.metric
+        hold = f" for {self.duration:g}s" if self.duration else ""
+        return f"{expr} {self.op} {self.threshold:g}{hold}"
+
+
+@dataclass(frozen=True, slots=True)
+class AlertEvent:
+    """A check changing state on one host."""
+
+    rule: Rule
+    host: str
+    metric: str
+    state: str  # "firing" or "resolved"
+    value: float
+    since: float
+    timestamp: float
+
+
+class AlertEngine:
+    """Evaluate many rules over many hosts per call.
+
+    ``metrics`` fixes the column order of the matrices passed to
+    :meth:`evaluate`.  Rules are given as :class:`Rule` objects, rule
+    strings, or a mapping of name to rule string.  A rule that matches no
+    metric is an error, since it could never fire.
+    """
+
+    def __init__(self, rules: Iterable[Rule | str] | Mapping[str, str], metrics: Sequence[str]) -> None:
+        np = _numpy()
+        if isinstance(rules, Mapping):
+            parsed = [Rule.parse(text, name) for name, text in rules.items()]
+        else:
+            parsed = [r if isinstance(r, Rule) else Rule.parse(r) for r in rules]
+        self.metrics = list(metrics)
+        self._metric_index = {name: i for i, name in enumerate(self.metrics)}
+
+        checks = []
+        for i, rule in enumerate(parsed):
+            if "*" in rule.metric:
+                matched = [self._metric_index[m] for m in fnmatch.filter(self.metrics, rule.metric)]
+            else:
+                matched = [self._metric_index[rule.metric]] if rule.metric in self._metric_index else []
+            if not matched:
+                raise ValueError(f"alert rule {rule.name!r} matches no metric")
+            checks.extend((_OP_CODES[rule.op], i, column) for column in matched)
+        # Checks are ordered by operator so each comparison runs over a slice.
+        checks.sort()
+        self.rules = parsed
+        rule_of = [i for _, i, _ in checks]
+        self._rule_of = np.array(rule_of, dtype=np.intp)
+        self._column = np.array([column for _, _, column in checks], dtype=np.intp)
+        self._threshold = np.array([parsed[i].threshold for i in rule_of], dtype=np.float64)
+        self._duration = np.array([parsed[i].duration for i in rule_of], dtype=np.float64)
+        self._op_slices = []
+        codes = [code for code, _, _ in checks]
+        for code, op in enumerate(_OPS):
+            start, stop = bisect_left(codes, code), bisect_right(codes, code)
+            if start < stop:
+                self._op_slices.append((getattr(np, _OPS[op]), slice(start, stop), op == "!="))
+
+        # Counter columns needing rate(), and where each rate check reads from.
+        is_rate = np.array([parsed[i].rate for i in rule_of], dtype=bool)
+        self._rate_checks = np.flatnonzero(is_rate)
+        self._rate_columns, self._rate_slot = np.unique(self._column[is_rate], return_inverse=True)
+
+        self.hosts: list[str] = []
+        self._host_index: dict[str, int] = {}
+        checks = len(rule_of)
+        self._since = np.full((0, checks), np.inf)
+        self._firing = np.zeros((0, checks), dtype=bool)
+        self._prev_ts = np.full(0, np.nan)
+        self._prev_counters = np.full((0, len(self._rate_columns)), np.nan)
+
+    def __len__(self) -> int:
+        """Number of compiled checks (rules after wildcard expansion)."""
+        return len(self._column)
+
+    def _rows(self, hosts: Sequence[str]) -> np.ndarray:
+        np = _numpy()
+        added = [h for h in dict.fromkeys(hosts) if h not in self._host_index]
+        if added:
+            for host in added:
+                self._host_index[host] = len(self.hosts)
+                self.hosts.append(host)
+            n, checks = len(added), len(self._column)
+            self._since = np.vstack([self._since, np.full((n, checks), np.inf)])
+            self._firing = np.vstack([self._firing, np.zeros((n, checks), dtype=bool)])
+            self._prev_ts = np.concatenate([self._prev_ts, np.full(n, np.nan)])
+            self._prev_counters = np.vstack([self._prev_counters, np.full((n, len(self._rate_columns)), np.nan)])
+        return np.fromiter((self._host_index[h] for h in hosts), dtype=np.intp, count=len(hosts))
+
+    def evaluate(self, timestamp: float | np.ndarray, hosts: Sequence[str], values: np.ndarray) -> list[AlertEvent]:
+        """Feed one sample per host and return the checks that changed state.
+
+        ``values`` has one row per entry of ``hosts`` and one column per
+        engine metric, NaN where a host lacks a metric.  ``timestamp`` is a
+        scalar or one timestamp per host.
+        """
+        np = _numpy()
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (len(hosts), len(self.metrics)):
+            raise ValueError(f"expected a {len(hosts)}x{len(self.metrics)} matrix, got {values.shape}")
+        rows = self._rows(hosts)
+        ts = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), (len(hosts),))
+
+        # Rows of the state matrices; a batch covering every known host in
+        # order (the usual case) updates them in place instead of copying.
+        in_place = len(rows) == len(self.hosts) and bool((rows == np.arange(len(rows))).all())
+
+        current = values[:, self._column]
+        if len(self._rate_columns):
+            counters = values[:, self._rate_columns]
+            prev_counters = self._prev_counters if in_place else self._prev_counters[rows]
+            prev_ts = self._prev_ts if in_place else self._prev_ts[rows]
+            dt = (ts - prev_ts)[:, None]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rates = (counters - prev_counters) / dt
+            # A repeated or out-of-order timestamp gives no rate, not +inf.
+            rates[~(rates >= 0) | ~(dt > 0)] = np.nan
+            self._prev_counters[rows] = counters
+            self._prev_ts[rows] = ts
+            current[:, self._rate_checks] = rates[:, self._rate_slot]
+
+        cond = np.empty(current.shape, dtype=bool)
+        for compare, sl, nan_is_true in self._op_slices:
+            compare(current[:, sl], self._threshold[sl], out=cond[:, sl])
+            if nan_is_true:
+                cond[:, sl] &= ~np.isnan(current[:, sl])
+
+        started = self._since if in_place else self._since[rows]
+        was_firing = self._firing if in_place else self._firing[rows]
+        # A window starts at the first true sample and ends at the first
+        # false one; inactive windows start at +inf.
+        since = np.where(cond, np.minimum(started, ts[:, None]), np.inf)
+        firing = cond & (ts[:, None] - since >= self._duration)
+        if in_place:
+            self._since, self._firing = since, firing
+        else:
+            self._since[rows] = since
+            self._firing[rows] = firing
+
+        events: list[AlertEvent] = []
+        changed = firing ^ was_firing
+        if not changed.any():
+            return events
+        rules, metrics = self.rules, self.metrics
+        for state, windows in (("firing", since), ("resolved", started)):
+            r, c = np.nonzero(changed & (firing if state == "firing" else was_firing))
+            rule_ids, columns = self._rule_of[c].tolist(), self._column[c].tolist()
+            values_at, since_at, ts_at = current[r, c].tolist(), windows[r, c].tolist(), ts[r].tolist()
+            for i, row in enumerate(r.tolist()):
+                events.append(
+                    AlertEvent(
+                        rules[rule_ids[i]], hosts[row], metrics[columns[i]], state, values_at[i], since_at[i], ts_at[i]
+                    )
+                )
+        return events
+
+    def evaluate_samples(self, timestamp: float, samples: Mapping[str, Mapping[str, float]]) -> list[AlertEvent]:
+        """Like :meth:`evaluate` for ``{host: {metric: value}}`` samples."""
+        np = _numpy()
+        hosts = list(samples)
+        values = np.full((len(hosts), len(self.metrics)), np.nan)
+        index = self._metric_index
+        for row, host in enumerate(hosts):
+            for metric, value in samples[host].items():
+                col = index.get(metric)
+                if col is not None:
+                    values[row, col] = value
+        return self.evaluate(timestamp, hosts, values)
+
+    def firing(self) -> list[tuple[str, Rule, str, float]]:
+        """Currently firing checks as ``(host, rule, metric, since)``."""
+        np = _numpy()
+        return [
+            (self.hosts[r], self.rules[self._rule_of[c]], self.metrics[self._column[c]], float(self._since[r, c]))
+            for r, c in zip(*np.nonzero(self._firing))
+        ]
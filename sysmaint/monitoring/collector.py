@@ -0,0 +1,223 @@
+"""Streaming collector for the kernel counters in /proc.
+
+The collector keeps one file descriptor and one preallocated buffer per
+source file and re-reads them with ``pread`` at offset zero, which makes the
+kernel regenerate the file without a seek or a reopen.  Parsing runs compiled
+bytes patterns directly over the filled part of the buffer, so no sample ever
+decodes to ``str`` or splits into per-line objects.  Metric names are built
+once per device and reused, and callers may pass the mapping from the
+previous sample back in so steady-state sampling only rebinds values.
+
+All values are raw kernel counters or gauges: CPU times are in clock ticks,
+memory and byte counters in bytes, disk times in milliseconds.  Rates are
+derived downstream from consecutive samples.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import MutableMapping
+
+__all__ = ["ProcCollector", "ProcFile"]
+
+_CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+_STAT_CPU = re.compile(rb"^cpu +" + rb" ".join([rb"(\d+)"] * len(_CPU_FIELDS)), re.M)
+_STAT_SCALARS = {
+    b"ctxt": "sys.ctxt",
+    b"processes": "sys.forks",
+    b"procs_running": "sys.procs_running",
+    b"procs_blocked": "sys.procs_blocked",
+}
+_STAT_SCALAR = re.compile(rb"^(" + rb"|".join(_STAT_SCALARS) + rb") (\d+)", re.M)
+
+_MEMINFO_FIELDS = {
+    b"MemTotal": "mem.total",
+    b"MemFree": "mem.free",
+    b"MemAvailable": "mem.available",
+    b"Buffers": "mem.buffers",
+    b"Cached": "mem.cached",
+    b"Dirty": "mem.dirty",
+    b"Writeback": "mem.writeback",
+    b"SwapTotal": "swap.total",
+    b"SwapFree": "swap.free",
+}
+_MEMINFO = re.compile(rb"^(" + rb"|".join(_MEMINFO_FIELDS) + rb"):\s+(\d+)", re.M)
+
+# Field order of /proc/diskstats after the device name (Documentation/admin-guide/iostats.rst).
+_DISK_FIELDS = (
+    "reads",
+    "reads_merged",
+    "read_bytes",
+    "read_ms",
+    "writes",
+    "writes_merged",
+    "write_bytes",
+    "write_ms",
+    "in_flight",
+    "io_ms",
+    "weighted_io_ms",
+)
+_DISK_SECTOR_FIELDS = frozenset({2, 6})
+_DISKSTATS = re.compile(
+    rb"^ *\d+ +\d+ (\S+)" + rb"".join([rb" (\d+)"] * len(_DISK_FIELDS)), re.M
+)
+
+_NET_FIELDS = (
+    "rx_bytes",
+    "rx_packets",
+    "rx_errors",
+    "rx_drop",
+    "tx_bytes",
+    "tx_packets",
+    "tx_errors",
+    "tx_drop",
+)
+_NET_DEV = re.compile(
+    rb"^ *([^:\s]+): *(\d+) +(\d+) +(\d+) +(\d+) +\d+ +\d+ +\d+ +\d+ +(\d+) +(\d+) +(\d+) +(\d+)",
+    re.M,
+)
+
+_SECTOR_BYTES = 512
+_DEFAULT_DISK_EXCLUDE = r"^(loop|ram|zram)\d"
+
+
+class ProcFile:
+    """A file under /proc held open and re-read in place.
+
+    ``read()`` fills the same buffer on every call and returns a view of the
+    bytes the kernel produced.  The buffer doubles whenever a read fills it
+    completely, so it settles at a size that fits the file after the first
+    few samples.  The returned view is only valid until the next ``read()``.
+    """
+
+    __slots__ = ("path", "_fd", "_buf", "_view")
+
+    def __init__(self, path: str, bufsize: int = 4096) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+
+    def read(self) -> memoryview:
+        while True:
+            n = os.preadv(self._fd, [self._buf], 0)
+            if n < len(self._buf):
+                return self._view[:n]
+            self._view.release()
+            self._buf = bytearray(len(self._buf) * 2)
+            self._view = memoryview(self._buf)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._view.release()
+
+    def __enter__(self) -> ProcFile:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class ProcCollector:
+    """Sample CPU, memory, disk and network counters from /proc.
+
+    ``root`` points at the procfs mount and exists so synthetic trees can be
+    sampled.  Block devices whose name matches ``disk_exclude`` (loop and RAM
+    disks by default) are skipped.  A source file that does not exist under
+    ``root`` is silently left out, which keeps the collector usable inside
+    containers that mask parts of /proc.
+    """
+
+    def __init__(self, root: str = "/proc", *, disk_exclude: str | None = _DEFAULT_DISK_EXCLUDE) -> None:
+        self.root = root
+        self._exclude = re.compile(disk_exclude.encode()) if disk_exclude else None
+        self._cpu_names = tuple(f"cpu.{field}" for field in _CPU_FIELDS)
+        self._disk_names: dict[bytes, tuple[str, ...] | None] = {}
+        self._net_names: dict[bytes, tuple[str, ...]] = {}
+        self._stat = self._open("stat")
+        self._meminfo = self._open("meminfo")
+        self._diskstats = self._open("diskstats", 16384)
+        self._netdev = self._open("net/dev", 8192)
+
+    def _open(self, name: str, bufsize: int = 4096) -> ProcFile | None:
+        try:
+            return ProcFile(os.path.join(self.root, name), bufsize)
+        except FileNotFoundError:
+            return None
+
+    def collect(self, into: MutableMapping[str, int] | None = None) -> MutableMapping[str, int]:
+        """Read every source once and return a flat ``metric -> value`` mapping.
+
+        Passing the mapping returned by the previous call updates it in
+        place; devices that disappeared keep their last value until the
+        caller drops them.
+        """
+        out: MutableMapping[str, int] = {} if into is None else into
+        if self._stat is not None:
+            self._parse_stat(self._stat.read(), out)
+        if self._meminfo is not None:
+            self._parse_meminfo(self._meminfo.read(), out)
+        if self._diskstats is not None:
+            self._parse_diskstats(self._diskstats.read(), out)
+        if self._netdev is not None:
+            self._parse_netdev(self._netdev.read(), out)
+        return out
+
+    def _parse_stat(self, data: memoryview, out: MutableMapping[str, int]) -> None:
+        m = _STAT_CPU.search(data)
+        if m is not None:
+            for i, name in enumerate(self._cpu_names, 1):
+                out[name] = int(m[i])
+        for m in _STAT_SCALAR.finditer(data):
+            out[_STAT_SCALARS[m[1]]] = int(m[2])
+
+    def _parse_meminfo(self, data: memoryview, out: MutableMapping[str, int]) -> None:
+        for m in _MEMINFO.finditer(data):
+            out[_MEMINFO_FIELDS[m[1]]] = int(m[2]) * 1024
+
+    def _parse_diskstats(self, data: memoryview, out: MutableMapping[str, int]) -> None:
+        names = self._disk_names
+        for m in _DISKSTATS.finditer(data):
+            dev = m[1]
+            try:
+                keys = names[dev]
+            except KeyError:
+                keys = names[dev] = self._disk_keys(dev)
+            if keys is None:
+                continue
+            for i, key in enumerate(keys):
+                value = int(m[i + 2])
+                out[key] = value * _SECTOR_BYTES if i in _DISK_SECTOR_FIELDS else value
+
+    def _disk_keys(self, dev: bytes) -> tuple[str, ...] | None:
+        if self._exclude is not None and self._exclude.search(dev):
+            return None
+        prefix = "disk." + os.fsdecode(dev)
+        return tuple(f"{prefix}.{field}" for field in _DISK_FIELDS)
+
+    def _parse_netdev(self, data: memoryview, out: MutableMapping[str, int]) -> None:
+        names = self._net_names
+        for m in _NET_DEV.finditer(data):
+            iface = m[1]
+            try:
+                keys = names[iface]
+            except KeyError:
+                prefix = "net." + os.fsdecode(iface)
+                keys = names[iface] = tuple(f"{prefix}.{field}" for field in _NET_FIELDS)
+            for i, key in enumerate(keys):
+                out[key] = int(m[i + 2])
+
+    def close(self) -> None:
+        for source in (self._stat, self._meminfo, self._diskstats, self._netdev):
+            if source is not None:
+                source.close()
+
+    def __enter__(self) -> ProcCollector:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
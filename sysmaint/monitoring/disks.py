@@ -0,0 +1,347 @@
+"""Disk health (SMART/NVMe) and filesystem usage metrics.
+
+:class:`DiskHealth` runs ``smartctl --json -a`` (or ``nvme smart-log -o
+json`` on NVMe drives when smartctl is missing) for every disk on a bounded
+thread pool, with a timeout per command, so a host with dozens of drives
+pays for the slowest call rather than the sum of all of them.  Results are
+cached for ``ttl`` seconds: SMART data changes slowly and reading it can
+stall a busy drive, so it is refreshed far less often than the /proc
+counters.  With ``wait=False`` a stale device is refreshed in the background
+and its previous values are returned at once, so health checks never hold
+up a sampling cycle.
+
+:class:`FilesystemStats` reads ``statvfs`` for every real mount in
+/proc/self/mounts.  Local mounts are read inline; network mounts are read on
+a helper thread with a timeout, so a hung NFS server costs one timeout and
+then the mount is skipped until its last call returns.
+
+Metric names follow :class:`~sysmaint.monitoring.collector.ProcCollector`:
+``smart.<disk>.<field>`` and ``fs.<mount point>.<field>``, for example
+``smart.sda.reallocated_sectors`` or ``fs./var/log.used_pct``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterable, MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Any
+
+__all__ = ["DiskHealth", "FilesystemStats", "parse_nvme_cli", "parse_smartctl"]
+
+logger = logging.getLogger(__name__)
+
+Metrics = dict[str, float]
+
+_DEFAULT_DISK_EXCLUDE = r"^(loop|ram|zram|dm-|md|sr|fd|nbd)\d"
+
+# ATA attribute id -> metric name (raw values).
+_ATA_ATTRIBUTES = {
+    5: "reallocated_sectors",
+    187: "uncorrectable_errors",
+    188: "command_timeouts",
+    197: "pending_sectors",
+    198: "offline_uncorrectable",
+    199: "crc_errors",
+}
+_NVME_FIELDS = {
+    "critical_warning": "critical_warning",
+    "available_spare": "available_spare",
+    "percentage_used": "percentage_used",
+    "media_errors": "media_errors",
+    "num_err_log_entries": "error_log_entries",
+    "unsafe_shutdowns": "unsafe_shutdowns",
+}
+# nvme-cli spells some fields differently, depending on its version.
+_NVME_CLI_FIELDS = {
+    **_NVME_FIELDS,
+    "avail_spare": "available_spare",
+    "percent_used": "percentage_used",
+    "power_on_hours": "power_on_hours",
+}
+
+# smartctl's exit status is a bit mask; these bits mean no usable output.
+_SMARTCTL_FATAL = 0b11
+
+
+def parse_smartctl(data: dict[str, Any]) -> Metrics:
+    """Metrics from the JSON of ``smartctl --json -a``."""
+    out: Metrics = {}
+    status = data.get("smart_status")
+    if isinstance(status, dict) and "passed" in status:
+        out["healthy"] = float(bool(status["passed"]))
+    temperature = data.get("temperature", {}).get("current")
+    if temperature is not None:
+        out["temperature"] = float(temperature)
+    hours = data.get("power_on_time", {}).get("hours")
+    if hours is not None:
+        out["power_on_hours"] = float(hours)
+    for attribute in data.get("ata_smart_attributes", {}).get("table", []):
+        name = _ATA_ATTRIBUTES.get(attribute.get("id"))
+        if name is not None:
+            out[name] = float(attribute.get("raw", {}).get("value", 0))
+    nvme = data.get("nvme_smart_health_information_log")
+    if nvme:
+        for key, name in _NVME_FIELDS.items():
+            if key in nvme:
+                out[name] = float(nvme[key])
+    return out
+
+
+def parse_nvme_cli(data: dict[str, Any]) -> Metrics:
+    """Metrics from the JSON of ``nvme smart-log -o json``."""
+    out: Metrics = {}
+    for key, name in _NVME_CLI_FIELDS.items():
+        if key in data:
+            out[name] = float(data[key])
+    if "temperature" in data:
+        out["temperature"] = float(data["temperature"]) - 273.0  # reported in kelvin
+    if "critical_warning" in data:
+        out["healthy"] = float(not data["critical_warning"])
+    return out
+
+
+class DiskHealth:
+    """SMART and NVMe health of the host's disks, refreshed every ``ttl`` seconds.
+
+    ``devices`` are names under /dev; by default every physical disk under
+    ``sysfs``/block (not partitions, loop, device-mapper or RAID devices).
+    ``timeout`` bounds each command and ``workers`` how many run at once.
+    A device whose command fails is retried after ``error_ttl``.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[str] | None = None,
+        *,
+        smartctl: str = "smartctl",
+        nvme: str = "nvme",
+        ttl: float = 1800.0,
+        error_ttl: float = 300.0,
+        timeout: float = 20.0,
+        workers: int = 8,
+        sysfs: str = "/sys",
+        disk_exclude: str | None = _DEFAULT_DISK_EXCLUDE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._devices = list(devices) if devices is not None else None
+        self.smartctl = shutil.which(smartctl)
+        self.nvme = shutil.which(nvme)
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.workers = workers
+        self.sysfs = sysfs
+        self._exclude = re.compile(disk_exclude) if disk_exclude else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: dict[str, tuple[float, Metrics]] = {}
+        self._pending: dict[str, Future[None]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self.calls = 0
+
+    def devices(self) -> list[str]:
+        if self._devices is not None:
+            return self._devices
+        block = os.path.join(self.sysfs, "block")
+        try:
+            names = sorted(os.listdir(block))
+        except OSError:
+            return []
+        return [
+            name
+            for name in names
+            if (self._exclude is None or not self._exclude.search(name))
+            and os.path.exists(os.path.join(block, name, "device"))
+        ]
+
+    def _command(self, device: str) -> tuple[list[str], Callable[[dict[str, Any]], Metrics]] | None:
+        path = os.path.join("/dev", device)
+        if self.smartctl is not None:
+            return [self.smartctl, "--json=c", "-a", path], parse_smartctl
+        if self.nvme is not None and device.startswith("nvme"):
+            return [self.nvme, "smart-log", path, "-o", "json"], parse_nvme_cli
+        return None
+
+    def read(self, device: str) -> Metrics:
+        """Run the health command for one device now, bypassing the cache."""
+        command = self._command(device)
+        if command is None:
+            raise FileNotFoundError("neither smartctl nor nvme-cli is installed")
+        argv, parse = command
+        self.calls += 1
+        proc = subprocess.run(argv, stdin=subprocess.DEVNULL, capture_output=True, timeout=self.timeout)
+        if parse is parse_smartctl and proc.returncode & _SMARTCTL_FATAL or parse is parse_nvme_cli and proc.returncode:
+            error = proc.stderr.decode(errors="replace").strip() or f"exit status {proc.returncode}"
+            raise subprocess.CalledProcessError(proc.returncode, argv, proc.stdout, error)
+        return parse(json.loads(proc.stdout))
+
+    def _refresh(self, device: str) -> None:
+        try:
+            metrics = self.read(device)
+            ttl = self.ttl
+        except (OSError, ValueError, subprocess.SubprocessError) as exc:
+            logger.warning("disk health of %s unavailable: %s", device, exc)
+            metrics, ttl = {}, self.error_ttl
+        with self._lock:
+            self._cache[device] = (self._clock() + ttl, metrics)
+            self._pending.pop(device, None)
+
+    def collect(
+        self, into: MutableMapping[str, float] | None = None, *, wait: bool = True
+    ) -> MutableMapping[str, float]:
+        """Return ``smart.<disk>.<field>`` metrics, refreshing stale devices.
+
+        Stale devices are refreshed together on the pool.  With ``wait``
+        false the call does not wait for them and reports the values from
+        their previous refresh (nothing for a device never read before).
+        Devices no installed tool can read are left out.
+        """
+        out: MutableMapping[str, float] = {} if into is None else into
+        devices = [device for device in self.devices() if self._command(device) is not None]
+        now = self._clock()
+        futures = []
+        with self._lock:
+            for device in devices:
+                entry = self._cache.get(device)
+                if entry is not None and entry[0] > now:
+                    continue
+                future = self._pending.get(device)
+                if future is None:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="sysmaint-smart")
+                    future = self._pending[device] = self._executor.submit(self._refresh, device)
+                futures.append(future)
+        if wait and futures:
+            wait_futures(futures)
+        with self._lock:
+            for device in devices:
+                entry = self._cache.get(device)
+                if entry is not None:
+                    for field, value in entry[1].items():
+                        out[f"smart.{device}.{field}"] = value
+        return out
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> DiskHealth:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+# Pseudo and read-only image filesystems that df(1) would not show either.
+_PSEUDO_FS = frozenset(
+    {
+        *("autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts", "devtmpfs"),
+        *("efivarfs", "fusectl", "hugetlbfs", "mqueue", "nsfs", "proc", "pstore", "ramfs", "rpc_pipefs"),
+        *("securityfs", "selinuxfs", "squashfs", "sysfs", "tracefs"),
+    }
+)
+_NETWORK_FS = frozenset({"nfs", "nfs4", "cifs", "smb3", "ceph", "glusterfs", "fuse.sshfs", "9p", "afs"})
+_MOUNT_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+class FilesystemStats:
+    """``statvfs`` of every mounted filesystem as ``fs.<mount>.<field>`` metrics.
+
+    Fields are ``total``, ``avail`` and ``used`` (bytes), ``used_pct`` (of
+    the space available to unprivileged users, as df(1) reports it) and
+    ``inodes_used_pct``.  ``mounts`` restricts the report to those mount
+    points; network mounts that do not answer within ``timeout`` seconds
+    are skipped.
+    """
+
+    def __init__(
+        self,
+        mounts: Iterable[str] | None = None,
+        *,
+        mounts_file: str = "/proc/self/mounts",
+        exclude_types: Iterable[str] = _PSEUDO_FS,
+        timeout: float = 2.0,
+    ) -> None:
+        self.only = set(mounts) if mounts is not None else None
+        self.mounts_file = mounts_file
+        self.exclude_types = frozenset(exclude_types)
+        self.timeout = timeout
+        self._hung: dict[str, threading.Thread] = {}
+
+    def mounts(self) -> dict[str, str]:
+        """Mount point -> filesystem type, later mounts shadowing earlier ones."""
+        found = {}
+        try:
+            with open(self.mounts_file) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 3 or fields[2] in self.exclude_types:
+                continue
+            mount = _MOUNT_ESCAPE.sub(lambda m: chr(int(m[1], 8)), fields[1])
+            if self.only is None or mount in self.only:
+                found[mount] = fields[2]
+        if self.only is not None:
+            found.update((mount, "") for mount in self.only if mount not in found)
+        return found
+
+    def _statvfs(self, mount: str, fstype: str) -> os.statvfs_result | None:
+        if fstype not in _NETWORK_FS:
+            return os.statvfs(mount)
+        stuck = self._hung.get(mount)
+        if stuck is not None:
+            if stuck.is_alive():
+                return None
+            del self._hung[mount]
+        result: list[os.statvfs_result] = []
+        errors: list[OSError] = []
+
+        def call() -> None:
+            try:
+                result.append(os.statvfs(mount))
+            except OSError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=call, name="sysmaint-statvfs", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            logger.warning("statvfs(%s) did not return within %.1fs; skipping it", mount, self.timeout)
+            self._hung[mount] = thread
+            return None
+        if errors:
+            raise errors[0]
+        return result[0]
+
+    def collect(self, into: MutableMapping[str, float] | None = None) -> MutableMapping[str, float]:
+        out: MutableMapping[str, float] = {} if into is None else into
+        for mount, fstype in self.mounts().items():
+            try:
+                st = self._statvfs(mount, fstype)
+            except OSError as exc:
+                logger.debug("statvfs(%s) failed: %s", mount, exc)
+                continue
+            if st is None or not st.f_blocks:
+                continue
+            total, free, avail = st.f_blocks * st.f_frsize, st.f_bfree * st.f_frsize, st.f_bavail * st.f_frsize
+            used = total - free
+            prefix = f"fs.{mount}."
+            out[prefix + "total"] = total
+            out[prefix + "avail"] = avail
+            out[prefix + "used"] = used
+            out[prefix + "used_pct"] = 100.0 * used / (used + avail) if used + avail else 0.0
+            if st.f_files:
+                out[prefix + "inodes_used_pct"] = 100.0 * (st.f_files - st.f_ffree) / st.f_files
+        return out
@@ -0,0 +1,247 @@
+"""Process table snapshots and per-process rates.
+
+A snapshot is one pass over ``/proc/[pid]``: ``stat`` for CPU time, memory
+and identity, ``io`` for storage and syscall counters, and, when asked for,
+``statm`` for shared memory.  Each file is read with a single
+``openat``/``read``/``close`` relative to a descriptor of the procfs root,
+and only the needed fields are converted, straight into ``array('q')``
+columns that become NumPy arrays at the end of the pass; no per-process
+objects are created.
+
+The pass is bound by procfs itself: the kernel takes about 3.5 us to
+generate each ``stat`` or ``io`` file, and parsing adds about as much
+again.  On a single-vCPU VM a snapshot costs about 14 us per process with
+``io`` and 8 us without.  A 20,000-process host would then take about
+280 ms per snapshot with ``io`` and 160 ms without, which misses a 100 ms
+budget; reading on threads did not help there.  Such hosts should sample
+every few seconds, or pass ``io=False``.
+
+Rates come from two snapshots.  Processes are matched on ``(pid,
+starttime)`` so a recycled pid is never mistaken for the process it
+replaced, and the deltas for the whole table are computed with a handful
+of vectorised operations.  A process that appeared between the snapshots
+started with zeroed counters, so its current counters are its delta.
+
+``io`` is only readable for one's own processes unless running as root;
+unreadable counters are recorded as -1 and their rates as NaN.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__all__ = ["ProcessRates", "ProcessSampler", "ProcessSnapshot"]
+
+# Indices into the fields after "pid (comm) ", starting with the state.
+_STAT_FIELDS = {
+    "ppid": 1,
+    "minflt": 7,
+    "majflt": 9,
+    "utime": 11,
+    "stime": 12,
+    "threads": 17,
+    "starttime": 19,
+    "vsize": 20,
+    "rss": 21,
+}
+_STAT_SPLIT = max(_STAT_FIELDS.values()) + 1
+_IO_FIELDS = ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes")
+_RATE_FIELDS = ("minflt", "majflt", *_IO_FIELDS)
+
+
+def _numpy():
+    return require("numpy", "process snapshots")
+
+
+@dataclass
+class ProcessSnapshot:
+    """The process table at one instant, as parallel columns sorted by pid.
+
+    ``columns`` holds ``pid`` plus the stat, io (and optionally ``shared``)
+    fields as int64 arrays; ``rss`` and ``shared`` are in bytes, CPU times in
+    clock ticks.  ``comm`` lists the command names in the same order.
+    """
+
+    timestamp: float
+    monotonic: float
+    columns: dict[str, np.ndarray]
+    comm: list[str]
+
+    def __len__(self) -> int:
+        return len(self.comm)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+@dataclass
+class ProcessRates:
+    """Per-process activity between two snapshots, aligned with ``current``.
+
+    ``cpu`` is the share of one CPU used over the interval (1.0 = one full
+    core); the ``*_per_sec`` arrays are counter rates.  ``new`` marks
+    processes that did not exist in the previous snapshot.
+    """
+
+    current: ProcessSnapshot
+    interval: float
+    cpu: np.ndarray
+    rates: dict[str, np.ndarray]
+    new: np.ndarray
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == "cpu":
+            return self.cpu
+        if name in self.rates:
+            return self.rates[name]
+        return self.current.columns[name]
+
+    def top(self, n: int = 10, by: str = "cpu") -> list[dict[str, Any]]:
+        """The ``n`` processes with the highest ``by``, largest first.
+
+        ``by`` is ``"cpu"``, a rate such as ``"read_bytes_per_sec"``, or a
+        snapshot column such as ``"rss"``.
+        """
+        np = _numpy()
+        values = self[by]
+        if by in ("cpu", *self.rates):
+            values = np.nan_to_num(values, nan=-1.0)
+        n = min(n, len(values))
+        if n <= 0:
+            return []
+        picked = np.argpartition(values, len(values) - n)[-n:]
+        picked = picked[np.argsort(values[picked], kind="stable")[::-1]]
+        cols = self.current.columns
+        return [
+            {
+                "pid": int(cols["pid"][i]),
+                "comm": self.current.comm[i],
+                "cpu": float(self.cpu[i]),
+                "rss": int(cols["rss"][i]),
+                **{name: float(rate[i]) for name, rate in self.rates.items()},
+            }
+            for i in picked.tolist()
+        ]
+
+
+def _read(path: str, dir_fd: int) -> bytes | None:
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC, dir_fd=dir_fd)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, 4096)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+class ProcessSampler:
+    """Snapshot the process table and derive rates from consecutive snapshots.
+
+    ``io=False`` skips ``/proc/[pid]/io`` and ``statm=True`` adds the
+    ``shared`` column from ``/proc/[pid]/statm``; ``stat`` alone already
+    carries virtual size and RSS.  ``root`` points at the procfs mount.
+    """
+
+    def __init__(self, root: str = "/proc", *, io: bool = True, statm: bool = False) -> None:
+        self.root = root
+        self.io = io
+        self.statm = statm
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.previous: ProcessSnapshot | None = None
+
+    def snapshot(self) -> ProcessSnapshot:
+        """Read every process once and return the table sorted by pid."""
+        np = _numpy()
+        root = self.root
+        pids = sorted(int(name) for name in os.listdir(root) if name.isdigit())
+        stat_cols = {name: array("q") for name in _STAT_FIELDS}
+        stat_items = tuple((stat_cols[name].append, index) for name, index in _STAT_FIELDS.items())
+        io_cols = {name: array("q") for name in _IO_FIELDS} if self.io else {}
+        io_appends = tuple(col.append for col in io_cols.values())
+        shared = array("q")
+        pid_col = array("q")
+        comm: list[str] = []
+        started, wall = time.monotonic(), time.time()
+        root_fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        try:
+            for pid in pids:
+                base = f"{pid}/"
+                data = _read(base + "stat", root_fd)
+                if data is None:
+                    continue  # exited since the listing
+                head, _, tail = data.rpartition(b") ")
+                fields = tail.split(None, _STAT_SPLIT)
+                pid_col.append(pid)
+                comm.append(head.partition(b" (")[2].decode(errors="replace"))
+                for append, index in stat_items:
+                    append(int(fields[index]))
+                if io_appends:
+                    data = _read(base + "io", root_fd)
+                    if data:
+                        values = data.split()[1::2]
+                        for append, value in zip(io_appends, values):
+                            append(int(value))
+                    else:
+                        for append in io_appends:
+                            append(-1)
+                if self.statm:
+                    data = _read(base + "statm", root_fd)
+                    shared.append(int(data.split()[2]) * self.page_size if data else -1)
+        finally:
+            os.close(root_fd)
+        columns = {"pid": np.frombuffer(pid_col, dtype=np.int64)}
+        for name, col in (*stat_cols.items(), *io_cols.items()):
+            columns[name] = np.frombuffer(col, dtype=np.int64)
+        columns["rss"] = columns["rss"] * self.page_size
+        if self.statm:
+            columns["shared"] = np.frombuffer(shared, dtype=np.int64)
+        return ProcessSnapshot(wall, (started + time.monotonic()) / 2, columns, comm)
+
+    def rates(self, previous: ProcessSnapshot, current: ProcessSnapshot) -> ProcessRates:
+        """Per-process CPU share and counter rates between two snapshots."""
+        np = _numpy()
+        interval = max(current.monotonic - previous.monotonic, 1e-9)
+        prev, cur = previous.columns, current.columns
+        # Both tables are sorted by pid; locate each current pid in the old one.
+        if len(prev["pid"]):
+            idx = np.minimum(np.searchsorted(prev["pid"], cur["pid"]), len(prev["pid"]) - 1)
+            matched = (prev["pid"][idx] == cur["pid"]) & (prev["starttime"][idx] == cur["starttime"])
+        else:
+            idx = None
+            matched = np.zeros(len(cur["pid"]), dtype=bool)
+
+        def delta(name: str) -> np.ndarray:
+            now = cur[name]
+            before = np.zeros_like(now) if idx is None else np.where(matched, prev[name][idx], 0)
+            d = (now - before).astype(np.float64)
+            if name in _IO_FIELDS:
+                d[(now < 0) | (before < 0)] = np.nan
+            return d
+
+        cpu = (delta("utime") + delta("stime")) / (self.ticks * interval)
+        rates = {f"{name}_per_sec": delta(name) / interval for name in _RATE_FIELDS if name in cur}
+        return ProcessRates(current, interval, cpu, rates, ~matched)
+
+    def sample(self) -> ProcessRates | None:
+        """Take a snapshot and return rates against the previous one.
+
+        The first call only primes the sampler and returns None.
+        """
+        current = self.snapshot()
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return None
+        return self.rates(previous, current)
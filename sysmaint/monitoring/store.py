@@ -0,0 +1,398 @@
+"""Columnar, memory-mapped time-series store for monitoring samples.
+
+A store is a directory of segments.  Each segment covers one epoch-aligned
+span of time (a day by default) and holds a timestamp column plus one column
+per metric, each in its own file of little-endian float64 values.  Appending
+writes fixed-width values to the end of those files; reading maps them with
+:class:`numpy.memmap`, so aggregating weeks of samples touches only the
+columns asked for and never parses text.  Time ranges are located by binary
+search on the timestamp column, which must therefore be non-decreasing.
+
+A segment's row count is the length of its timestamp file.  Every flush
+writes the metric columns before the timestamps, so after a crash a column
+may run past the timestamp column but never falls short of it; the surplus is
+ignored by readers and trimmed before the next append.  A metric that first
+appears mid-segment is back-filled with NaN, and a sample without a value
+for a known metric stores NaN.
+
+When a sample lands in a later span the previous segment is sealed: its
+metadata gains a checksum over the column files and it is never written
+again, so results computed from it can be cached.  :meth:`SeriesStore.compact`
+downsamples sealed segments into ``min``/``max``/``avg``/``count`` rollups kept
+as ordinary stores under ``rollup-<seconds>``; the rollup of metric ``m``
+at that resolution is stored as columns ``m:min``, ``m:max`` and so on.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import shutil
+from collections.abc import Iterable, Mapping, Sequence
+from typing import TYPE_CHECKING
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__all__ = ["ROLLUP_FIELDS", "Segment", "SeriesStore"]
+
+ROLLUP_FIELDS = ("min", "max", "avg", "count")
+
+_FORMAT_VERSION = 1
+_DTYPE = "<f8"
+_ITEMSIZE = 8
+_META = "meta.json"
+_TIMESTAMPS = "ts.f8"
+_SEGMENT_PREFIX = "seg-"
+
+
+def _numpy():
+    return require("numpy", "the time-series store")
+
+
+def _write_json(path: str, data: object) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class Segment:
+    """One span of a store, read through memory maps.
+
+    Arrays returned by :meth:`timestamps` and :meth:`column` are read-only
+    views of the files and reflect the row count at the time the segment
+    object was created.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.id = os.path.basename(path)
+        with open(os.path.join(path, _META)) as f:
+            self.meta: dict = json.load(f)
+        self.rows = os.path.getsize(os.path.join(path, _TIMESTAMPS)) // _ITEMSIZE
+
+    @property
+    def start(self) -> int:
+        return self.meta["start"]
+
+    @property
+    def span(self) -> int:
+        return self.meta["span"]
+
+    @property
+    def sealed(self) -> bool:
+        return self.meta.get("sealed", False)
+
+    @property
+    def checksum(self) -> str | None:
+        return self.meta.get("checksum")
+
+    @property
+    def columns(self) -> list[str]:
+        return sorted(self.meta["columns"])
+
+    def _map(self, filename: str) -> np.ndarray:
+        np = _numpy()
+        if self.rows == 0:
+            return np.empty(0, dtype=_DTYPE)
+        return np.memmap(os.path.join(self.path, filename), dtype=_DTYPE, mode="r", shape=(self.rows,))
+
+    def timestamps(self) -> np.ndarray:
+        return self._map(_TIMESTAMPS)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of ``name``, or all-NaN if this segment lacks it."""
+        filename = self.meta["columns"].get(name)
+        if filename is None:
+            np = _numpy()
+            return np.full(self.rows, np.nan)
+        return self._map(filename)
+
+    def bounds(self, start: float | None = None, end: float | None = None) -> tuple[int, int]:
+        """Row range ``[lo, hi)`` with ``start <= ts < end``, by binary search."""
+        ts = self.timestamps()
+        lo = 0 if start is None else int(ts.searchsorted(start, "left"))
+        hi = self.rows if end is None else int(ts.searchsorted(end, "left"))
+        return lo, max(lo, hi)
+
+    def __repr__(self) -> str:
+        return f"Segment({self.path!r}, rows={self.rows}, sealed={self.sealed})"
+
+
+class SeriesStore:
+    """Append-only store of samples under ``root``.
+
+    ``span`` is the time covered by one segment, in seconds.  Samples passed
+    to :meth:`append` are buffered and written every ``flush_rows`` rows;
+    call :meth:`flush` (or :meth:`close`) to make them visible to readers.
+    """
+
+    def __init__(self, root: str, *, span: int = 86400, flush_rows: int = 60) -> None:
+        if span <= 0:
+            raise ValueError("span must be positive")
+        self.root = root
+        self.span = span
+        self.flush_rows = flush_rows
+        os.makedirs(root, exist_ok=True)
+        self._pending: list[tuple[float, Mapping[str, float]]] = []
+        self._active: Segment | None = None
+        self._recovered = False
+        self._last_ts = -math.inf
+        segments = self.segments()
+        if segments:
+            last = segments[-1]
+            if last.rows:
+                self._last_ts = float(last.timestamps()[-1])
+            if not last.sealed:
+                self._active = last
+
+    # -- reading ---------------------------------------------------------
+
+    def segments(self, start: float | None = None, end: float | None = None) -> list[Segment]:
+        """Segments overlapping ``[start, end)``, oldest first."""
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith(_SEGMENT_PREFIX):
+                continue
+            seg_start = int(name[len(_SEGMENT_PREFIX) :])
+            if end is not None and seg_start >= end:
+                continue
+            if start is not None and seg_start + self.span <= start:
+                continue
+            found.append(Segment(os.path.join(self.root, name)))
+        return found
+
+    def read(
+        self,
+        start: float | None = None,
+        end: float | None = None,
+        metrics: Sequence[str] | None = None,
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """Copy the samples in ``[start, end)`` out of the store.
+
+        Returns the timestamps and a ``metric -> values`` mapping covering
+        ``metrics`` (every metric present in the range when omitted).
+        """
+        np = _numpy()
+        segments = self.segments(start, end)
+        if metrics is None:
+            metrics = sorted({name for seg in segments for name in seg.meta["columns"]})
+        ts_parts = []
+        parts: dict[str, list[np.ndarray]] = {name: [] for name in metrics}
+        for seg in segments:
+            lo, hi = seg.bounds(start, end)
+            if lo == hi:
+                continue
+            ts_parts.append(seg.timestamps()[lo:hi])
+            for name in metrics:
+                parts[name].append(seg.column(name)[lo:hi])
+        if not ts_parts:
+            return np.empty(0), {name: np.empty(0) for name in metrics}
+        return np.concatenate(ts_parts), {name: np.concatenate(p) for name, p in parts.items()}
+
+    @property
+    def last_timestamp(self) -> float | None:
+        if self._pending:
+            return self._pending[-1][0]
+        return None if self._last_ts == -math.inf else self._last_ts
+
+    # -- writing ---------------------------------------------------------
+
+    def append(self, ts: float, values: Mapping[str, float]) -> None:
+        """Buffer one sample; ``ts`` must not be earlier than the last one."""
+        if ts < self._last_ts:
+            raise ValueError(f"timestamp {ts} is earlier than the last stored sample {self._last_ts}")
+        seg_start = int(ts // self.span) * self.span
+        if self._pending and int(self._pending[-1][0] // self.span) * self.span != seg_start:
+            self.flush()
+        self._pending.append((ts, values))
+        self._last_ts = ts
+        if len(self._pending) >= self.flush_rows:
+            self.flush()
+
+    def append_columns(self, ts: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        """Append a batch given as a timestamp array and aligned metric arrays."""
+        np = _numpy()
+        self.flush()
+        ts = np.asarray(ts, dtype=_DTYPE)
+        if ts.size == 0:
+            return
+        if ts[0] < self._last_ts or (ts.size > 1 and bool((np.diff(ts) < 0).any())):
+            raise ValueError("timestamps must be non-decreasing and not earlier than the stored data")
+        spans = (ts // self.span).astype(np.int64)
+        cuts = np.flatnonzero(spans[1:] != spans[:-1]) + 1
+        for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, ts.size]):
+            self._write(int(spans[lo]) * self.span, ts[lo:hi], {k: np.asarray(v)[lo:hi] for k, v in columns.items()})
+        self._last_ts = float(ts[-1])
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        np = _numpy()
+        rows, self._pending = self._pending, []
+        names = {name for _, values in rows for name in values}
+        nan = math.nan
+        columns = {name: np.fromiter((values.get(name, nan) for _, values in rows), _DTYPE, len(rows)) for name in names}
+        ts = np.fromiter((t for t, _ in rows), _DTYPE, len(rows))
+        self._write(int(rows[0][0] // self.span) * self.span, ts, columns)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> SeriesStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _write(self, seg_start: int, ts: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        np = _numpy()
+        seg = self._segment_for(seg_start)
+        files: dict[str, str] = seg.meta["columns"]
+        added = [name for name in columns if name not in files]
+        for name in added:
+            files[name] = f"c{len(files):05d}.f8"
+            with open(os.path.join(seg.path, files[name]), "wb") as f:
+                f.write(np.full(seg.rows, np.nan, dtype=_DTYPE).tobytes())
+        if added:
+            _write_json(os.path.join(seg.path, _META), seg.meta)
+        missing = None
+        for name, filename in files.items():
+            values = columns.get(name)
+            if values is None:
+                if missing is None:
+                    missing = np.full(ts.size, np.nan, dtype=_DTYPE).tobytes()
+                data = missing
+            else:
+                data = np.asarray(values, dtype=_DTYPE).tobytes()
+            with open(os.path.join(seg.path, filename), "ab") as f:
+                f.write(data)
+        with open(os.path.join(seg.path, _TIMESTAMPS), "ab") as f:
+            f.write(ts.astype(_DTYPE, copy=False).tobytes())
+        seg.rows += ts.size
+
+    def _segment_for(self, seg_start: int) -> Segment:
+        active = self._active
+        if active is not None and not self._recovered:
+            self._recover(active)
+        if active is not None and active.start == seg_start:
+            return active
+        if active is not None:
+            self._seal(active)
+        path = os.path.join(self.root, f"{_SEGMENT_PREFIX}{seg_start:012d}")
+        os.makedirs(path, exist_ok=True)
+        open(os.path.join(path, _TIMESTAMPS), "ab").close()
+        meta_path = os.path.join(path, _META)
+        if not os.path.exists(meta_path):
+            _write_json(meta_path, {"version": _FORMAT_VERSION, "start": seg_start, "span": self.span, "columns": {}})
+        self._active = self._recover(Segment(path))
+        return self._active
+
+    def _recover(self, seg: Segment) -> Segment:
+        """Trim or pad every column of an unsealed segment to its row count.
+
+        Only the writer does this, right before its first append, so opening
+        a store to read never modifies it.
+        """
+        self._recovered = True
+        size = seg.rows * _ITEMSIZE
+        for filename in seg.meta["columns"].values():
+            path = os.path.join(seg.path, filename)
+            have = os.path.getsize(path) if os.path.exists(path) else 0
+            if have > size:
+                os.truncate(path, size)
+            elif have < size:
+                with open(path, "ab") as f:
+                    f.write(b"\0\0\0\0\0\0\xf8\x7f" * ((size - have) // _ITEMSIZE))
+        return seg
+
+    def _seal(self, seg: Segment) -> None:
+        digest = hashlib.blake2b(digest_size=16)
+        for name in [None, *seg.columns]:
+            filename = _TIMESTAMPS if name is None else seg.meta["columns"][name]
+            if name is not None:
+                digest.update(name.encode() + b"\0")
+            with open(os.path.join(seg.path, filename), "rb") as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+        seg.meta.update(sealed=True, checksum=digest.hexdigest(), rows=seg.rows)
+        _write_json(os.path.join(seg.path, _META), seg.meta)
+        if self._active is seg:
+            self._active = None
+
+    # -- rollups ---------------------------------------------------------
+
+    def rollup(self, resolution: int) -> SeriesStore:
+        """The store holding this store's rollups at ``resolution`` seconds."""
+        return SeriesStore(
+            os.path.join(self.root, f"rollup-{resolution}"),
+            span=resolution * 1440,
+            flush_rows=self.flush_rows,
+        )
+
+    def compact(
+        self,
+        before: float | None = None,
+        resolutions: Iterable[int] = (60, 3600),
+        *,
+        drop_raw: bool = False,
+    ) -> list[str]:
+        """Roll sealed segments that end before ``before`` up to ``resolutions``.
+
+        Segments already rolled up at a resolution are skipped, so compaction
+        can run repeatedly.  With ``drop_raw`` the raw segment is deleted once
+        all its rollups are written.  Returns the ids of compacted segments.
+        """
+        np = _numpy()
+        resolutions = sorted(resolutions)
+        for res in resolutions:
+            if self.span % res:
+                raise ValueError(f"rollup resolution {res}s does not divide the segment span {self.span}s")
+        targets = {res: self.rollup(res) for res in resolutions}
+        compacted = []
+        for seg in self.segments(end=before):
+            if not seg.sealed or (before is not None and seg.start + seg.span > before):
+                continue
+            done = set(seg.meta.get("rollups", []))
+            if done.issuperset(resolutions) and not drop_raw:
+                continue
+            for res in resolutions:
+                if res in done or seg.rows == 0:
+                    continue
+                target = targets[res]
+                ts, columns = _downsample(np, seg, res)
+                last = target.last_timestamp
+                if last is not None:
+                    keep = ts > last
+                    ts, columns = ts[keep], {k: v[keep] for k, v in columns.items()}
+                target.append_columns(ts, columns)
+                done.add(res)
+            seg.meta["rollups"] = sorted(done)
+            _write_json(os.path.join(seg.path, _META), seg.meta)
+            if drop_raw:
+                shutil.rmtree(seg.path)
+            compacted.append(seg.id)
+        return compacted
+
+
+def _downsample(np, seg: Segment, resolution: int) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    ts = np.asarray(seg.timestamps())
+    buckets = (ts // resolution).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    out: dict[str, np.ndarray] = {}
+    for name in seg.columns:
+        values = np.asarray(seg.column(name))
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid.astype(np.int64), starts)
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"{name}:min"] = np.fmin.reduceat(values, starts)
+            out[f"{name}:max"] = np.fmax.reduceat(values, starts)
+            out[f"{name}:avg"] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        out[f"{name}:count"] = count.astype(_DTYPE)
+    return (buckets[starts] * resolution).astype(_DTYPE), out
@@ -0,0 +1,292 @@
+"""Compact binary encoding for batches of metric samples.
+
+A batch is a run of timestamps plus one value column per metric, the same
+shape the store and the aggregation code use.  Encoding and decoding work
+on whole columns with NumPy; no Python code runs per sample.
+
+Layout (all integers are unsigned LEB128 varints, signed ones zigzagged)::
+
+    magic "SMW" version:u8
+    rows columns
+    per column: name_len name kind:u8          kind 0 = float, 1 = integer
+    timestamps: ts[0] delta[0] delta-of-delta[1:]  (milliseconds, zigzag)
+    per column: payload_len payload
+
+Timestamps are stored at millisecond precision.  Sampling at a fixed
+interval makes every delta-of-delta zero, one byte per sample.
+
+Integer columns (every value finite and integral, which covers the kernel
+counters) store the first value and then successive differences as zigzag
+varints, so a counter that grows by a few thousand per sample costs two or
+three bytes.
+
+Float columns use the XOR scheme of Facebook's Gorilla, aligned to bytes so
+it vectorises: each value is XORed with its predecessor's bit pattern and
+only the bytes between the leading and trailing zero bytes are kept.  One
+control byte per value (leading zero bytes in the high nibble, kept bytes
+in the low) is stored for the whole column ahead of the kept bytes, so a
+decoder finds every value's offset with one cumulative sum.  A repeated
+value costs its control byte only.  NaN round-trips bit for bit.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__all__ = ["decode_batch", "encode_batch", "encode_samples"]
+
+MAGIC = b"SMW"
+VERSION = 1
+FLOAT, INTEGER = 0, 1
+_MAX_EXACT = 2**53
+
+
+def _numpy():
+    return require("numpy", "the binary wire format")
+
+
+# -- varints -------------------------------------------------------------
+
+
+def _zigzag(np, values: np.ndarray) -> np.ndarray:
+    v = values.astype(np.int64)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def _unzigzag(np, values: np.ndarray) -> np.ndarray:
+    v = values.astype(np.uint64)
+    return ((v >> np.uint64(1)).view(np.int64)) ^ -((v & np.uint64(1)).view(np.int64))
+
+
+def _varints(np, values: np.ndarray) -> tuple[bytes, np.ndarray]:
+    """Encode unsigned 64-bit integers as LEB128 varints; also return each one's length."""
+    v = np.asarray(values, dtype=np.uint64).ravel()
+    if not len(v):
+        return b"", np.zeros(0, dtype=np.int64)
+    groups = np.empty((len(v), 10), dtype=np.uint8)
+    for i in range(10):
+        groups[:, i] = ((v >> np.uint64(7 * i)) & np.uint64(0x7F)).astype(np.uint8)
+    lengths = np.ones(len(v), dtype=np.int64)
+    for i in range(1, 10):
+        lengths += v >= np.uint64(1 << (7 * i))
+    cols = np.arange(10)
+    keep = cols < lengths[:, None]
+    groups[cols < (lengths - 1)[:, None]] |= 0x80
+    return groups[keep].tobytes(), lengths
+
+
+def _read_varints(np, data: memoryview, offset: int, count: int) -> tuple[np.ndarray, int]:
+    """Decode ``count`` varints starting at ``offset``; return them and the end offset."""
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64), offset
+    raw = np.frombuffer(data, dtype=np.uint8, offset=offset)
+    ends = np.flatnonzero(raw < 0x80)
+    if len(ends) < count:
+        raise ValueError("truncated varint stream")
+    ends = ends[:count]
+    end = int(ends[-1]) + 1
+    raw = raw[:end]
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    position = np.arange(end) - np.repeat(starts, ends - starts + 1)
+    parts = (raw & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(parts, starts), offset + end
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: memoryview, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+# -- columns -------------------------------------------------------------
+
+
+def _encode_integers(np, matrix: np.ndarray) -> list[bytes]:
+    """Encode the columns of an integral ``rows x n`` matrix."""
+    v = matrix.T.astype(np.int64)
+    deltas = np.empty_like(v)
+    deltas[:, :1] = v[:, :1]
+    deltas[:, 1:] = np.diff(v, axis=1)
+    data, lengths = _varints(np, _zigzag(np, deltas))
+    return _split(np, data, lengths.reshape(v.shape).sum(axis=1))
+
+
+def _decode_integers(np, payloads: list[memoryview], rows: int) -> np.ndarray:
+    """Decode integer column payloads into an ``n x rows`` matrix."""
+    deltas, _ = _read_varints(np, memoryview(b"".join(payloads)), 0, rows * len(payloads))
+    return np.cumsum(_unzigzag(np, deltas).reshape(len(payloads), rows), axis=1).astype(np.float64)
+
+
+def _encode_floats(np, matrix: np.ndarray) -> list[bytes]:
+    """Encode the columns of a ``rows x n`` float matrix."""
+    bits = np.ascontiguousarray(matrix.T, dtype="<f8").view(np.uint64)
+    xor = bits.copy()
+    xor[:, 1:] ^= bits[:, :-1]
+    as_bytes = xor.astype(">u8").view(np.uint8).reshape(*xor.shape, 8)  # most significant byte first
+    nonzero = as_bytes != 0
+    any_set = nonzero.any(axis=2)
+    lead = np.where(any_set, nonzero.argmax(axis=2), 8)
+    trail = np.where(any_set, nonzero[..., ::-1].argmax(axis=2), 0)
+    length = 8 - lead - trail
+    control = ((lead << 4) | length).astype(np.uint8)
+    cols = np.arange(8)
+    keep = (cols >= lead[..., None]) & (cols < (8 - trail)[..., None])
+    bodies = _split(np, as_bytes[keep].tobytes(), length.sum(axis=1))
+    return [head.tobytes() + body for head, body in zip(control, bodies)]
+
+
+def _split(np, data: bytes, sizes: np.ndarray) -> list[bytes]:
+    ends = np.cumsum(sizes).tolist()
+    return [data[start:end] for start, end in zip([0, *ends], ends)]
+
+
+def _decode_floats(np, payloads: list[memoryview], rows: int) -> np.ndarray:
+    """Decode float column payloads into an ``n x rows`` matrix."""
+    control = np.frombuffer(b"".join(p[:rows] for p in payloads), dtype=np.uint8).reshape(len(payloads), rows)
+    body = np.frombuffer(b"".join(p[rows:] for p in payloads), dtype=np.uint8)
+    lead = (control >> 4).astype(np.int64)
+    length = (control & 0x0F).astype(np.int64)
+    sizes = length.sum(axis=1)
+    if (sizes != [len(p) - rows for p in payloads]).any() or (lead + length > 8).any():
+        raise ValueError("corrupt float column")
+    as_bytes = np.zeros((len(payloads), rows, 8), dtype=np.uint8)
+    cols = np.arange(8)
+    keep = (cols >= lead[..., None]) & (cols < (lead + length)[..., None])
+    as_bytes[keep] = body
+    xor = as_bytes.view(">u8").reshape(len(payloads), rows).astype(np.uint64)
+    return np.bitwise_xor.accumulate(xor, axis=1).view(np.float64)
+
+
+def _integral_columns(np, matrix: np.ndarray) -> np.ndarray:
+    if not len(matrix):
+        return np.zeros(matrix.shape[1], dtype=bool)
+    with np.errstate(invalid="ignore"):
+        exact = (np.abs(matrix) < _MAX_EXACT) & (matrix == np.round(matrix))
+    return exact.all(axis=0)
+
+
+# -- batches -------------------------------------------------------------
+
+
+def encode_batch(timestamps: Sequence[float] | np.ndarray, columns: Mapping[str, Sequence[float] | np.ndarray]) -> bytes:
+    """Encode ``timestamps`` (seconds) and equally long value columns."""
+    np = _numpy()
+    ts = np.asarray(timestamps, dtype=np.float64)
+    rows = len(ts)
+    names = list(columns)
+    matrix = np.empty((rows, len(names)))
+    for i, name in enumerate(names):
+        col = np.asarray(columns[name], dtype=np.float64)
+        if col.shape != (rows,):
+            raise ValueError(f"column {name!r} has {col.shape} values for {rows} timestamps")
+        matrix[:, i] = col
+
+    integral = _integral_columns(np, matrix)
+    out = bytearray(MAGIC)
+    out += struct.pack("B", VERSION)
+    out += _varint(rows) + _varint(len(names))
+    for name, is_int in zip(names, integral.tolist()):
+        encoded = name.encode()
+        out += _varint(len(encoded)) + encoded + struct.pack("B", INTEGER if is_int else FLOAT)
+
+    ms = np.round(ts * 1000).astype(np.int64)
+    head = np.empty_like(ms)
+    head[:1] = ms[:1]
+    if rows > 1:
+        deltas = np.diff(ms)
+        head[1] = deltas[0]
+        head[2:] = np.diff(deltas)
+    out += _varints(np, _zigzag(np, head))[0]
+
+    payloads = [b""] * len(names)
+    for selected, encode in ((integral, _encode_integers), (~integral, _encode_floats)):
+        index = np.flatnonzero(selected)
+        if len(index):
+            for i, payload in zip(index.tolist(), encode(np, matrix[:, index])):
+                payloads[i] = payload
+    for payload in payloads:
+        out += _varint(len(payload)) + payload
+    return bytes(out)
+
+
+def decode_batch(data: bytes | memoryview) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Decode a batch into ``(timestamps, {name: values})`` float64 arrays."""
+    np = _numpy()
+    view = memoryview(data)
+    if bytes(view[:3]) != MAGIC:
+        raise ValueError("not a sysmaint wire batch")
+    if view[3] != VERSION:
+        raise ValueError(f"unsupported wire format version {view[3]}")
+    rows, offset = _read_varint(view, 4)
+    ncols, offset = _read_varint(view, offset)
+    header = []
+    for _ in range(ncols):
+        size, offset = _read_varint(view, offset)
+        name = bytes(view[offset : offset + size]).decode()
+        kind = view[offset + size]
+        offset += size + 1
+        header.append((name, kind))
+
+    head, offset = _read_varints(np, view, offset, rows)
+    head = _unzigzag(np, head)
+    if rows > 1:
+        deltas = np.cumsum(head[1:])
+        ms = np.concatenate([head[:1], head[0] + np.cumsum(deltas)])
+    else:
+        ms = head
+    timestamps = ms.astype(np.float64) / 1000
+
+    payloads: dict[int, list[memoryview]] = {INTEGER: [], FLOAT: []}
+    for _name, kind in header:
+        size, offset = _read_varint(view, offset)
+        if kind not in payloads:
+            raise ValueError(f"unknown column kind {kind}")
+        payloads[kind].append(view[offset : offset + size])
+        offset += size
+    decoded = {
+        INTEGER: iter(_decode_integers(np, payloads[INTEGER], rows)) if payloads[INTEGER] else iter(()),
+        FLOAT: iter(_decode_floats(np, payloads[FLOAT], rows)) if payloads[FLOAT] else iter(()),
+    }
+    return timestamps, {name: next(decoded[kind]) for name, kind in header}
+
+
+def encode_samples(samples: Sequence[tuple[float, Mapping[str, float]]]) -> bytes:
+    """Encode ``(timestamp, {metric: value})`` samples as one batch.
+
+    Metrics missing from some samples are encoded as NaN there.
+    """
+    np = _numpy()
+    names: dict[str, int] = {}
+    for _, sample in samples:
+        for name in sample:
+            names.setdefault(name, len(names))
+    matrix = np.full((len(names), len(samples)), np.nan)
+    for row, (_, sample) in enumerate(samples):
+        matrix[:, row] = [sample.get(name, np.nan) for name in names]
+    return encode_batch([ts for ts, _ in samples], dict(zip(names, matrix)))
@@ -0,0 +1,283 @@
+"""Per-job cost accounting.
+
+:func:`profile_job` measures one unit of work and produces a
+:class:`JobProfile`: wall time, user and system CPU time, peak RSS, I/O
+counters from ``/proc/thread-self/io`` (bytes that reached storage as well as
+bytes passed through read/write calls, and the number of those calls),
+context switches, and optional named phases so the syscall-heavy parts of a
+job stand out.
+
+Counters are per-thread wherever Linux offers them (``RUSAGE_THREAD`` and
+``/proc/thread-self``), so jobs running side by side on a thread pool do not
+see each other's work.  Peak RSS is the process high-water mark.  Jobs that
+run on the event loop share their thread with every other coroutine, and
+work that hands its I/O to pools of its own (the scanner, the deletion
+pipeline, compression) is done on other threads and processes; both are
+measured with process-wide counters (``scope == "process"``), which also
+include child processes once they have been waited for.  The command line
+profiles each command this way with ``--profile-log``.
+
+Code inside a job marks phases with :func:`phase`, which is a no-op when no
+profile is active.  The scan, delete, prune, rotate and compress paths mark
+their own; phases of a streamed pipeline overlap (deleting consumes the
+scan as it goes), so each records its own span rather than a share.
+
+A sampling stack profiler can be switched on per job; when it is off
+nothing runs besides the counter reads at job start and end.  Profiles
+serialise to plain dicts and :class:`ProfileLog` appends them as
+JSON lines for reporting to consume.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+__all__ = [
+    "JobProfile",
+    "JobProfiler",
+    "PhaseRecord",
+    "ProfileLog",
+    "phase",
+    "profile_job",
+    "read_profiles",
+    "run_profiled",
+]
+
+_IO_FIELDS = ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes")
+_RUSAGE_THREAD = getattr(resource, "RUSAGE_THREAD", None)
+# ru_maxrss is reported in KiB on Linux.
+_MAXRSS_UNIT = 1024 if sys.platform.startswith("linux") else 1
+
+_current: contextvars.ContextVar[JobProfiler | None] = contextvars.ContextVar("sysmaint_profiler", default=None)
+
+
+def _read_io(scope: str) -> dict[str, int]:
+    path = "/proc/thread-self/io" if scope == "thread" else "/proc/self/io"
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return dict.fromkeys(_IO_FIELDS, 0)
+    counters = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(b":")
+        counters[key.decode()] = int(value)
+    return {key: counters.get(key, 0) for key in _IO_FIELDS}
+
+
+def _rusage(scope: str) -> tuple[float, float, int, int]:
+    """``(user, system, voluntary switches, involuntary switches)`` so far."""
+    if scope == "thread" and _RUSAGE_THREAD is not None:
+        usage = resource.getrusage(_RUSAGE_THREAD)
+        return usage.ru_utime, usage.ru_stime, usage.ru_nvcsw, usage.ru_nivcsw
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        usage.ru_utime + children.ru_utime,
+        usage.ru_stime + children.ru_stime,
+        usage.ru_nvcsw + children.ru_nvcsw,
+        usage.ru_nivcsw + children.ru_nivcsw,
+    )
+
+
+@dataclass
+class PhaseRecord:
+    """Cost of one named phase inside a job."""
+
+    name: str
+    wall: float
+    cpu: float
+    read_bytes: int
+    write_bytes: int
+    syscalls: int
+
+
+@dataclass
+class JobProfile:
+    """Resource usage of one job run."""
+
+    job: str
+    scope: str
+    started: float
+    wall: float = 0.0
+    cpu_user: float = 0.0
+    cpu_system: float = 0.0
+    peak_rss: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    rchar: int = 0
+    wchar: int = 0
+    syscr: int = 0
+    syscw: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+    phases: list[PhaseRecord] = field(default_factory=list)
+    stacks: dict[str, int] | None = None
+
+    @property
+    def cpu(self) -> float:
+        return self.cpu_user + self.cpu_system
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class _StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval."""
+
+    def __init__(self, target: int, interval: float) -> None:
+        super().__init__(name="sysmaint-sampler", daemon=True)
+        self.target = target
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self) -> dict[str, int]:
+        self._stop_event.set()
+        self.join()
+        return dict(self.counts)
+
+
+class JobProfiler:
+    """Collects a :class:`JobProfile`; created by :func:`profile_job`."""
+
+    def __init__(self, job: str, *, scope: str = "thread", sample_interval: float | None = None) -> None:
+        self.profile = JobProfile(job, scope, time.time())
+        self._scope = scope
+        self._sample_interval = sample_interval
+        self._sampler: _StackSampler | None = None
+
+    def _snapshot(self) -> tuple[float, tuple[float, float, int, int], dict[str, int]]:
+        return time.perf_counter(), _rusage(self._scope), _read_io(self._scope)
+
+    def start(self) -> None:
+        self._start = self._snapshot()
+        if self._sample_interval:
+            self._sampler = _StackSampler(threading.get_ident(), self._sample_interval)
+            self._sampler.start()
+
+    def stop(self) -> JobProfile:
+        wall, usage, io = self._snapshot()
+        wall0, usage0, io0 = self._start
+        p = self.profile
+        p.wall = wall - wall0
+        p.cpu_user, p.cpu_system, p.voluntary_switches, p.involuntary_switches = (
+            now - before for now, before in zip(usage, usage0)
+        )
+        p.peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+        for key in _IO_FIELDS:
+            setattr(p, key, io[key] - io0[key])
+        if self._sampler is not None:
+            p.stacks = self._sampler.stop()
+        return p
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall0, usage0, io0 = self._snapshot()
+        try:
+            yield
+        finally:
+            wall, usage, io = self._snapshot()
+            cpu = (usage[0] + usage[1]) - (usage0[0] + usage0[1])
+            self.profile.phases.append(
+                PhaseRecord(
+                    name,
+                    wall - wall0,
+                    cpu,
+                    io["read_bytes"] - io0["read_bytes"],
+                    io["write_bytes"] - io0["write_bytes"],
+                    (io["syscr"] + io["syscw"]) - (io0["syscr"] + io0["syscw"]),
+                )
+            )
+
+
+@contextlib.contextmanager
+def profile_job(job: str, *, scope: str = "thread", sample_interval: float | None = None) -> Iterator[JobProfiler]:
+    """Profile the enclosed block; the result is ``profiler.profile`` on exit.
+
+    ``sample_interval`` (seconds) turns on the sampling stack profiler,
+    whose collapsed stacks end up in ``profile.stacks``.
+    """
+    if scope not in ("thread", "process"):
+        raise ValueError(f"unknown profiling scope {scope!r}")
+    profiler = JobProfiler(job, scope=scope, sample_interval=sample_interval)
+    token = _current.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current.reset(token)
+
+
+def phase(name: str) -> contextlib.AbstractContextManager[None]:
+    """Mark a phase of the currently profiled job; a no-op outside a profile."""
+    profiler = _current.get()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
+
+
+def run_profiled(
+    job: str,
+    sample_interval: float | None,
+    func: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> tuple[Any, JobProfile]:
+    """Call ``func`` under :func:`profile_job`; picklable for process pools.
+
+    Returns the function's result and the profile.  If the function raises,
+    the exception propagates and the profile is attached to it as
+    ``exc.profile``.
+    """
+    with profile_job(job, sample_interval=sample_interval) as profiler:
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            exc.profile = profiler.profile  # type: ignore[attr-defined]
+            raise
+    return result, profiler.profile
+
+
+class ProfileLog:
+    """Append-only JSON-lines file of job profiles."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, profile: JobProfile, **extra: Any) -> None:
+        line = json.dumps({**profile.to_dict(), **extra}, separators=(",", ":"))
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def read_profiles(path: str) -> Iterator[dict[str, Any]]:
+    """Yield the records of a :class:`ProfileLog` one at a time."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,58 @@
+"""Reporting: aggregation and rendering of stored monitoring data, and log summaries.
+
+Names are imported from their modules on first access, so importing this
+package (for example from the command line entry point) stays cheap.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sysmaint.reporting.aggregate import (
+        aggregate,
+        bucket_reduce,
+        group_reduce,
+        load_series,
+        moving_average,
+        rate,
+        reduce,
+    )
+    from sysmaint.reporting.cache import AggregateCache
+    from sysmaint.reporting.logscan import DEFAULT_KEYWORDS, DEFAULT_RULES, LogScanner
+    from sysmaint.reporting.render import Section, bucket_rows, iter_chunks, job_rows, render, summary_rows
+
+_EXPORTS = {
+    "AggregateCache": "sysmaint.reporting.cache",
+    "DEFAULT_KEYWORDS": "sysmaint.reporting.logscan",
+    "DEFAULT_RULES": "sysmaint.reporting.logscan",
+    "LogScanner": "sysmaint.reporting.logscan",
+    "Section": "sysmaint.reporting.render",
+    "aggregate": "sysmaint.reporting.aggregate",
+    "bucket_reduce": "sysmaint.reporting.aggregate",
+    "bucket_rows": "sysmaint.reporting.render",
+    "group_reduce": "sysmaint.reporting.aggregate",
+    "iter_chunks": "sysmaint.reporting.render",
+    "job_rows": "sysmaint.reporting.render",
+    "load_series": "sysmaint.reporting.aggregate",
+    "moving_average": "sysmaint.reporting.aggregate",
+    "rate": "sysmaint.reporting.aggregate",
+    "reduce": "sysmaint.reporting.aggregate",
+    "render": "sysmaint.reporting.render",
+    "summary_rows": "sysmaint.reporting.render",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module), name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
@@ -0,0 +1,235 @@
+"""Vectorized aggregation over stored metric columns.
+
+Every function here works on whole NumPy arrays: grouping is expressed as
+runs of equal keys in sorted order and reduced with ``ufunc.reduceat`` or a
+single ``lexsort``, never with a Python loop per sample.  NaN marks a
+missing sample (see :mod:`sysmaint.monitoring.store`) and is ignored by all
+reducers; a group without any valid sample reduces to NaN (``count`` to 0).
+
+Reducer names are ``count``, ``sum``, ``mean``, ``min``, ``max``,
+``first``, ``last``, ``median`` and percentiles written ``p<q>`` such as
+``p95`` or ``p99.9``.  Percentiles interpolate linearly between closest
+ranks, matching :func:`numpy.percentile`.
+
+The fleet-level entry point is :func:`aggregate`: group by host, bucket by
+time, reduce.  Hosts are processed one at a time, so peak memory is bounded
+by the largest host rather than the fleet.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__all__ = [
+    "aggregate",
+    "bucket_reduce",
+    "group_reduce",
+    "load_series",
+    "moving_average",
+    "rate",
+    "reduce",
+]
+
+Series = tuple["np.ndarray", "np.ndarray"]
+
+
+def _numpy():
+    return require("numpy", "report aggregation")
+
+
+def _quantile(reducer: str) -> float | None:
+    if reducer == "median":
+        return 0.5
+    if reducer.startswith("p"):
+        try:
+            q = float(reducer[1:]) / 100
+        except ValueError:
+            q = -1.0
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"invalid percentile reducer {reducer!r}")
+        return q
+    return None
+
+
+def _reduce_runs(np, values: np.ndarray, starts: np.ndarray, reducer: str) -> np.ndarray:
+    """Reduce consecutive runs of ``values`` beginning at the indices ``starts``."""
+    if starts.size == 0:
+        return np.empty(0)
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    if reducer == "count":
+        return counts
+    q = _quantile(reducer)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if reducer in ("sum", "mean"):
+            total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            if reducer == "sum":
+                return total
+            return np.where(counts > 0, total / np.maximum(counts, 1), np.nan)
+        if reducer == "min":
+            return np.fmin.reduceat(values, starts)
+        if reducer == "max":
+            return np.fmax.reduceat(values, starts)
+        if reducer in ("first", "last"):
+            # Index of the first/last valid sample in each run, via a running
+            # max over "latest valid position" sweeping from either end.
+            ends = np.r_[starts[1:], values.size]
+            idx = np.arange(values.size)
+            if reducer == "last":
+                pos = np.maximum.accumulate(np.where(valid, idx, -1))[ends - 1]
+                ok = pos >= starts
+            else:
+                rev = np.minimum.accumulate(np.where(valid, idx, values.size)[::-1])[::-1]
+                pos = rev[starts]
+                ok = pos < ends
+            return np.where(ok, values[np.clip(pos, 0, values.size - 1)], np.nan)
+        if q is None:
+            raise ValueError(f"unknown reducer {reducer!r}")
+        group = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, values.size]))
+        ordered = values[np.lexsort((values, group))]  # NaN sorts last within each run
+        pos = starts + q * np.maximum(counts - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        out = ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+        return np.where(counts > 0, out, np.nan)
+
+
+def reduce(values: np.ndarray, reducer: str) -> float:
+    """Reduce a whole column to one value."""
+    np = _numpy()
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return 0 if reducer == "count" else float("nan")
+    return _reduce_runs(np, values, np.zeros(1, dtype=np.int64), reducer)[0].item()
+
+
+def group_reduce(keys: np.ndarray, values: np.ndarray, reducer: str) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce ``values`` grouped by equal ``keys``; returns sorted unique keys and results."""
+    np = _numpy()
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    if keys.size and bool((keys[1:] < keys[:-1]).any()):
+        order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+    if keys.size == 0:
+        return keys, np.empty(0)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], _reduce_runs(np, values, starts, reducer)
+
+
+def bucket_reduce(
+    ts: np.ndarray,
+    values: np.ndarray,
+    width: float,
+    reducer: str,
+    *,
+    origin: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce samples into fixed time buckets of ``width`` seconds.
+
+    Returns the start time of every non-empty bucket and its reduced value.
+    ``ts`` is expected in order, as read from the store; unordered input is
+    sorted first.
+    """
+    np = _numpy()
+    ts = np.asarray(ts, dtype=float)
+    buckets = np.floor((ts - origin) / width).astype(np.int64)
+    keys, out = group_reduce(buckets, values, reducer)
+    return keys * width + origin, out
+
+
+def rate(ts: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Per-second rate of a monotonically increasing counter.
+
+    The result is aligned with the input: element ``i`` is the rate over
+    ``(ts[i-1], ts[i]]`` and the first element is NaN.  Intervals where the
+    counter went backwards (a reset or wrap) or time did not advance are NaN.
+    """
+    np = _numpy()
+    ts = np.asarray(ts, dtype=float)
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.size, np.nan)
+    if values.size < 2:
+        return out
+    dv = np.diff(values)
+    dt = np.diff(ts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[1:] = np.where((dv >= 0) & (dt > 0), dv / dt, np.nan)
+    return out
+
+
+def moving_average(values: np.ndarray, window: float, ts: np.ndarray | None = None) -> np.ndarray:
+    """Trailing moving average, ignoring NaN.
+
+    Without ``ts`` the window is a number of samples; with ``ts`` it is a
+    duration in seconds, ending at (and including) each sample.
+    """
+    np = _numpy()
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    csum = np.r_[0.0, np.cumsum(np.where(valid, values, 0.0))]
+    ccount = np.r_[0, np.cumsum(valid)]
+    idx = np.arange(1, values.size + 1)
+    if ts is None:
+        if window < 1:
+            raise ValueError("window must be at least one sample")
+        lo = np.maximum(idx - int(window), 0)
+    else:
+        ts = np.asarray(ts, dtype=float)
+        lo = np.searchsorted(ts, ts - window, side="right")
+    counts = ccount[idx] - ccount[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, (csum[idx] - csum[lo]) / np.maximum(counts, 1), np.nan)
+
+
+def aggregate(
+    series: Mapping[str, Series],
+    *,
+    bucket: float | None = None,
+    reducer: str = "mean",
+    transform: str | None = None,
+) -> dict[str, Series]:
+    """Group by host, bucket by time and reduce.
+
+    ``series`` maps a host to its ``(timestamps, values)``.  With ``transform
+    = "rate"`` the values are treated as counters and converted to per-second
+    rates first.  Without ``bucket`` each host reduces to a single value
+    stamped with its first timestamp.  Returns ``host -> (bucket starts,
+    values)``.
+    """
+    np = _numpy()
+    if transform not in (None, "rate"):
+        raise ValueError(f"unknown transform {transform!r}")
+    out: dict[str, Series] = {}
+    for host, (ts, values) in series.items():
+        ts = np.asarray(ts, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if transform == "rate":
+            values = rate(ts, values)
+        if bucket is not None:
+            out[host] = bucket_reduce(ts, values, bucket, reducer)
+        elif ts.size:
+            out[host] = ts[:1], np.array([reduce(values, reducer)], dtype=float)
+        else:
+            out[host] = ts, np.empty(0)
+    return out
+
+
+def load_series(
+    stores: Mapping[str, object],
+    metric: str,
+    start: float | None = None,
+    end: float | None = None,
+) -> dict[str, Series]:
+    """Read one metric for every host from a ``host -> SeriesStore`` mapping."""
+    series = {}
+    for host, store in stores.items():
+        ts, columns = store.read(start, end, [metric])  # type: ignore[attr-defined]
+        series[host] = ts, columns[metric]
+    return series
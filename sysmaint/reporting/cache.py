@@ -0,0 +1,173 @@
+"""Memoised per-segment aggregates.
+
+A sealed store segment never changes again and carries a checksum of its
+columns (see :mod:`sysmaint.monitoring.store`), so anything computed from a
+whole sealed segment can be reused for as long as the segment exists.
+:class:`AggregateCache` keeps such results keyed by segment id, checksum and
+the parameters of the computation.  Regenerating a 30-day report then reads
+29 cached days and computes only the segment still being written.
+
+Results are dicts of NumPy arrays.  They live in an in-memory LRU bounded by
+``max_bytes``; with ``path`` they are also written to an SQLite file bounded
+by ``max_disk_bytes`` (least recently used rows go first), so repeated CLI
+runs share them.  An unreadable cache file is moved aside and rebuilt.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from sysmaint.monitoring.store import Segment
+
+__all__ = ["AggregateCache"]
+
+logger = logging.getLogger(__name__)
+
+Result = dict[str, "np.ndarray"]
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL,
+    value BLOB NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def _numpy():
+    return require("numpy", "the aggregate cache")
+
+
+def _size(result: Result) -> int:
+    return sum(array.nbytes for array in result.values()) + 64 * len(result)
+
+
+class AggregateCache:
+    """LRU cache of aggregates of sealed segments, optionally backed by a file."""
+
+    def __init__(
+        self, path: str | None = None, *, max_bytes: int = 64 << 20, max_disk_bytes: int = 1 << 30
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = self.misses = self.evictions = 0
+        self.nbytes = 0
+        self._memory: OrderedDict[str, Result] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            try:
+                self._db = self._open(path)
+            except sqlite3.DatabaseError as exc:
+                broken = path + ".corrupt"
+                logger.warning("aggregate cache %s is unusable (%s); moving it to %s and rebuilding", path, exc, broken)
+                for suffix in ("", "-journal", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.replace(path + suffix, broken + suffix)
+                self._db = self._open(path)
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path)
+        try:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version not in (0, _SCHEMA_VERSION):
+                raise sqlite3.DatabaseError(f"unsupported schema version {version}")
+            with db:
+                db.execute(_SCHEMA)
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    @staticmethod
+    def key(segment: Segment, *params: Any) -> str | None:
+        """Cache key for a result over all of ``segment``; ``None`` unless it is sealed."""
+        if not segment.sealed or segment.checksum is None:
+            return None
+        return "\0".join([segment.id, segment.checksum, *map(repr, params)])
+
+    def get(self, key: str) -> Result | None:
+        result = self._memory.get(key)
+        if result is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return result
+        if self._db is not None:
+            row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                np = _numpy()
+                with np.load(io.BytesIO(row[0]), allow_pickle=False) as data:
+                    result = {name: data[name] for name in data.files}
+                with self._db:
+                    self._db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+                self._remember(key, result)
+                self.hits += 1
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result: Result) -> None:
+        self._remember(key, result)
+        if self._db is None:
+            return
+        np = _numpy()
+        buf = io.BytesIO()
+        np.savez(buf, **result)
+        value = buf.getvalue()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, len(value), time.time(), value)
+            )
+            (total,) = self._db.execute("SELECT coalesce(sum(size), 0) FROM results").fetchone()
+            if total > self.max_disk_bytes:
+                excess = total - self.max_disk_bytes
+                victims = []
+                for victim, size in self._db.execute("SELECT key, size FROM results ORDER BY used"):
+                    if excess <= 0:
+                        break
+                    victims.append((victim,))
+                    excess -= size
+                self._db.executemany("DELETE FROM results WHERE key = ?", victims)
+
+    def _remember(self, key: str, result: Result) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.nbytes -= _size(old)
+        size = _size(result)
+        if size > self.max_bytes:
+            return
+        self._memory[key] = result
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.nbytes -= _size(evicted)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> AggregateCache:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,336 @@
+"""Error and warning summaries from system logs, reading only what is new.
+
+:class:`LogScanner` reads log files, and the journal through ``journalctl
+-o json``, in large chunks and runs one combined regular expression over
+each chunk.  Only the lines it hits are cut out, decoded and parsed (syslog
+prefix, or the journal's JSON fields) and then classified by the individual
+rules, first match wins; every other line is skipped without ever becoming
+a Python object.  The default rules also come with a list of keywords, at
+least one of which every match contains: the prefilter is then a plain
+literal search over the lower-cased chunk, several times faster than the
+rules' own case-insensitive, word-bounded alternatives.  Custom rules
+without keywords are the prefilter themselves for log files, and every
+journal entry is parsed, since the rules apply to its decoded message
+rather than to the JSON line.  Matches are counted per source, rule and
+program, with a few example messages kept for each.
+
+With a ``state`` file the scanner remembers where it stopped: the byte
+offset of each log file, keyed by its device and inode so a rotated file
+is finished from its rotated name and a truncated one is read again from
+the start, and the journal cursor (through ``journalctl --cursor-file``).
+A daily report then reads one day of logs instead of all of them.  Offsets
+only ever cover complete lines, so a line still being written is read in
+full on the next run.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+__all__ = ["DEFAULT_KEYWORDS", "DEFAULT_RULES", "LogScanner"]
+
+logger = logging.getLogger(__name__)
+
+# Specific rules first: a line is counted once, under the first rule it matches.
+DEFAULT_RULES = {
+    "oom": r"Out of memory|invoked oom-killer|oom-kill:",
+    "segfault": r"segfault at|general protection fault|traps: \S+\[\d+\] trap",
+    "io_error": r"I/O error|blk_update_request|critical medium error",
+    "fs_error": r"EXT4-fs error|XFS \(\S+\): .*(?:error|[Cc]orruption)|BTRFS (?:error|critical)",
+    "hardware": r"Hardware Error|Machine check|mce: \[",
+    "auth_failure": r"authentication failure|Failed password|Invalid user",
+    "service_failed": r"Failed to start|entered failed state|Main process exited, code=(?:killed|dumped)",
+    "error": r"(?i:\berror\b|\bfailed\b|\bfatal\b|\bcritical\b)",
+    "warning": r"(?i:\bwarn(?:ing)?\b)",
+}
+
+# Lower-case literals that every match of DEFAULT_RULES contains.
+DEFAULT_KEYWORDS = (
+    "error", "fail", "fatal", "critical", "warn", "out of memory", "oom-kill", "segfault", "protection fault",
+    "trap", "blk_update", "corruption", "machine check", "mce: [", "invalid user", "exited, code=",
+)
+
+_SYSLOG_PROGRAM = re.compile(r"^(?:\w{3} [ \d]\d \d\d:\d\d:\d\d|\d{4}-\d\d-\d\dT\S+) \S+ ([^\s:\[]+)")
+_STATE_VERSION = 1
+
+Parse = Callable[[bytes], "tuple[str, str] | None"]
+
+
+class LogScanner:
+    """Count rule matches in log files and the journal since the last run.
+
+    ``rules`` maps names to regular expressions (default
+    :data:`DEFAULT_RULES`).  ``keywords`` are lower-case literals, one of
+    which is in every line a rule matches; they default to
+    :data:`DEFAULT_KEYWORDS` with the default rules, and without them the
+    rules themselves are the prefilter (see the module docstring).  Rules
+    are searched in one line at a time, so ``^`` and ``$`` anchor to its
+    start and end.  ``state`` is the path of the cursor file; the journal
+    cursor is kept next to it in ``<state>.journal``.  Cursors are written
+    by :meth:`save`, so a caller can keep them unchanged when its report
+    fails.  ``examples`` messages of up to ``max_example`` characters are
+    kept per source, rule and program.
+    """
+
+    def __init__(
+        self,
+        rules: Mapping[str, str] | None = None,
+        *,
+        keywords: Iterable[str] | None = None,
+        state: str | None = None,
+        chunk_size: int = 1 << 20,
+        examples: int = 3,
+        max_example: int = 300,
+    ) -> None:
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        if not self.rules:
+            raise ValueError("no rules to scan for")
+        self._compiled = [(name, re.compile(pattern)) for name, pattern in self.rules.items()]
+        if keywords is None and rules is None:
+            keywords = DEFAULT_KEYWORDS
+        self._lower = keywords is not None
+        if keywords is not None:
+            combined = "|".join(re.escape(keyword.lower()) for keyword in keywords)
+            # Journal messages that are not valid UTF-8 arrive as arrays of
+            # byte values, which the keywords cannot see until they are decoded.
+            self._journal_prefilter = re.compile(f'{combined}|"message" ?: ?\\['.encode())
+        else:
+            combined = "|".join(f"(?:{pattern})" for pattern in self.rules.values())
+            # Every non-empty line: rules are written against the message,
+            # which the JSON line may escape or (with anchors) never start.
+            self._journal_prefilter = re.compile(rb"^.", re.MULTILINE)
+        # The chunk is searched as a whole; MULTILINE keeps anchors per line.
+        self._prefilter = re.compile(combined.encode(), re.MULTILINE)
+        self.state_path = state
+        self.chunk_size = chunk_size
+        self.max_examples = examples
+        self.max_example = max_example
+        self.counts: Counter[tuple[str, str, str]] = Counter()
+        self.examples: dict[tuple[str, str, str], list[str]] = {}
+        self.bytes = self.lines = self.candidates = 0
+        self._last_line = b""
+        self._files: dict[str, dict[str, int]] = {}
+        if state is not None:
+            try:
+                with open(state) as f:
+                    saved = json.load(f)
+                if saved.get("version") == _STATE_VERSION:
+                    self._files = saved.get("files", {})
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as exc:
+                logger.warning("log cursor file %s is unreadable (%s); scanning from the start", state, exc)
+
+    # -- scanning ------------------------------------------------------------
+
+    def _classify(self, source: str, program: str, message: str) -> None:
+        for name, pattern in self._compiled:
+            if pattern.search(message):
+                key = (source, name, program)
+                self.counts[key] += 1
+                examples = self.examples.setdefault(key, [])
+                if len(examples) < self.max_examples:
+                    examples.append(message[: self.max_example])
+                return
+
+    def _feed(self, source: str, chunks: Iterable[bytes], parse: Parse, prefilter: re.Pattern[bytes]) -> int:
+        """Scan the complete lines in ``chunks``; returns the bytes they span."""
+        read = 0
+        tail = b""
+        for chunk in chunks:
+            read += len(chunk)
+            data = tail + chunk if tail else chunk
+            end = data.rfind(b"\n") + 1
+            if not end:
+                tail = data
+                continue
+            self.lines += data.count(b"\n", 0, end)
+            self._last_line = data[data.rfind(b"\n", 0, end - 1) + 1 : end - 1]
+            haystack = data.lower() if self._lower else data
+            pos = 0
+            while True:
+                m = prefilter.search(haystack, pos, end)
+                if m is None:
+                    break
+                start = data.rfind(b"\n", 0, m.start()) + 1
+                stop = data.index(b"\n", m.start())
+                self.candidates += 1
+                parsed = parse(data[start:stop])
+                if parsed is not None:
+                    self._classify(source, *parsed)
+                pos = stop + 1
+            tail = data[end:]
+            if len(tail) > 16 * self.chunk_size:
+                tail = b""  # not a text log; skip the runaway line
+        self.bytes += read - len(tail)
+        return read - len(tail)
+
+    def _chunks(self, f: Any) -> Iterator[bytes]:
+        return iter(lambda: f.read(self.chunk_size), b"")
+
+    @staticmethod
+    def _parse_syslog(line: bytes) -> tuple[str, str]:
+        text = line.decode(errors="replace")
+        m = _SYSLOG_PROGRAM.match(text)
+        return (m[1] if m else "-"), text
+
+    def _read_file(self, source: str, path: str, offset: int) -> int:
+        with open(path, "rb", buffering=0) as f:
+            if offset:
+                f.seek(offset)
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), offset, 0, os.POSIX_FADV_SEQUENTIAL)
+            return offset + self._feed(source, self._chunks(f), self._parse_syslog, self._prefilter)
+
+    def _rotated(self, path: str, dev: int, inode: int) -> str | None:
+        """The uncompressed rotated generation of ``path`` that is ``dev``/``inode``, if any."""
+        for candidate in sorted(glob.glob(glob.escape(path) + "[.-]*")):
+            if candidate.endswith((".gz", ".xz", ".zst", ".bz2")):
+                continue
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            if st.st_ino == inode and st.st_dev == dev:
+                return candidate
+        return None
+
+    def scan_file(self, path: str) -> None:
+        """Scan what was appended to ``path`` since the last saved run."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        saved = self._files.get(path)
+        offset = 0
+        if saved is not None:
+            if saved["inode"] == st.st_ino and saved["dev"] == st.st_dev:
+                # Same file; a shorter one was truncated and starts over.
+                offset = saved["offset"] if saved["offset"] <= st.st_size else 0
+            else:
+                rotated = self._rotated(path, saved["dev"], saved["inode"])
+                if rotated is not None:
+                    self._read_file(path, rotated, saved["offset"])
+        offset = self._read_file(path, path, offset)
+        self._files[path] = {"dev": st.st_dev, "inode": st.st_ino, "offset": offset}
+
+    @staticmethod
+    def _parse_journal(line: bytes) -> tuple[str, str] | None:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        message = entry.get("MESSAGE")
+        if isinstance(message, list):  # not valid UTF-8; journalctl sends the bytes
+            message = bytes(message).decode(errors="replace")
+        if not isinstance(message, str):
+            return None
+        return entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM") or "-", message
+
+    def scan_journal(
+        self,
+        *,
+        since: str = "-24h",
+        units: Iterable[str] = (),
+        priority: str | None = None,
+        journalctl: str = "journalctl",
+        timeout: float | None = None,
+    ) -> None:
+        """Scan journal entries after the saved cursor, or from ``since`` on the first run.
+
+        ``units`` and ``priority`` are passed to journalctl as ``-u`` and
+        ``-p``.  A journalctl that runs longer than ``timeout`` is killed
+        and its partial output counted; the cursor is then taken from the
+        last complete entry it printed.  Raises ``OSError`` if journalctl
+        cannot be run and ``CalledProcessError`` if it fails.
+        """
+        argv = [journalctl, "-o", "json", "--no-pager", "-q"]
+        pending: str | None = None
+        if self.state_path is not None:
+            # journalctl rewrites its cursor file as it goes; let it write a
+            # copy that save() moves into place.
+            cursor = self.state_path + ".journal"
+            pending = cursor + ".new"
+            try:
+                shutil.copyfile(cursor, pending)
+            except FileNotFoundError:
+                argv.append(f"--since={since}")
+            argv.append(f"--cursor-file={pending}")
+        else:
+            argv.append(f"--since={since}")
+        for unit in units:
+            argv += ["-u", unit]
+        if priority is not None:
+            argv += ["-p", priority]
+        killed = threading.Event()
+        self._last_line = b""
+        # stderr goes to a file: a pipe nobody reads while stdout is being
+        # streamed would block journalctl once it filled up.
+        with tempfile.TemporaryFile() as errors:
+            proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=errors)
+
+            def kill() -> None:
+                killed.set()
+                proc.kill()
+
+            timer = threading.Timer(timeout, kill) if timeout is not None else None
+            if timer is not None:
+                timer.start()
+            try:
+                assert proc.stdout is not None
+                with proc.stdout:
+                    self._feed("journal", self._chunks(proc.stdout), self._parse_journal, self._journal_prefilter)
+                proc.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            errors.seek(0)
+            err = errors.read()
+        if killed.is_set():
+            logger.warning("journalctl ran longer than %ss and was killed; counting its output so far", timeout)
+            if pending is not None:
+                self._save_cursor(pending)
+            return
+        # With --cursor-file, journalctl exits with 1 and says nothing when
+        # there are no new entries.
+        if proc.returncode and (proc.returncode != 1 or err.strip()):
+            raise subprocess.CalledProcessError(proc.returncode, argv, None, err)
+
+    def _save_cursor(self, pending: str) -> None:
+        """Point the pending cursor file at the last complete entry read."""
+        try:
+            cursor = json.loads(self._last_line).get("__CURSOR") if self._last_line else None
+        except ValueError:
+            cursor = None
+        if isinstance(cursor, str):
+            with open(pending, "w") as f:
+                f.write(cursor)
+
+    # -- results -------------------------------------------------------------
+
+    def rows(self) -> Iterator[tuple[str, str, str, int, str]]:
+        """``(source, rule, program, count, example)``, most frequent first."""
+        for key, count in self.counts.most_common():
+            source, rule, program = key
+            yield source, rule, program, count, self.examples[key][0]
+
+    def save(self) -> None:
+        """Write the file offsets and the journal cursor reached by this run."""
+        if self.state_path is None:
+            return
+        tmp = f"{self.state_path}.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump({"version": _STATE_VERSION, "files": self._files}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+        pending = self.state_path + ".journal.new"
+        if os.path.exists(pending):
+            os.replace(pending, self.state_path + ".journal")
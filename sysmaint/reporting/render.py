@@ -0,0 +1,428 @@
+"""Streaming rendering of reports as Markdown, HTML or CSV.
+
+A report is a sequence of :class:`Section` objects whose rows are
+iterators.  The renderer writes each row as soon as it is produced and
+flushes the output after every section, so the start of a report is on
+disk (or on the terminal) while the later sections are still being
+computed, and nothing ever holds the whole report.
+
+The row sources here read their inputs in chunks and keep only running
+state between chunks:
+
+* :func:`iter_chunks` walks a store one segment at a time and yields at most
+  ``chunk_rows`` rows of it at once;
+* :func:`summary_rows` keeps count, sum, min, max and last per metric;
+* :func:`bucket_rows` keeps the samples of the one bucket still open, so any
+  reducer (percentiles included) stays exact;
+* :func:`job_rows` folds a :class:`~sysmaint.profiling.ProfileLog` into one
+  running total per job name.
+
+Peak memory is therefore set by the chunk size, the bucket width and the
+number of distinct metrics and jobs, not by the length of the report range.
+
+Given an :class:`~sysmaint.reporting.cache.AggregateCache`, the summary and
+bucket sources reuse the results of sealed segments, so regenerating a
+report computes only the segments written since the last run.
+"""
+
+from __future__ import annotations
+
+import csv
+import html
+import math
+import time
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TextIO
+
+from sysmaint._compat import require
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from sysmaint.monitoring.store import Segment, SeriesStore
+    from sysmaint.reporting.cache import AggregateCache, Result
+
+__all__ = [
+    "FORMATS",
+    "Section",
+    "bucket_rows",
+    "iter_chunks",
+    "job_rows",
+    "render",
+    "summary_rows",
+]
+
+DEFAULT_CHUNK_ROWS = 65536
+
+
+def _numpy():
+    return require("numpy", "report rendering")
+
+
+def _stamp(ts: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+@dataclass
+class Section:
+    """A titled table whose ``rows`` are consumed once, while rendering."""
+
+    title: str
+    columns: Sequence[str]
+    rows: Iterable[Sequence[Any]]
+    text: str = ""
+
+
+# -- renderers -----------------------------------------------------------
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if math.isnan(value) else f"{value:.6g}"
+    return str(value)
+
+
+class _Renderer:
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+
+    def begin(self, title: str) -> None:
+        pass
+
+    def section(self, section: Section) -> int:
+        raise NotImplementedError
+
+    def end(self) -> None:
+        pass
+
+
+class _Markdown(_Renderer):
+    def begin(self, title: str) -> None:
+        self.out.write(f"# {title}\n")
+
+    def section(self, section: Section) -> int:
+        write = self.out.write
+        write(f"\n## {section.title}\n\n")
+        if section.text:
+            write(f"{section.text}\n\n")
+        write("| " + " | ".join(section.columns) + " |\n")
+        write("|" + "---|" * len(section.columns) + "\n")
+        count = 0
+        for row in section.rows:
+            write("| " + " | ".join(_cell(v).replace("|", "\\|") for v in row) + " |\n")
+            count += 1
+        if not count:
+            write("\n_No data._\n")
+        return count
+
+
+class _Html(_Renderer):
+    def begin(self, title: str) -> None:
+        title = html.escape(title)
+        self.out.write(
+            f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head>\n'
+            f"<body>\n<h1>{title}</h1>\n"
+        )
+
+    def section(self, section: Section) -> int:
+        write = self.out.write
+        write(f"<h2>{html.escape(section.title)}</h2>\n")
+        if section.text:
+            write(f"<p>{html.escape(section.text)}</p>\n")
+        header = "".join(f"<th>{html.escape(c)}</th>" for c in section.columns)
+        write(f"<table>\n<thead><tr>{header}</tr></thead>\n<tbody>\n")
+        count = 0
+        for row in section.rows:
+            write("<tr>" + "".join(f"<td>{html.escape(_cell(v))}</td>" for v in row) + "</tr>\n")
+            count += 1
+        write("</tbody>\n</table>\n")
+        if not count:
+            write("<p><em>No data.</em></p>\n")
+        return count
+
+    def end(self) -> None:
+        self.out.write("</body></html>\n")
+
+
+class _Csv(_Renderer):
+    """One table after another: a title row, a header row, the rows, a blank row."""
+
+    def __init__(self, out: TextIO) -> None:
+        super().__init__(out)
+        self._writer = csv.writer(out, lineterminator="\n")
+        self._first = True
+
+    def section(self, section: Section) -> int:
+        if not self._first:
+            self.out.write("\n")
+        self._first = False
+        self._writer.writerow([f"# {section.title}"])
+        self._writer.writerow(section.columns)
+        count = 0
+        for row in section.rows:
+            self._writer.writerow([_cell(v) for v in row])
+            count += 1
+        return count
+
+
+FORMATS = {"markdown": _Markdown, "html": _Html, "csv": _Csv}
+
+
+def render(
+    sections: Iterable[Section], out: TextIO, *, format: str = "markdown", title: str = "sysmaint report"
+) -> int:
+    """Write ``sections`` to ``out`` as they are produced; return the row count."""
+    try:
+        renderer = FORMATS[format](out)
+    except KeyError:
+        raise ValueError(f"unknown report format {format!r}") from None
+    renderer.begin(title)
+    total = 0
+    for section in sections:
+        total += renderer.section(section)
+        out.flush()
+    renderer.end()
+    out.flush()
+    return total
+
+
+# -- row sources ---------------------------------------------------------
+
+
+def _segment_chunks(
+    np, seg: Segment, lo: int, hi: int, names: Sequence[str], chunk_rows: int
+) -> Iterator[tuple[np.ndarray, dict[str, np.ndarray]]]:
+    for first in range(lo, hi, chunk_rows):
+        last = min(first + chunk_rows, hi)
+        ts = np.array(seg.timestamps()[first:last])
+        yield ts, {name: np.array(seg.column(name)[first:last]) for name in names}
+
+
+def iter_chunks(
+    store: SeriesStore,
+    start: float | None = None,
+    end: float | None = None,
+    metrics: Sequence[str] | None = None,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[tuple[np.ndarray, dict[str, np.ndarray]]]:
+    """Yield the samples in ``[start, end)`` as ``(timestamps, columns)`` chunks.
+
+    Chunks never span segments and hold at most ``chunk_rows`` rows; each
+    is copied out of the memory map, so the pages it touched can be dropped
+    once the caller moves on.
+    """
+    np = _numpy()
+    for seg in store.segments(start, end):
+        lo, hi = seg.bounds(start, end)
+        yield from _segment_chunks(np, seg, lo, hi, seg.columns if metrics is None else metrics, chunk_rows)
+
+
+def _metric_names(store: SeriesStore, start: float | None, end: float | None) -> list[str]:
+    return sorted({name for seg in store.segments(start, end) for name in seg.columns})
+
+
+def _summarize(np, chunks: Iterable[tuple[np.ndarray, dict[str, np.ndarray]]], names: Sequence[str]) -> Result:
+    """Count, sum, min, max and last valid value of each of ``names``."""
+    part = {
+        "count": np.zeros(len(names), dtype=np.int64),
+        "total": np.zeros(len(names)),
+        "low": np.full(len(names), np.inf),
+        "high": np.full(len(names), -np.inf),
+        "last": np.full(len(names), np.nan),
+    }
+    for _ts, columns in chunks:
+        for i, name in enumerate(names):
+            values = columns[name]
+            valid = values[~np.isnan(values)]
+            if valid.size:
+                part["count"][i] += valid.size
+                part["total"][i] += valid.sum()
+                part["low"][i] = min(part["low"][i], valid.min())
+                part["high"][i] = max(part["high"][i], valid.max())
+                part["last"][i] = valid[-1]
+    return part
+
+
+def summary_rows(
+    stores: Mapping[str, SeriesStore],
+    metrics: Sequence[str] | None = None,
+    start: float | None = None,
+    end: float | None = None,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    cache: AggregateCache | None = None,
+) -> Iterator[tuple[str, str, int, float, float, float, float]]:
+    """Rows of ``(host, metric, samples, min, mean, max, last)`` per host and metric.
+
+    With a ``cache``, the partial summary of every sealed segment that lies
+    wholly inside the range is looked up by its checksum instead of being
+    recomputed.
+    """
+    np = _numpy()
+    for host, store in stores.items():
+        names = list(metrics) if metrics is not None else _metric_names(store, start, end)
+        total = _summarize(np, (), names)
+        for seg in store.segments(start, end):
+            lo, hi = seg.bounds(start, end)
+            key = cache.key(seg, "summary") if cache is not None and (lo, hi) == (0, seg.rows) else None
+            if key is None:
+                part = _summarize(np, _segment_chunks(np, seg, lo, hi, names, chunk_rows), names)
+                into = np.arange(len(names))
+            else:
+                part = cache.get(key)
+                if part is None:
+                    part = _summarize(np, _segment_chunks(np, seg, lo, hi, seg.columns, chunk_rows), seg.columns)
+                    cache.put(key, part)
+                wanted = {name: i for i, name in enumerate(names)}
+                index = [(wanted[name], i) for i, name in enumerate(seg.columns) if name in wanted]
+                into = np.array([a for a, _ in index], dtype=np.int64)
+                part = {field: values[[b for _, b in index]] for field, values in part.items()}
+            total["count"][into] += part["count"]
+            total["total"][into] += part["total"]
+            total["low"][into] = np.fmin(total["low"][into], part["low"])
+            total["high"][into] = np.fmax(total["high"][into], part["high"])
+            total["last"][into] = np.where(np.isnan(part["last"]), total["last"][into], part["last"])
+        count = total["count"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total["total"] / np.maximum(count, 1), np.nan)
+        low = np.where(count > 0, total["low"], np.nan)
+        high = np.where(count > 0, total["high"], np.nan)
+        for row in zip(names, count.tolist(), low.tolist(), mean.tolist(), high.tolist(), total["last"].tolist()):
+            yield (host, *row)
+
+
+class _BucketStream:
+    """Bucket reduction over consecutive chunks, carrying the open bucket."""
+
+    def __init__(self, np, bucket: float, reducer: str, transform: str | None) -> None:
+        self.np = np
+        self.bucket = bucket
+        self.reducer = reducer
+        self.transform = transform
+        self.previous: tuple[float, float] | None = None
+        self._ts = self._values = np.empty(0)
+
+    def feed(self, ts: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Add a chunk; return the buckets it closed."""
+        from sysmaint.reporting.aggregate import rate
+
+        np = self.np
+        if self.transform == "rate":
+            if self.previous is None:
+                rates = rate(ts, values)
+            else:
+                rates = rate(np.r_[self.previous[0], ts], np.r_[self.previous[1], values])[1:]
+            self.previous = float(ts[-1]), float(values[-1])
+            values = rates
+        ts, values = np.r_[self._ts, ts], np.r_[self._values, values]
+        keys = np.floor(ts / self.bucket)
+        closed = int(np.searchsorted(keys, keys[-1], "left"))
+        self._ts, self._values = ts[closed:], values[closed:]
+        return self._reduce(ts[:closed], values[:closed])
+
+    def flush(self) -> tuple[np.ndarray, np.ndarray]:
+        """Close the open bucket."""
+        ts, values = self._ts, self._values
+        self._ts = self._values = self.np.empty(0)
+        return self._reduce(ts, values)
+
+    def _reduce(self, ts: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        from sysmaint.reporting.aggregate import bucket_reduce
+
+        if not ts.size:
+            return ts, values
+        return bucket_reduce(ts, values, self.bucket, self.reducer)
+
+
+def bucket_rows(
+    stores: Mapping[str, SeriesStore],
+    metric: str,
+    start: float | None = None,
+    end: float | None = None,
+    *,
+    bucket: float = 86400.0,
+    reducer: str = "mean",
+    transform: str | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    cache: AggregateCache | None = None,
+) -> Iterator[tuple[str, str, float]]:
+    """Rows of ``(host, bucket start, value)``, emitted as each bucket closes.
+
+    Samples are carried over between chunks only for the bucket that is
+    still open, so memory is bounded by ``chunk_rows`` plus one bucket.
+    With ``transform="rate"`` the metric is a counter and is turned into
+    per-second rates first, continuing across chunk boundaries.
+
+    With a ``cache``, the buckets of a sealed segment lying wholly inside
+    the range are cached when ``bucket`` divides the segment span, so no
+    bucket straddles two segments.  Rates also depend on the last sample of
+    the previous segment, which is therefore part of the key.
+    """
+    np = _numpy()
+    if transform not in (None, "rate"):
+        raise ValueError(f"unknown transform {transform!r}")
+
+    def rows(host: str, starts: np.ndarray, values: np.ndarray) -> Iterator[tuple[str, str, float]]:
+        for bucket_start, value in zip(starts.tolist(), values.tolist()):
+            yield host, _stamp(bucket_start), value
+
+    for host, store in stores.items():
+        stream = _BucketStream(np, bucket, reducer, transform)
+        for seg in store.segments(start, end):
+            lo, hi = seg.bounds(start, end)
+            if lo == hi:
+                continue
+            key = None
+            if cache is not None and (lo, hi) == (0, seg.rows) and seg.span % bucket == 0:
+                key = cache.key(seg, "buckets", metric, bucket, reducer, transform, stream.previous)
+            if key is None:
+                for ts, columns in _segment_chunks(np, seg, lo, hi, [metric], chunk_rows):
+                    yield from rows(host, *stream.feed(ts, columns[metric]))
+                continue
+            yield from rows(host, *stream.flush())
+            result = cache.get(key)
+            if result is None:
+                own = _BucketStream(np, bucket, reducer, transform)
+                own.previous = stream.previous
+                chunks = _segment_chunks(np, seg, lo, hi, [metric], chunk_rows)
+                parts = [own.feed(ts, columns[metric]) for ts, columns in chunks]
+                parts.append(own.flush())
+                result = {
+                    "starts": np.concatenate([p[0] for p in parts]),
+                    "values": np.concatenate([p[1] for p in parts]),
+                    "last": np.array([seg.timestamps()[hi - 1], seg.column(metric)[hi - 1]], dtype=np.float64),
+                }
+                cache.put(key, result)
+            yield from rows(host, result["starts"], result["values"])
+            if transform == "rate":
+                stream.previous = float(result["last"][0]), float(result["last"][1])
+        yield from rows(host, *stream.flush())
+
+
+def job_rows(
+    records: Iterable[Mapping[str, Any]], start: float | None = None, end: float | None = None
+) -> Iterator[tuple[str, int, float, float, float, int, int, int]]:
+    """Fold profile records into ``(job, runs, wall, mean wall, cpu, peak rss, read, written)``.
+
+    ``records`` is typically :func:`sysmaint.profiling.read_profiles`, which
+    reads the log one line at a time; only the per-job totals are kept.
+    """
+    totals: dict[str, list[float]] = {}
+    for record in records:
+        started = record.get("started", 0.0)
+        if (start is not None and started < start) or (end is not None and started >= end):
+            continue
+        t = totals.setdefault(record.get("job", "?"), [0, 0.0, 0.0, 0, 0, 0])
+        t[0] += 1
+        t[1] += record.get("wall", 0.0)
+        t[2] += record.get("cpu_user", 0.0) + record.get("cpu_system", 0.0)
+        t[3] = max(t[3], record.get("peak_rss", 0))
+        t[4] += record.get("read_bytes", 0)
+        t[5] += record.get("write_bytes", 0)
+    for job in sorted(totals):
+        runs, wall, cpu, peak, read, written = totals[job]
+        yield job, int(runs), wall, wall / runs, cpu, int(peak), int(read), int(written)
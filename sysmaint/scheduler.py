@@ -0,0 +1,376 @@
+"""asyncio scheduler for maintenance jobs.
+
+Jobs run in *lanes*, each with its own concurrency limit and its own
+executor, so a lane full of slow disk cleanups cannot delay the fast health
+checks running in another.  Coroutine functions run on the event loop under
+their lane's semaphore; plain functions are handed to the lane's executor, a
+process pool for CPU-bound lanes and a thread pool for everything else.  The
+default lanes are ``cpu``, ``io`` and ``subprocess``; any other name given in
+``limits`` becomes an additional thread-pool lane.
+
+Triggers are either :class:`Interval` (aligned to multiples of the period)
+or :class:`Cron` (five-field crontab expressions in local time).  A job that
+is still running when it fires again skips that firing.  Failed runs are
+retried with exponential backoff; both firings and retries can be jittered
+to keep a fleet of hosts from acting in lockstep.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import inspect
+import logging
+import os
+import random
+import subprocess
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Protocol
+
+from sysmaint.profiling import JobProfile, ProfileLog, profile_job, run_profiled
+
+__all__ = [
+    "Cron",
+    "Interval",
+    "Job",
+    "JobRun",
+    "Scheduler",
+    "Trigger",
+    "run_command",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class Trigger(Protocol):
+    def next_after(self, after: float) -> float | None:
+        """Return the first firing time strictly after ``after``, or None when exhausted."""
+
+
+@dataclass(frozen=True)
+class Interval:
+    """Fire every ``seconds``, at ``anchor + k * seconds`` for integer ``k``."""
+
+    seconds: float
+    anchor: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.seconds <= 0:
+            raise ValueError("interval must be positive")
+
+    def next_after(self, after: float) -> float:
+        periods = (after - self.anchor) // self.seconds + 1
+        return self.anchor + periods * self.seconds
+
+
+_CRON_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+_CRON_NAMES = {
+    3: {name: i for i, name in enumerate("jan feb mar apr may jun jul aug sep oct nov dec".split(), 1)},
+    4: {name: i for i, name in enumerate("sun mon tue wed thu fri sat".split())},
+}
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _cron_field(text: str, index: int) -> frozenset[int]:
+    low, high = _CRON_RANGES[index]
+    names = _CRON_NAMES.get(index, {})
+    values: set[int] = set()
+    for part in text.lower().split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if base == "*":
+            start, stop = low, high
+        else:
+            first, _, last = base.partition("-")
+            start = names[first] if first in names else int(first)
+            stop = (names[last] if last in names else int(last)) if last else (high if step_text else start)
+        if not (low <= start <= stop <= high) or step < 1:
+            raise ValueError(f"invalid cron field {text!r}")
+        values.update(range(start, stop + 1, step))
+    if index == 4 and 7 in values:
+        values.discard(7)
+        values.add(0)
+    return frozenset(values)
+
+
+class Cron:
+    """A crontab schedule: ``minute hour day-of-month month day-of-week``.
+
+    Supports ``*``, lists, ranges, steps, month and weekday names and the
+    ``@hourly``-style aliases.  As in cron, when both day fields are
+    restricted a day matching either one fires.
+    """
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        fields = _CRON_ALIASES.get(expr.strip(), expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs five fields: {expr!r}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _cron_field(text, i) for i, text in enumerate(fields)
+        )
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def __repr__(self) -> str:
+        return f"Cron({self.expr!r})"
+
+    def _day_matches(self, day: dt.datetime) -> bool:
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, after: float) -> float:
+        t = dt.datetime.fromtimestamp(after).replace(second=0, microsecond=0) + dt.timedelta(minutes=1)
+        limit = t.year + 5
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + dt.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + dt.timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + dt.timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += dt.timedelta(minutes=1)
+            else:
+                return t.timestamp()
+        raise ValueError(f"cron expression {self.expr!r} never fires")
+
+
+@dataclass
+class Job:
+    """A scheduled callable.
+
+    ``lane`` selects the concurrency limit and executor.  ``jitter`` adds a
+    random delay of up to that many seconds to every firing.  A failing run
+    is retried up to ``retries`` times, waiting ``backoff`` seconds doubled
+    per attempt (capped at ``max_backoff``) and scaled by a random factor in
+    ``[0.5, 1]``.  ``timeout`` bounds one attempt; work already handed to a
+    thread cannot be interrupted and runs to completion in the background.
+    With ``profile`` each attempt is measured by
+    :func:`~sysmaint.profiling.profile_job`, and ``sample_interval`` also
+    turns on its sampling stack profiler.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    trigger: Trigger
+    lane: str = "io"
+    args: tuple[Any, ...] = ()
+    kwargs: Mapping[str, Any] = field(default_factory=dict)
+    jitter: float = 0.0
+    retries: int = 0
+    backoff: float = 1.0
+    max_backoff: float = 300.0
+    timeout: float | None = None
+    run_at_start: bool = False
+    profile: bool = False
+    sample_interval: float | None = None
+
+
+@dataclass
+class JobRun:
+    """Outcome of one firing of a job, including its retries."""
+
+    job: str
+    lane: str
+    started: float
+    finished: float
+    attempts: int
+    ok: bool
+    error: str | None = None
+    result: Any = None
+    profile: JobProfile | None = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+DEFAULT_LIMITS = {"cpu": os.cpu_count() or 1, "io": 8, "subprocess": 4}
+
+
+class Scheduler:
+    """Run :class:`Job` objects on their triggers until :meth:`stop` is called.
+
+    ``limits`` maps lane names to their concurrency; lanes listed in
+    ``process_lanes`` execute plain functions in a process pool (the
+    function and its arguments must then be picklable).  Every finished run
+    is appended to ``history`` and passed to ``on_run`` if given; the
+    profiles of jobs run with ``profile`` are also appended to
+    ``profile_log``.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, int] | None = None,
+        *,
+        process_lanes: Iterable[str] = ("cpu",),
+        on_run: Callable[[JobRun], None] | None = None,
+        profile_log: ProfileLog | None = None,
+        history: int = 1000,
+    ) -> None:
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.process_lanes = frozenset(process_lanes)
+        self.on_run = on_run
+        self.profile_log = profile_log
+        self.history: deque[JobRun] = deque(maxlen=history)
+        self.jobs: dict[str, Job] = {}
+        self._executors: dict[str, Executor] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._running: dict[str, asyncio.Task[JobRun]] = {}
+        self._stopping: asyncio.Event | None = None
+
+    def add(self, job: Job) -> Job:
+        if job.lane not in self.limits:
+            raise ValueError(f"job {job.name!r} uses unknown lane {job.lane!r}")
+        if job.name in self.jobs:
+            raise ValueError(f"duplicate job name {job.name!r}")
+        self.jobs[job.name] = job
+        return job
+
+    def schedule(self, name: str, func: Callable[..., Any], trigger: Trigger, **options: Any) -> Job:
+        """Create and add a job; ``options`` are :class:`Job` fields."""
+        return self.add(Job(name, func, trigger, **options))
+
+    def _executor(self, lane: str) -> Executor:
+        executor = self._executors.get(lane)
+        if executor is None:
+            workers = self.limits[lane]
+            if lane in self.process_lanes:
+                executor = ProcessPoolExecutor(workers)
+            else:
+                executor = ThreadPoolExecutor(workers, thread_name_prefix=f"sysmaint-{lane}")
+            self._executors[lane] = executor
+        return executor
+
+    def _semaphore(self, lane: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(lane)
+        if sem is None:
+            sem = self._semaphores[lane] = asyncio.Semaphore(self.limits[lane])
+        return sem
+
+    async def _call(self, job: Job) -> tuple[Any, JobProfile | None]:
+        if inspect.iscoroutinefunction(job.func):
+            if not job.profile:
+                return await job.func(*job.args, **job.kwargs), None
+            with profile_job(job.name, scope="process", sample_interval=job.sample_interval) as profiler:
+                result = await job.func(*job.args, **job.kwargs)
+            return result, profiler.profile
+        loop = asyncio.get_running_loop()
+        executor = self._executor(job.lane)
+        if job.profile:
+            call = partial(run_profiled, job.name, job.sample_interval, job.func, *job.args, **job.kwargs)
+            return await loop.run_in_executor(executor, call)
+        return await loop.run_in_executor(executor, partial(job.func, *job.args, **job.kwargs)), None
+
+    async def _attempt(self, job: Job) -> tuple[Any, JobProfile | None]:
+        async with self._semaphore(job.lane):
+            return await asyncio.wait_for(self._call(job), job.timeout)
+
+    async def run_job(self, job: Job | str) -> JobRun:
+        """Run a job now, with its retries, and record the outcome."""
+        if isinstance(job, str):
+            job = self.jobs[job]
+        started = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result, profile = await self._attempt(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+                if attempt > job.retries:
+                    logger.warning("job %s failed after %d attempt(s): %s", job.name, attempt, error)
+                    profile = getattr(exc, "profile", None)
+                    run = JobRun(job.name, job.lane, started, time.time(), attempt, False, error, profile=profile)
+                    break
+                delay = min(job.backoff * 2 ** (attempt - 1), job.max_backoff) * random.uniform(0.5, 1.0)
+                logger.info("job %s attempt %d failed (%s); retrying in %.1fs", job.name, attempt, error, delay)
+                await asyncio.sleep(delay)
+            else:
+                run = JobRun(job.name, job.lane, started, time.time(), attempt, True, result=result, profile=profile)
+                break
+        self.history.append(run)
+        if self.profile_log is not None and run.profile is not None:
+            self.profile_log.write(run.profile, lane=run.lane, ok=run.ok, attempts=run.attempts)
+        if self.on_run is not None:
+            self.on_run(run)
+        return run
+
+    async def _loop(self, job: Job) -> None:
+        assert self._stopping is not None
+        now = time.time()
+        fire_at = now if job.run_at_start else job.trigger.next_after(now)
+        while fire_at is not None:
+            delay = max(0.0, fire_at - time.time()) + (random.uniform(0, job.jitter) if job.jitter else 0.0)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            running = self._running.get(job.name)
+            if running is not None and not running.done():
+                logger.info("job %s is still running; skipping this firing", job.name)
+            else:
+                task = asyncio.create_task(self.run_job(job), name=f"sysmaint-job-{job.name}")
+                self._running[job.name] = task
+            fire_at = job.trigger.next_after(max(fire_at, time.time()))
+
+    async def run(self) -> None:
+        """Schedule every job until :meth:`stop`; waits for running jobs on exit."""
+        self._stopping = asyncio.Event()
+        loops = [asyncio.create_task(self._loop(job), name=f"sysmaint-trigger-{job.name}") for job in self.jobs.values()]
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            await asyncio.gather(*loops, return_exceptions=True)
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+            self._running.clear()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._executors.clear()
+            self._semaphores.clear()
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+async def run_command(*argv: str, timeout: float | None = None) -> str:
+    """Run a command without blocking the loop and return its stdout.
+
+    Raises :class:`subprocess.CalledProcessError` on a non-zero exit and
+    kills the process if ``timeout`` expires.  Intended for jobs in the
+    ``subprocess`` lane.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, argv, out, err)
+    return out.decode(errors="replace")
@@ -0,0 +1,291 @@
+"""inotify-driven change feed for watched directory trees.
+
+Polling scans cost time proportional to the number of files; an event feed
+costs time proportional to the number of changes.  :class:`ChangeFeed`
+watches every directory under its roots through inotify (bound with
+:mod:`ctypes`, so no extension module is needed), follows directories as
+they are created or moved in, and coalesces raw events into
+:class:`ChangeBatch` objects: the set of directories whose contents changed,
+plus the files touched and the paths removed.
+
+A batch is exactly what the incremental structures need:
+:meth:`ChangeFeed.apply` invalidates the changed directories in a
+:class:`~sysmaint.cleanup.index.ScanIndex` and refreshes them in a
+:class:`~sysmaint.cleanup.usage.UsageTree`.  If the kernel queue overflows,
+events were lost; the batch says so and ``apply`` falls back to a full
+rebuild of the watched roots.
+
+inotify watches are per directory and limited by
+``fs.inotify.max_user_watches``; very large trees may need that raised.
+Watches of directories that are deleted or moved away are removed
+(``inotify_rm_watch``) as the events arrive, so a long-running feed over a
+churning tree such as ``/tmp`` holds only as many as there are directories.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sysmaint.cleanup.index import ScanIndex
+    from sysmaint.cleanup.usage import UsageTree
+
+__all__ = ["ChangeBatch", "ChangeFeed"]
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = os.O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+
+DEFAULT_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT = struct.Struct("iIII")
+_libc = None
+
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available on this system")
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+
+@dataclass
+class ChangeBatch:
+    """Coalesced changes observed over one batching window."""
+
+    dirs: set[str] = field(default_factory=set)
+    files: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+    events: int = 0
+    overflow: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.events or self.overflow)
+
+
+class ChangeFeed:
+    """Watch directory trees and deliver coalesced change batches.
+
+    ``mask`` selects the inotify events of interest; the default reports
+    content changes, creations, deletions and renames.
+    """
+
+    def __init__(self, roots: str | Iterable[str], *, mask: int = DEFAULT_MASK) -> None:
+        self.roots = [os.path.abspath(r) for r in ([roots] if isinstance(roots, str) else roots)]
+        self.mask = mask | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK
+        libc = _inotify()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+        self._wds: dict[int, str] = {}
+        self._paths: dict[str, int] = {}
+        # Watched subdirectories of each watched directory, so dropping a
+        # subtree touches only its own watches.
+        self._children: dict[str, set[str]] = {}
+        self._poll = select.poll()
+        self._poll.register(fd, select.POLLIN)
+        for root in self.roots:
+            self._watch_tree(root)
+
+    def fileno(self) -> int:
+        return self._fd
+
+    @property
+    def watches(self) -> int:
+        return len(self._wds)
+
+    def _add_watch(self, path: str) -> bool:
+        wd = _inotify().inotify_add_watch(self._fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return False
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached (raise fs.inotify.max_user_watches)", path)
+            raise OSError(err, os.strerror(err), path)
+        self._wds[wd] = path
+        self._paths[path] = wd
+        parent = os.path.dirname(path)
+        if parent in self._paths:
+            self._children.setdefault(parent, set()).add(path)
+        return True
+
+    def _watch_tree(self, root: str, batch: ChangeBatch | None = None) -> None:
+        """Watch ``root`` and every directory below it.
+
+        With ``batch``, the new directories and their files are recorded as
+        changed, since they may have been populated before the watch existed.
+        """
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if not self._add_watch(path):
+                continue
+            if batch is not None:
+                batch.dirs.add(path)
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif batch is not None:
+                            batch.files.add(entry.path)
+            except OSError:
+                continue
+
+    def _forget(self, path: str) -> None:
+        """Drop the watches of ``path`` and every directory below it."""
+        libc = _inotify()
+        siblings = self._children.get(os.path.dirname(path))
+        if siblings is not None:
+            siblings.discard(path)
+        stack = [path]
+        while stack:
+            watched = stack.pop()
+            stack.extend(self._children.pop(watched, ()))
+            wd = self._paths.pop(watched, None)
+            if wd is None:
+                continue
+            self._wds.pop(wd, None)
+            # Fails with EINVAL when the kernel already dropped a deleted
+            # directory's watch; either way it is gone.
+            libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_into(self, batch: ChangeBatch) -> int:
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return 0
+        offset = n = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            n += 1
+            self._handle(wd, mask, os.fsdecode(name), batch)
+        batch.events += n
+        return n
+
+    def _handle(self, wd: int, mask: int, name: str, batch: ChangeBatch) -> None:
+        if mask & IN_Q_OVERFLOW:
+            batch.overflow = True
+            return
+        directory = self._wds.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            # The kernel dropped the watch (its filesystem went away).
+            self._forget(directory)
+            return
+        if mask & IN_DELETE_SELF:
+            self._forget(directory)
+            return
+        if mask & IN_MOVE_SELF:
+            # Its parent reports the move (IN_MOVED_FROM), and by now the
+            # wd may already name the directory's new path.
+            return
+        path = os.path.join(directory, name)
+        batch.dirs.add(directory)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            batch.removed.add(path)
+            batch.files.discard(path)
+            if mask & IN_ISDIR:
+                self._forget(path)
+        elif mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                batch.removed.discard(path)
+                self._watch_tree(path, batch)
+        else:
+            batch.removed.discard(path)
+            batch.files.add(path)
+
+    def poll(self, timeout: float | None = 0.0) -> ChangeBatch:
+        """Collect whatever arrives within ``timeout`` seconds (None blocks)."""
+        batch = ChangeBatch()
+        ms = -1 if timeout is None else int(timeout * 1000)
+        if self._poll.poll(ms):
+            while self._read_into(batch):
+                pass
+        return batch
+
+    def batches(self, window: float = 1.0, *, idle_timeout: float | None = None) -> Iterator[ChangeBatch]:
+        """Yield batches covering ``window`` seconds from the first event each.
+
+        Blocks while nothing happens; with ``idle_timeout`` an empty batch is
+        yielded after that many quiet seconds so callers can do periodic work.
+        """
+        while True:
+            batch = self.poll(idle_timeout)
+            if not batch:
+                if idle_timeout is not None:
+                    yield batch
+                continue
+            deadline = time.monotonic() + window
+            while (remaining := deadline - time.monotonic()) > 0:
+                more = self.poll(remaining)
+                batch.dirs |= more.dirs
+                batch.files = (batch.files - more.removed) | more.files
+                batch.removed = (batch.removed - more.files) | more.removed
+                batch.events += more.events
+                batch.overflow |= more.overflow
+            yield batch
+
+    def apply(self, batch: ChangeBatch, *, index: ScanIndex | None = None, tree: UsageTree | None = None) -> None:
+        """Bring a scan index and/or usage tree up to date with ``batch``."""
+        if batch.overflow:
+            if index is not None:
+                index.reset()
+            if tree is not None:
+                tree.scan(self.roots)
+            return
+        if index is not None:
+            index.invalidate(batch.dirs)
+        if tree is not None:
+            tree.refresh(d for d in batch.dirs if d not in batch.removed)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            self._poll.unregister(self._fd)
+            os.close(self._fd)
+            self._fd = -1
+            self._wds.clear()
+            self._paths.clear()
+            self._children.clear()
+
+    def __enter__(self) -> ChangeFeed:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.store import SeriesStore  # noqa: E402
+from sysmaint.reporting.aggregate import (  # noqa: E402
+    aggregate,
+    bucket_reduce,
+    group_reduce,
+    load_series,
+    moving_average,
+    rate,
+    reduce,
+)
+
+nan = float("nan")
+
+
+@pytest.mark.parametrize(
+    ("reducer", "expected"),
+    [
+        ("count", [2, 0, 3]),
+        ("sum", [4, 0, 60]),
+        ("mean", [2, nan, 20]),
+        ("min", [1, nan, 10]),
+        ("max", [3, nan, 30]),
+        ("first", [1, nan, 10]),
+        ("last", [3, nan, 20]),
+        ("median", [2, nan, 20]),
+        ("p90", [2.8, nan, 28]),
+    ],
+)
+def test_group_reduce_ignores_nan(reducer: str, expected: list[float]) -> None:
+    keys = np.array([3, 1, 3, 2, 3, 1, 3, 2])
+    values = np.array([10.0, 1.0, nan, nan, 30.0, 3.0, 20.0, nan])
+    out_keys, out = group_reduce(keys, values, reducer)
+    assert out_keys.tolist() == [1, 2, 3]
+    np.testing.assert_allclose(out, expected)
+
+
+def test_reduce_matches_numpy() -> None:
+    values = np.random.default_rng(3).normal(size=101)
+    assert reduce(values, "p99.9") == pytest.approx(np.percentile(values, 99.9))
+    assert reduce(values, "median") == pytest.approx(np.median(values))
+    assert reduce(np.empty(0), "count") == 0
+    assert math.isnan(reduce(np.empty(0), "max"))
+    with pytest.raises(ValueError):
+        reduce(values, "p101")
+    with pytest.raises(ValueError):
+        reduce(values, "mode")
+
+
+def test_bucket_reduce_and_rate() -> None:
+    ts = np.array([0.0, 10.0, 20.0, 30.0, 30.0, 75.0])
+    counter = np.array([0.0, 100.0, 300.0, 50.0, 60.0, 510.0])
+    rates = rate(ts, counter)
+    np.testing.assert_allclose(rates, [nan, 10, 20, nan, nan, 10])
+    starts, out = bucket_reduce(ts, rates, 60, "max")
+    assert starts.tolist() == [0, 60] and out.tolist() == [20, 10]
+
+    result = aggregate({"a": (ts, counter), "b": (np.empty(0), np.empty(0))}, transform="rate", reducer="mean")
+    assert result["a"][0].tolist() == [0] and result["a"][1].tolist() == pytest.approx([40 / 3])
+    assert result["b"][0].size == 0
+    with pytest.raises(ValueError):
+        aggregate({}, transform="log")
+
+
+def test_moving_average() -> None:
+    values = np.array([1.0, nan, 3.0, 5.0])
+    np.testing.assert_allclose(moving_average(values, 2), [1, 1, 3, 4])
+    np.testing.assert_allclose(moving_average(values, 15, ts=np.array([0.0, 10.0, 20.0, 30.0])), [1, 1, 3, 4])
+
+
+def test_load_series(tmp_path) -> None:
+    stores = {}
+    for host, offset in (("a", 0.0), ("b", 100.0)):
+        store = SeriesStore(str(tmp_path / host), span=1000)
+        store.append_columns(np.array([1.0, 2.0, 3.0]), {"load": np.array([1.0, 2.0, 3.0]) + offset})
+        stores[host] = store
+    series = load_series(stores, "load", start=2)
+    assert series["a"][1].tolist() == [2, 3] and series["b"][1].tolist() == [102, 103]
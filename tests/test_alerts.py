@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from sysmaint.monitoring.alerts import AlertEngine, Rule  # noqa: E402
+
+
+def test_rule_parse() -> None:
+    rule = Rule.parse("rate(disk.*.weighted_io_ms) > 5000 for 1m")
+    assert (rule.metric, rule.op, rule.threshold, rule.duration, rule.rate) == (
+        "disk.*.weighted_io_ms",
+        ">",
+        5000.0,
+        60.0,
+        True,
+    )
+    assert str(rule) == "rate(disk.*.weighted_io_ms) > 5000 for 60s"
+    assert Rule.parse("mem.available <  1e9", name="low-mem").name == "low-mem"
+    with pytest.raises(ValueError):
+        Rule.parse("mem.available ~ 1")
+
+
+def test_unmatched_rule_is_an_error() -> None:
+    with pytest.raises(ValueError, match="matches no metric"):
+        AlertEngine(["disk.*.io_ms > 1"], ["mem.available"])
+
+
+def test_for_window_fires_and_resolves() -> None:
+    engine = AlertEngine({"low-mem": "mem.available < 100 for 60s"}, ["mem.available"])
+    assert engine.evaluate_samples(0, {"a": {"mem.available": 50}, "b": {"mem.available": 500}}) == []
+    assert engine.evaluate_samples(30, {"a": {"mem.available": 50}, "b": {"mem.available": 50}}) == []
+    [event] = engine.evaluate_samples(60, {"a": {"mem.available": 50}, "b": {"mem.available": 50}})
+    assert (event.host, event.state, event.since, event.timestamp) == ("a", "firing", 0.0, 60.0)
+    assert [(host, rule.name) for host, rule, _, _ in engine.firing()] == [("a", "low-mem")]
+
+    # A missing sample restarts b's window before it could fire.
+    assert engine.evaluate_samples(80, {"a": {"mem.available": 50}, "b": {}}) == []
+    assert engine.evaluate_samples(100, {"a": {"mem.available": 50}, "b": {"mem.available": 50}}) == []
+    [event] = engine.evaluate_samples(120, {"a": {"mem.available": 500}, "b": {"mem.available": 50}})
+    assert (event.host, event.state, event.value) == ("a", "resolved", 500.0)
+
+
+def test_rate_of_a_reset_counter_is_missing() -> None:
+    engine = AlertEngine(["rate(net.rx_errors) > 10"], ["net.rx_errors"])
+    assert engine.evaluate_samples(0, {"a": {"net.rx_errors": 0}}) == []
+    [event] = engine.evaluate_samples(10, {"a": {"net.rx_errors": 200}})
+    assert (event.state, event.value) == ("firing", 20.0)
+    [event] = engine.evaluate_samples(20, {"a": {"net.rx_errors": 5}})
+    assert event.state == "resolved"
+    assert math.isnan(event.value)
+
+
+def test_rate_needs_a_later_timestamp() -> None:
+    engine = AlertEngine(["rate(net.rx_errors) >= 0"], ["net.rx_errors"])
+    assert engine.evaluate_samples(10, {"a": {"net.rx_errors": 0}}) == []
+    assert engine.evaluate_samples(10, {"a": {"net.rx_errors": 50}}) == []
+    assert engine.evaluate_samples(5, {"a": {"net.rx_errors": 60}}) == []
+    assert engine.firing() == []
+    [event] = engine.evaluate_samples(15, {"a": {"net.rx_errors": 60}})
+    assert (event.state, event.value) == ("firing", 0.0)
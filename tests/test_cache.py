@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.store import SeriesStore  # noqa: E402
+from sysmaint.reporting.cache import AggregateCache  # noqa: E402
+
+
+def test_keys_only_for_sealed_segments(tmp_path) -> None:
+    with SeriesStore(str(tmp_path), span=100) as store:
+        store.append_columns(np.array([1.0, 150.0]), {"a": np.array([1.0, 2.0])})
+        sealed, active = store.segments()
+    key = AggregateCache.key(sealed, "a", 60, "mean")
+    assert key is not None and sealed.checksum in key
+    assert key != AggregateCache.key(sealed, "a", 60, "max")
+    assert AggregateCache.key(active, "a", 60, "mean") is None
+
+
+def test_memory_lru_is_bounded() -> None:
+    item = {"v": np.zeros(100)}
+    cache = AggregateCache(max_bytes=2000)
+    for key in ("a", "b"):
+        cache.put(key, item)
+    assert cache.get("a") is item
+    cache.put("c", item)
+    assert (len(cache), cache.evictions) == (2, 1)
+    assert cache.get("b") is None
+    assert cache.get("a") is item and cache.get("c") is item
+    cache.put("huge", {"v": np.zeros(1000)})
+    assert cache.get("huge") is None
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_disk_cache_is_shared_and_bounded(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    with AggregateCache(path, max_disk_bytes=1500) as cache:
+        cache.put("a", {"v": np.arange(100.0)})
+        cache.put("b", {"v": np.arange(100.0) * 2})
+    with AggregateCache(path) as cache:
+        assert cache.get("a") is None
+        assert cache.get("b")["v"].tolist() == (np.arange(100.0) * 2).tolist()
+
+
+def test_corrupt_file_is_moved_aside(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    with open(path, "wb") as f:
+        f.write(b"not a database" * 100)
+    with AggregateCache(path) as cache:
+        cache.put("a", {"v": np.ones(3)})
+    assert os.path.exists(path + ".corrupt")
+    with AggregateCache(path) as cache:
+        assert cache.get("a")["v"].tolist() == [1, 1, 1]
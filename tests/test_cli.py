@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from sysmaint.cli import main
+
+
+def test_status_reports_unavailable_mount(tmp_path, capsys) -> None:
+    assert main(["status", "/", str(tmp_path / "missing")]) == 0
+    out = capsys.readouterr().out
+    assert f"{tmp_path / 'missing'} unavailable (No such file or directory)" in out
+
+
+def test_du_rescans_a_cache_counted_the_other_way(tmp_path, capsys) -> None:
+    (tmp_path / "root").mkdir()
+    (tmp_path / "root" / "f").write_bytes(b"x" * 10)
+    cache = str(tmp_path / "usage.db")
+    assert main(["du", str(tmp_path / "root"), "--cache", cache]) == 0
+    assert main(["du", str(tmp_path / "root"), "--cache", cache, "--apparent"]) == 0
+    out, err = capsys.readouterr()
+    assert "counts allocated blocks; rescanning" in err
+    assert out.splitlines()[-1].split()[:2] == ["10", "B"]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from sysmaint.cleanup.dedupe import DuplicateFinder, HashCache
+from sysmaint.cleanup.scanner import ScanEntry
+
+
+def _entries(root) -> list[ScanEntry]:
+    return [ScanEntry.from_stat(str(path), path.lstat()) for path in sorted(root.iterdir())]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "files"
+    root.mkdir()
+    files = {
+        "small1": b"abcdef",
+        "small2": b"abcdef",
+        "small3": b"abcxyz",
+        "big1": b"HEAD" + b"1" * 100 + b"TAIL",
+        "big2": b"HEAD" + b"1" * 100 + b"TAIL",
+        "big3": b"HEAD" + b"2" * 100 + b"TAIL",
+        "unique": b"only one of this size",
+        "empty1": b"",
+        "empty2": b"",
+    }
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+    os.link(root / "big1", root / "big1-link")
+    return root
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_groups_by_content(tree, use_mmap: bool) -> None:
+    finder = DuplicateFinder(workers=2, partial_bytes=4, use_mmap=use_mmap)
+    groups = finder.find(_entries(tree))
+    assert [[os.path.basename(e.path) for e in g.entries] for g in groups] == [
+        ["big1", "big1-link", "big2"],
+        ["small1", "small2"],
+    ]
+    assert [(g.inodes, g.reclaimable) for g in groups] == [(2, 108), (2, 6)]
+    stats = finder.stats
+    assert (stats.files, stats.candidates) == (10, 6)
+    assert (stats.partial_hashed, stats.full_hashed) == (6, 3)
+
+
+def test_file_changed_since_the_scan_is_skipped(tree) -> None:
+    entries = _entries(tree)
+    (tree / "small2").write_bytes(b"ABCDEF")
+    groups = DuplicateFinder(partial_bytes=4).find(entries)
+    assert [os.path.basename(e.path) for g in groups for e in g.entries] == ["big1", "big1-link", "big2"]
+
+
+def test_cache_skips_rehashing_unchanged_files(tree, tmp_path) -> None:
+    with HashCache(str(tmp_path / "hashes.db")) as cache:
+        first = DuplicateFinder(partial_bytes=4, cache=cache).find(_entries(tree))
+        assert len(cache) == 6
+
+        finder = DuplicateFinder(partial_bytes=4, cache=cache)
+        assert finder.find(_entries(tree)) == first
+        assert (finder.stats.partial_hashed, finder.stats.full_hashed, finder.stats.bytes_hashed) == (0, 0, 0)
+        assert finder.stats.cache_hits == 9
+
+        (tree / "big2").write_bytes(b"HEAD" + b"3" * 100 + b"TAIL")
+        finder = DuplicateFinder(partial_bytes=4, cache=cache)
+        groups = finder.find(_entries(tree))
+        assert [os.path.basename(e.path) for e in groups[0].entries] == ["small1", "small2"]
+        assert (finder.stats.partial_hashed, finder.stats.full_hashed) == (1, 1)
+
+
+def test_corrupt_cache_is_rebuilt(tmp_path) -> None:
+    path = tmp_path / "hashes.db"
+    path.write_bytes(b"garbage" * 100)
+    with HashCache(str(path)) as cache:
+        assert len(cache) == 0
+    assert (tmp_path / "hashes.db.corrupt").exists()
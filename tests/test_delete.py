@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+
+from sysmaint.cleanup import targets
+from sysmaint.cleanup.delete import DeletionPipeline
+from sysmaint.cleanup.scanner import scan
+from sysmaint.cleanup.targets import DirectoryTarget
+
+
+def _swap_for_symlink(directory, target) -> None:
+    shutil.rmtree(directory)
+    os.symlink(target, directory)
+
+
+def test_directory_swapped_for_symlink_is_not_followed(tmp_path) -> None:
+    (tmp_path / "tmp" / "x").mkdir(parents=True)
+    (tmp_path / "victim").mkdir()
+    (tmp_path / "tmp" / "x" / "passwd").write_text("junk")
+    (tmp_path / "victim" / "passwd").write_text("root")
+    entries = list(scan([str(tmp_path / "tmp")]))
+    _swap_for_symlink(tmp_path / "tmp" / "x", tmp_path / "victim")
+
+    errors: list[OSError] = []
+    stats = DeletionPipeline(on_error=errors.append).run(entries)
+    assert (stats.files, stats.errors) == (0, 1)
+    assert (tmp_path / "victim" / "passwd").read_text() == "root"
+
+
+def test_directory_target_survives_symlink_race(tmp_path, monkeypatch) -> None:
+    (tmp_path / "tmp" / "x").mkdir(parents=True)
+    (tmp_path / "victim").mkdir()
+    old = time.time() - 30 * 86400
+    for name in ("tmp/x/passwd", "victim/passwd"):
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (old, old))
+
+    def racing_scan(*args, **kwargs):
+        found = list(scan(*args, **kwargs))
+        _swap_for_symlink(tmp_path / "tmp" / "x", tmp_path / "victim")
+        return found
+
+    monkeypatch.setattr(targets, "scan", racing_scan)
+    result = DirectoryTarget("tmp", [str(tmp_path / "tmp")], max_age=86400).run()
+    assert result.files == 0
+    assert (tmp_path / "victim" / "passwd").exists()
+
+
+def test_dry_run_is_not_rate_limited(tmp_path) -> None:
+    for i in range(50):
+        (tmp_path / f"f{i}").write_text("x")
+    started = time.perf_counter()
+    stats = DeletionPipeline(dry_run=True, max_files_per_sec=5).run(scan([str(tmp_path)]))
+    assert stats.files == 50
+    assert time.perf_counter() - started < 2.0
+    assert len(os.listdir(tmp_path)) == 50
+
+    stats = DeletionPipeline().run(scan([str(tmp_path)]))
+    assert stats.files == 50
+    assert os.listdir(tmp_path) == []
+
+
+def test_prune_does_not_follow_a_swapped_parent(tmp_path) -> None:
+    (tmp_path / "tmp" / "x" / "sub").mkdir(parents=True)
+    (tmp_path / "victim" / "sub").mkdir(parents=True)
+    (tmp_path / "tmp" / "x" / "sub" / "f").write_text("junk")
+    pipeline = DeletionPipeline(prune_under=[str(tmp_path / "tmp")])
+    stats = pipeline.run(scan([str(tmp_path / "tmp")]))
+    assert stats.files == 1 and stats.dirs == 2
+    assert os.listdir(tmp_path / "tmp") == []
+
+    # Emptied, then its parent is swapped for a symlink before pruning.
+    (tmp_path / "tmp" / "x" / "sub").mkdir(parents=True)
+    _swap_for_symlink(tmp_path / "tmp" / "x", tmp_path / "victim")
+    assert pipeline._prune([str(tmp_path / "tmp" / "x" / "sub")]) == 0
+    assert (tmp_path / "victim" / "sub").is_dir()
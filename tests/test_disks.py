@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import os
+
+from benchmarks.fixtures import make_smartctl
+from sysmaint.monitoring.disks import DiskHealth
+
+
+def test_disk_health_with_fake_smartctl(tmp_path) -> None:
+    root = make_smartctl(str(tmp_path / "smartctl"), disks=3, nvme=1, delay=0.0)
+    options = {"smartctl": os.path.join(root, "bin", "smartctl"), "sysfs": os.path.join(root, "sys")}
+    with DiskHealth(nvme=str(tmp_path / "no-nvme"), workers=2, **options) as health:
+        metrics = health.collect()
+        assert health.calls == 3
+        # loop0 is not a physical disk.
+        assert {name.split(".")[1] for name in metrics} == {"nvme0n1", "sda", "sdb"}
+        assert metrics["smart.nvme0n1.percentage_used"] >= 0
+        assert "smart.sda.reallocated_sectors" in metrics
+        # A second read within the TTL comes from the cache.
+        assert health.collect() == metrics
+        assert health.calls == 3
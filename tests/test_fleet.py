@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+
+from sysmaint.fleet.agent import FakeAgent
+from sysmaint.fleet.client import AgentConnection, Fleet
+
+
+async def _fleet_calls() -> tuple[dict[str, object], dict[str, object], FakeAgent]:
+    agent = FakeAgent("good", metrics=5)
+    server = await agent.serve()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        # Nothing listens on port 1, so that host fails without failing the call.
+        connections = [AgentConnection.tcp("good", "127.0.0.1", port), AgentConnection.tcp("down", "127.0.0.1", 1)]
+        async with Fleet(connections) as fleet:
+            collected = await fleet.call("collect")
+            pinged = await fleet.call("ping")
+    finally:
+        server.close()
+        await server.wait_closed()
+    return collected, pinged, agent
+
+
+def test_fleet_call_over_fake_agents() -> None:
+    collected, pinged, agent = asyncio.run(_fleet_calls())
+    assert sorted(collected["good"]["metrics"]) == [f"fake.m{i:03d}" for i in range(5)]
+    assert pinged["good"]["host"] == "good"
+    assert isinstance(collected["down"], OSError) and isinstance(pinged["down"], OSError)
+    # The connection stays open between calls.
+    assert agent.connections == 1
+    assert agent.requests == 2
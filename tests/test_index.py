@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import time
+
+from sysmaint.cleanup.index import ScanIndex
+from sysmaint.cleanup.scanner import older_than
+from sysmaint.cleanup.usage import UsageTree
+
+DAY = 86400
+
+
+def _scan(db: str, root: str, **options) -> list[str]:
+    with ScanIndex(db) as index:
+        return sorted(os.path.relpath(e.path, root) for e in index.scan([root], **options))
+
+
+def test_index_finds_files_that_aged_in_unchanged_directories(tmp_path) -> None:
+    root, db = tmp_path / "root", str(tmp_path / "index.db")
+    (root / "a" / "b").mkdir(parents=True)
+    now = time.time()
+    for name, days in (("a/x", 5), ("a/b/y", 9), ("z", 0)):
+        (root / name).write_text("hi")
+        os.utime(root / name, (now - days * DAY, now - days * DAY))
+
+    assert _scan(db, str(root), predicate=older_than(7 * DAY, now=now)) == ["a/b/y"]
+    # Three days on, a/x has aged past the cutoff; no directory changed.
+    later = older_than(7 * DAY, now=now + 3 * DAY)
+    assert _scan(db, str(root), predicate=later) == ["a/b/y", "a/x"]
+    # Rewritten in place, a/b/y is judged by its new mtime.
+    with open(root / "a" / "b" / "y", "a") as f:
+        f.write("more")
+    assert _scan(db, str(root), predicate=later) == ["a/x"]
+    assert _scan(db, str(root)) == ["a/b/y", "a/x", "z"]
+
+
+def test_indexed_usage_counts_files_grown_in_place(tmp_path) -> None:
+    root, db = tmp_path / "root", str(tmp_path / "index.db")
+    (root / "d").mkdir(parents=True)
+    (root / "d" / "log").write_bytes(b"x" * 1000)
+    tree = UsageTree(apparent=True)
+    with ScanIndex(db) as index:
+        tree.scan([str(root)], index=index)
+    assert tree.usage(str(root)) == (1000, 1)
+
+    with open(root / "d" / "log", "ab") as f:
+        f.write(b"x" * 4000)
+    with ScanIndex(db) as index:
+        tree.scan([str(root)], index=index)
+        assert not index.changed
+    assert tree.usage(str(root)) == (5000, 1)
+
+
+def test_root_that_was_not_scanned_keeps_its_records(tmp_path) -> None:
+    db = str(tmp_path / "index.db")
+    roots = [str(tmp_path / name) for name in ("a", "b")]
+    for root in roots:
+        os.makedirs(os.path.join(root, "sub"))
+        with open(os.path.join(root, "sub", "f"), "w") as f:
+            f.write("x")
+    with ScanIndex(db) as index:
+        assert len(list(index.scan(roots))) == 2
+        assert len(index) == 4
+
+    os.rename(roots[1], str(tmp_path / "away"))
+    with ScanIndex(db) as index:
+        assert len(list(index.scan(roots))) == 1
+        assert len(index) == 4
+
+    os.rename(str(tmp_path / "away"), roots[1])
+    with ScanIndex(db) as index:
+        assert len(list(index.scan(roots))) == 2
+        assert not index.changed
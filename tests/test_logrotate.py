@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import gzip
+import os
+import subprocess
+
+import pytest
+
+from sysmaint.cleanup.logrotate import LogRotator, available_codec, compress_file, rotate
+
+
+def _names(tmp_path) -> list[str]:
+    return sorted(os.listdir(tmp_path))
+
+
+def test_compress_file_streams_and_keeps_metadata(tmp_path) -> None:
+    path = tmp_path / "app.log"
+    data = b"".join(b"line %d\n" % i for i in range(5000))
+    path.write_bytes(data)
+    os.chmod(path, 0o640)
+    os.utime(path, (1_700_000_000, 1_700_000_000))
+    result = compress_file(str(path), chunk_size=1000)
+    assert result.output == str(path) + ".gz" and result.bytes_in == len(data) and result.ratio > 1
+    assert _names(tmp_path) == ["app.log.gz"]
+    assert gzip.decompress((tmp_path / "app.log.gz").read_bytes()) == data
+    st = os.stat(result.output)
+    assert (st.st_mode & 0o777, st.st_mtime) == (0o640, 1_700_000_000)
+    with pytest.raises(ValueError):
+        available_codec("lz4")
+
+
+def test_rotate_shifts_generations_and_drops_the_oldest(tmp_path) -> None:
+    log = tmp_path / "app.log"
+    for name, text in (("app.log.1", "one"), ("app.log.2.gz", "two"), ("app.log.3.zst", "three")):
+        (tmp_path / name).write_text(text)
+    log.write_text("current")
+    os.chmod(log, 0o600)
+    assert rotate(str(log), keep=3) == str(log) + ".1"
+    assert _names(tmp_path) == ["app.log", "app.log.1", "app.log.2", "app.log.3.gz"]
+    assert (tmp_path / "app.log.1").read_text() == "current"
+    assert (tmp_path / "app.log.2").read_text() == "one"
+    assert log.read_text() == "" and os.stat(log).st_mode & 0o777 == 0o600
+    assert rotate(str(log)) is None
+    assert rotate(str(tmp_path / "missing.log")) is None
+
+
+def test_copytruncate_keeps_the_writer_file(tmp_path) -> None:
+    log = tmp_path / "app.log"
+    with open(log, "a") as writer:
+        writer.write("before\n")
+        writer.flush()
+        rotate(str(log), copytruncate=True)
+        writer.write("after\n")
+    assert (tmp_path / "app.log.1").read_text() == "before\n"
+    assert log.read_bytes().lstrip(b"\0") == b"after\n"
+
+
+def test_rotator_delays_compression_and_runs_postrotate_once(tmp_path) -> None:
+    logs = [tmp_path / "a.log", tmp_path / "b.log"]
+    calls = []
+    rotator = LogRotator(codec="gzip", workers=2, postrotate=calls.append)
+    for log in logs:
+        log.write_text("first\n")
+    assert rotator.rotate(map(str, logs)) == []
+    assert calls == [[str(log) for log in logs]]
+
+    # A late write into the generation just rotated survives the next rotation.
+    with open(tmp_path / "a.log.1", "a") as f:
+        f.write("late\n")
+    for log in logs:
+        log.write_text("second\n")
+    results = rotator.rotate(map(str, logs))
+    assert sorted(os.path.basename(r.output) for r in results) == ["a.log.2.gz", "b.log.2.gz"]
+    assert gzip.decompress((tmp_path / "a.log.2.gz").read_bytes()) == b"first\nlate\n"
+    assert (tmp_path / "a.log.1").read_text() == "second\n"
+    assert len(calls) == 2
+
+    logs[0].write_text("third\n")
+    results = LogRotator(codec="gzip", delaycompress=False).rotate([str(tmp_path / "a.log")])
+    assert [os.path.basename(r.output) for r in results] == ["a.log.1.gz"]
+
+
+def test_failed_postrotate_command_compresses_nothing(tmp_path) -> None:
+    log = tmp_path / "app.log"
+    log.write_text("x\n")
+    rotator = LogRotator(codec="gzip", delaycompress=False, postrotate="exit 3")
+    with pytest.raises(subprocess.CalledProcessError):
+        rotator.rotate([str(log)])
+    assert _names(tmp_path) == ["app.log", "app.log.1"]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import sys
+
+from sysmaint.reporting.logscan import LogScanner
+
+_FAKE_JOURNALCTL = """#!{python}
+import json, sys, time
+sys.stderr.write("noise" * 100_000)
+for i in range(3):
+    print(json.dumps({{"MESSAGE": "error %d" % i, "SYSLOG_IDENTIFIER": "app", "__CURSOR": "c%d" % i}}), flush=True)
+time.sleep({sleep})
+"""
+
+
+_SYSLOG = """\
+Oct 16 10:00:01 host app[1]: boom
+Oct 16 10:00:02 host app[1]: all good
+Oct 16 10:00:03 host app[1]: boom
+Oct 16 10:00:04 host app[1]: boom again
+"""
+
+
+def _journalctl(tmp_path, sleep: float) -> str:
+    path = tmp_path / "journalctl"
+    path.write_text(_FAKE_JOURNALCTL.format(python=sys.executable, sleep=sleep))
+    path.chmod(0o755)
+    return str(path)
+
+
+def _counts(scanner: LogScanner) -> dict[str, int]:
+    return {rule: count for (_, rule, _), count in scanner.counts.items()}
+
+
+def test_default_rules_classify_syslog(tmp_path) -> None:
+    log = tmp_path / "syslog"
+    log.write_text(
+        "Oct 16 10:00:01 host kernel: Out of memory: Killed process 42 (java)\n"
+        "Oct 16 10:00:02 host sshd[7]: Failed password for invalid user admin\n"
+        "Oct 16 10:00:03 host app[1]: request served\n"
+        "Oct 16 10:00:04 host app[1]: ERROR timed out\n"
+    )
+    scanner = LogScanner()
+    scanner.scan_file(str(log))
+    assert _counts(scanner) == {"oom": 1, "auth_failure": 1, "error": 1}
+    assert scanner.lines == 4
+
+
+def test_anchored_rules_match_every_line(tmp_path) -> None:
+    log = tmp_path / "syslog"
+    log.write_text(_SYSLOG)
+    # A small chunk size puts most lines in the middle of a chunk.
+    for pattern, expected in ((r"^Oct 16 .* boom", 3), (r"boom$", 2), (r"^Oct 16 \S+ host app\[1\]: all", 1)):
+        scanner = LogScanner({"boom": pattern}, chunk_size=64)
+        scanner.scan_file(str(log))
+        assert _counts(scanner) == {"boom": expected}, pattern
+
+
+def test_custom_rules_apply_to_the_journal_message(tmp_path) -> None:
+    path = tmp_path / "journalctl"
+    entries = [{"MESSAGE": 'disk "sdb" gone', "SYSLOG_IDENTIFIER": "udev"}, {"MESSAGE": "boom", "_COMM": "app"}]
+    script = "".join(f"print({json.dumps(json.dumps(entry))})\n" for entry in entries)
+    path.write_text(f"#!{sys.executable}\n{script}")
+    path.chmod(0o755)
+    scanner = LogScanner({"disk": r'^disk "sd[a-z]+" gone', "boom": r"^boom$"})
+    scanner.scan_journal(journalctl=str(path))
+    assert _counts(scanner) == {"disk": 1, "boom": 1}
+
+
+def test_resumes_from_saved_offset(tmp_path) -> None:
+    log, state = tmp_path / "syslog", str(tmp_path / "state")
+    log.write_text(_SYSLOG)
+    scanner = LogScanner({"boom": "boom"}, state=state)
+    scanner.scan_file(str(log))
+    scanner.save()
+    with open(log, "a") as f:
+        f.write("Oct 16 10:00:05 host app[1]: boom\nOct 16 10:00:06 host app[1]: partial boo")
+    scanner = LogScanner({"boom": "boom"}, state=state)
+    scanner.scan_file(str(log))
+    assert scanner.lines == 1 and _counts(scanner) == {"boom": 1}
+
+
+def test_journal_scan_with_chatty_stderr(tmp_path) -> None:
+    scanner = LogScanner()
+    scanner.scan_journal(journalctl=_journalctl(tmp_path, 0), timeout=30)
+    assert scanner.lines == 3
+    assert sum(scanner.counts.values()) == 3
+
+
+def test_timed_out_journal_scan_counts_partial_output(tmp_path) -> None:
+    state = str(tmp_path / "state")
+    scanner = LogScanner(state=state)
+    scanner.scan_journal(journalctl=_journalctl(tmp_path, 30), timeout=0.5)
+    assert sum(scanner.counts.values()) == 3
+    scanner.save()
+    with open(state + ".journal") as f:
+        assert f.read() == "c2"
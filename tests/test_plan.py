@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+
+from sysmaint.cleanup.plan import Plan, apply_plan
+from sysmaint.cleanup.scanner import scan
+
+
+def _tree(root) -> None:
+    for name in ("a/one", "a/two", "b/c/three", "four"):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+
+
+def test_plan_round_trip(tmp_path) -> None:
+    _tree(tmp_path)
+    plan = Plan.build(scan([str(tmp_path)]), roots=[str(tmp_path)])
+    loaded = Plan.from_bytes(plan.to_bytes())
+    assert loaded.roots == plan.roots
+    assert sorted(loaded, key=lambda e: e.path) == sorted(plan, key=lambda e: e.path)
+
+    path = str(tmp_path / "plan")
+    plan.dump(path)
+    assert sorted(Plan.load(path), key=lambda e: e.path) == sorted(plan, key=lambda e: e.path)
+
+
+def test_apply_plan_skips_changed_files(tmp_path) -> None:
+    _tree(tmp_path)
+    plan = Plan.build(scan([str(tmp_path)]), roots=[str(tmp_path)])
+    (tmp_path / "a" / "two").write_text("rewritten since the plan was made")
+    os.unlink(tmp_path / "four")
+
+    stats = apply_plan(plan, prune=True)
+    assert (stats.files, stats.changed, stats.missing) == (2, 1, 1)
+    assert (tmp_path / "a" / "two").exists()
+    # b/c and b were emptied and pruned; a still holds the changed file.
+    assert sorted(os.listdir(tmp_path)) == ["a"]
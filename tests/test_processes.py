@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+import os
+import shutil
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.processes import ProcessSampler  # noqa: E402
+
+
+def _write_proc(root, procs: dict[int, dict]) -> None:
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    for pid, p in procs.items():
+        os.makedirs(root / str(pid))
+        fields = ["S", 1, pid, pid, 0, -1, 0, p.get("minflt", 0), 0, 0, 0, p["utime"], p.get("stime", 0)]
+        fields += [0, 0, 20, 0, 1, 0, p["starttime"], 4096 * 100, p.get("rss", 10), 0, 0]
+        (root / str(pid) / "stat").write_text(f"{pid} ({p['comm']}) " + " ".join(map(str, fields)) + "\n")
+        if "read_bytes" in p:
+            io = {"rchar": 0, "wchar": 0, "syscr": 0, "syscw": 0, "read_bytes": p["read_bytes"], "write_bytes": 0}
+            (root / str(pid) / "io").write_text("".join(f"{k}: {v}\n" for k, v in io.items()))
+        (root / str(pid) / "statm").write_text("100 10 3 1 0 5 0\n")
+    (root / "self").mkdir()
+
+
+def test_snapshot_reads_stat_io_and_statm(tmp_path) -> None:
+    root = tmp_path / "proc"
+    _write_proc(
+        root,
+        {
+            20: {"comm": "evil) 0 0 (x", "utime": 7, "starttime": 50, "rss": 3, "read_bytes": 100},
+            3: {"comm": "init", "utime": 1, "stime": 2, "starttime": 1},
+        },
+    )
+    sampler = ProcessSampler(str(root), statm=True)
+    snap = sampler.snapshot()
+    assert snap["pid"].tolist() == [3, 20]
+    assert snap.comm == ["init", "evil) 0 0 (x"]
+    assert snap["utime"].tolist() == [1, 7] and snap["stime"].tolist() == [2, 0]
+    assert snap["rss"].tolist() == [10 * sampler.page_size, 3 * sampler.page_size]
+    assert snap["read_bytes"].tolist() == [-1, 100]
+    assert snap["shared"].tolist() == [3 * sampler.page_size] * 2
+    assert "read_bytes" not in ProcessSampler(str(root), io=False).snapshot().columns
+
+
+def test_rates_match_processes_by_pid_and_starttime(tmp_path) -> None:
+    root = tmp_path / "proc"
+    sampler = ProcessSampler(str(root))
+    _write_proc(
+        root,
+        {
+            5: {"comm": "gone", "utime": 1, "starttime": 1},
+            10: {"comm": "busy", "utime": 100, "starttime": 2, "read_bytes": 1000},
+            20: {"comm": "old", "utime": 500, "starttime": 3, "read_bytes": 0},
+            30: {"comm": "secret", "utime": 0, "starttime": 4},
+        },
+    )
+    assert sampler.sample() is None
+    sampler.previous = dataclasses.replace(sampler.previous, monotonic=sampler.previous.monotonic - 2.0)
+    _write_proc(
+        root,
+        {
+            10: {"comm": "busy", "utime": 100 + sampler.ticks, "starttime": 2, "read_bytes": 5000},
+            20: {"comm": "new", "utime": 30, "starttime": 9, "read_bytes": 600},
+            30: {"comm": "secret", "utime": 0, "starttime": 4},
+            40: {"comm": "fresh", "utime": 0, "starttime": 10, "rss": 99},
+        },
+    )
+    rates = sampler.sample()
+    assert rates.interval == pytest.approx(2.0, abs=0.5)
+    assert rates.new.tolist() == [False, True, False, True]
+    cpu = rates.cpu * rates.interval
+    assert cpu.tolist() == pytest.approx([1.0, 30 / sampler.ticks, 0, 0])
+    read = rates["read_bytes_per_sec"] * rates.interval
+    assert read[:2].tolist() == pytest.approx([4000, 600])
+    assert math.isnan(read[2]) and math.isnan(read[3])
+
+    top = rates.top(2)
+    assert [p["pid"] for p in top] == [10, 20] and top[0]["comm"] == "busy"
+    assert [p["pid"] for p in rates.top(1, by="read_bytes_per_sec")] == [10]
+    assert [p["pid"] for p in rates.top(1, by="rss")] == [40]
+    assert rates.top(0) == []
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+from sysmaint.cleanup.delete import DeletionPipeline
+from sysmaint.cleanup.logrotate import LogRotator
+from sysmaint.cleanup.scanner import scan
+from sysmaint.cli import main
+from sysmaint.profiling import ProfileLog, phase, profile_job, read_profiles, run_profiled
+from sysmaint.scheduler import Interval, Scheduler
+
+
+def _phases(profile) -> list[str]:
+    return [record.name for record in profile.phases]
+
+
+def test_profile_counts_io_and_phases(tmp_path) -> None:
+    with profile_job("job") as profiler:
+        with phase("write"):
+            with open(tmp_path / "f", "wb") as f:
+                for _ in range(10):
+                    f.write(b"x" * 1000)
+                    f.flush()
+    profile = profiler.profile
+    assert profile.job == "job" and profile.scope == "thread"
+    assert profile.wchar >= 10_000 and profile.syscw >= 10
+    assert _phases(profile) == ["write"]
+    assert profile.phases[0].syscalls >= 10
+
+
+def test_phase_outside_a_profile_is_a_no_op() -> None:
+    with phase("nothing"):
+        pass
+
+
+def test_run_profiled_attaches_the_profile_to_errors() -> None:
+    def fail() -> None:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError) as info:
+        run_profiled("failing", None, fail)
+    assert info.value.profile.job == "failing"
+    result, profile = run_profiled("adding", None, lambda a, b: a + b, 1, b=2)
+    assert result == 3 and profile.wall >= 0
+
+
+def test_cleanup_paths_mark_phases(tmp_path) -> None:
+    (tmp_path / "d" / "sub").mkdir(parents=True)
+    for i in range(20):
+        (tmp_path / "d" / "sub" / f"f{i}").write_text("x")
+    (tmp_path / "app.log").write_text("line\n" * 100)
+    with profile_job("cleanup", scope="process") as profiler:
+        DeletionPipeline(prune_under=[str(tmp_path / "d")]).run(scan(str(tmp_path / "d")))
+        LogRotator(codec="gzip", delaycompress=False).rotate([str(tmp_path / "app.log")])
+    assert _phases(profiler.profile) == ["scan", "delete", "prune", "rotate", "postrotate", "compress"]
+    assert os.path.exists(tmp_path / "app.log.1.gz")
+
+
+def test_profile_log_round_trip(tmp_path) -> None:
+    log = ProfileLog(str(tmp_path / "jobs.jsonl"))
+    with profile_job("one") as profiler:
+        with phase("step"):
+            pass
+    log.write(profiler.profile, ok=True)
+    log.write(profiler.profile, ok=False)
+    records = list(read_profiles(log.path))
+    assert [r["ok"] for r in records] == [True, False]
+    assert records[0]["job"] == "one" and records[0]["phases"][0]["name"] == "step"
+
+
+def test_scheduler_writes_profiles(tmp_path) -> None:
+    log = ProfileLog(str(tmp_path / "jobs.jsonl"))
+    scheduler = Scheduler(profile_log=log)
+    scheduler.schedule("profiled", lambda: 1, Interval(3600), profile=True)
+    scheduler.schedule("plain", lambda: 2, Interval(3600))
+
+    async def run_both() -> None:
+        await scheduler.run_job("profiled")
+        await scheduler.run_job("plain")
+
+    asyncio.run(run_both())
+    records = list(read_profiles(log.path))
+    assert [(r["job"], r["lane"], r["ok"], r["attempts"]) for r in records] == [("profiled", "io", True, 1)]
+
+
+def test_cli_profile_log(tmp_path, capsys) -> None:
+    for i in range(5):
+        (tmp_path / "old" / f"f{i}").parent.mkdir(exist_ok=True)
+        (tmp_path / "old" / f"f{i}").write_text("x")
+        os.utime(tmp_path / "old" / f"f{i}", (0, 0))
+    log = str(tmp_path / "cli.jsonl")
+    assert main(["--profile-log", log, "clean", str(tmp_path / "old"), "--older-than", "1"]) == 0
+    (record,) = read_profiles(log)
+    assert record["job"] == "sysmaint clean" and record["scope"] == "process"
+    assert record["ok"] and record["status"] == 0
+    assert [p["name"] for p in record["phases"]] == ["scan", "delete"]
+    assert os.listdir(tmp_path / "old") == []
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.store import SeriesStore  # noqa: E402
+from sysmaint.reporting.aggregate import aggregate  # noqa: E402
+from sysmaint.reporting.cache import AggregateCache  # noqa: E402
+from sysmaint.reporting.render import Section, bucket_rows, job_rows, render, summary_rows  # noqa: E402
+
+
+def _sections() -> list[Section]:
+    return [
+        Section("Disks", ["name", "used"], iter([("sda|1", 0.5), ("<sdb>", float("nan"))]), text="a & b"),
+        Section("Empty", ["x"], iter(())),
+    ]
+
+
+def test_render_formats() -> None:
+    out = io.StringIO()
+    assert render(_sections(), out, title="T") == 2
+    text = out.getvalue()
+    assert text.startswith("# T\n") and "| sda\\|1 | 0.5 |" in text and "| <sdb> |  |" in text
+    assert "_No data._" in text
+
+    out = io.StringIO()
+    render(_sections(), out, format="html")
+    text = out.getvalue()
+    assert "<td>&lt;sdb&gt;</td>" in text and "<p>a &amp; b</p>" in text and text.endswith("</html>\n")
+
+    out = io.StringIO()
+    render(_sections(), out, format="csv")
+    assert out.getvalue() == "# Disks\nname,used\nsda|1,0.5\n<sdb>,\n\n# Empty\nx\n"
+    with pytest.raises(ValueError):
+        render([], io.StringIO(), format="pdf")
+
+
+@pytest.fixture
+def stores(tmp_path):
+    rng = np.random.default_rng(11)
+    stores = {}
+    for host in ("a", "b"):
+        ts = np.arange(0.0, 1000.0, 10.0)
+        counter = np.cumsum(rng.integers(0, 100, ts.size)).astype(float)
+        counter[60:] -= counter[60]  # a counter reset
+        load = rng.normal(size=ts.size)
+        load[::7] = np.nan
+        with SeriesStore(str(tmp_path / host), span=300) as store:
+            store.append_columns(ts, {"counter": counter, "load": load})
+        stores[host] = store
+    return stores
+
+
+def test_summary_rows_match_a_full_read(stores) -> None:
+    rows = list(summary_rows(stores, chunk_rows=7))
+    assert [(host, metric) for host, metric, *_ in rows] == [
+        ("a", "counter"),
+        ("a", "load"),
+        ("b", "counter"),
+        ("b", "load"),
+    ]
+    _, _, count, low, mean, high, last = rows[1]
+    load = stores["a"].read()[1]["load"]
+    valid = load[~np.isnan(load)]
+    assert count == valid.size
+    assert (low, high, last) == (valid.min(), valid.max(), valid[-1])
+    assert mean == pytest.approx(valid.mean())
+
+    cache = AggregateCache()
+    for _ in range(2):
+        cached = list(summary_rows(stores, ["load", "missing"], 0, 1000, cache=cache))
+        assert [row[:2] for row in cached] == [("a", "load"), ("a", "missing"), ("b", "load"), ("b", "missing")]
+        assert cached[0] == pytest.approx(rows[1])
+        assert cached[1][2] == 0
+    assert cache.hits == 6
+
+
+@pytest.mark.parametrize("transform", [None, "rate"])
+def test_bucket_rows_match_aggregate(stores, transform: str | None) -> None:
+    metric = "counter" if transform else "load"
+    series = {host: (ts, columns[metric]) for host, (ts, columns) in ((h, s.read()) for h, s in stores.items())}
+    expected = aggregate(series, bucket=100, reducer="p90", transform=transform)
+    for cache in (None, AggregateCache()):
+        for _ in range(2):
+            rows = list(
+                bucket_rows(stores, metric, bucket=100, reducer="p90", transform=transform, chunk_rows=7, cache=cache)
+            )
+            for host in stores:
+                values = [value for h, _, value in rows if h == host]
+                np.testing.assert_allclose(values, expected[host][1])
+    assert cache.hits
+
+
+def test_job_rows() -> None:
+    records = [
+        {"job": "scan", "started": 10, "wall": 2.0, "cpu_user": 1.0, "cpu_system": 0.5, "peak_rss": 10},
+        {"job": "scan", "started": 20, "wall": 4.0, "peak_rss": 30, "read_bytes": 7},
+        {"job": "old", "started": 1, "wall": 1.0},
+    ]
+    assert list(job_rows(records, start=5)) == [("scan", 2, 6.0, 3.0, 1.5, 30, 7, 0)]
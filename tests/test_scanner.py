@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from sysmaint.cleanup.scanner import ParallelScanner, older_than, scan
+
+
+def _files(root, names) -> None:
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+
+
+def _found(entries, root) -> list[str]:
+    return sorted(os.path.relpath(e.path, root) for e in entries)
+
+
+def test_scan_finds_every_regular_file(tmp_path) -> None:
+    _files(tmp_path, ["a", "d/b", "d/e/c", "d/e/f/g"])
+    os.symlink(tmp_path / "a", tmp_path / "link")
+    os.mkfifo(tmp_path / "fifo")
+    assert _found(scan(str(tmp_path), workers=3), tmp_path) == ["a", "d/b", "d/e/c", "d/e/f/g"]
+
+
+@pytest.mark.parametrize("empty_roots", [1, 30])
+def test_scan_keeps_roots_after_one_finishes(tmp_path, empty_roots) -> None:
+    # An empty root can be walked before the next root is submitted; the
+    # scan must still cover the remaining roots.
+    roots = []
+    for i in range(empty_roots):
+        (tmp_path / f"empty{i}").mkdir()
+        roots.append(str(tmp_path / f"empty{i}"))
+    _files(tmp_path, [f"big/f{i}" for i in range(200)])
+    roots.append(str(tmp_path / "big"))
+    for _ in range(20):
+        assert len(list(scan(roots, workers=1))) == 200
+
+
+def test_missing_root_is_reported_and_skipped(tmp_path) -> None:
+    _files(tmp_path, ["here/a"])
+    errors: list[OSError] = []
+    entries = scan([str(tmp_path / "gone"), str(tmp_path / "here")], on_error=errors.append)
+    assert _found(entries, tmp_path) == ["here/a"]
+    assert [e.filename for e in errors] == [str(tmp_path / "gone")]
+
+
+def test_predicate_and_skip_dir(tmp_path) -> None:
+    _files(tmp_path, ["old", "new", "cache/old", "keep/old"])
+    past = time.time() - 10 * 86400
+    for name in ("old", "cache/old", "keep/old"):
+        os.utime(tmp_path / name, (past, past))
+    scanner = ParallelScanner(predicate=older_than(86400), skip_dir=lambda path: path.endswith("/cache"))
+    assert _found(scanner.scan(str(tmp_path)), tmp_path) == ["keep/old", "old"]
+
+
+def test_closing_early_stops_the_scan(tmp_path) -> None:
+    _files(tmp_path, [f"d{i}/f{j}" for i in range(20) for j in range(20)])
+    entries = ParallelScanner(workers=4, batch_size=1, queue_size=1).scan(str(tmp_path))
+    assert next(entries)
+    entries.close()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import time
+
+import pytest
+
+from sysmaint.scheduler import Cron, Interval, Job, Scheduler
+
+
+def _ts(*args: int) -> float:
+    return dt.datetime(*args).timestamp()
+
+
+def _local(ts: float) -> dt.datetime:
+    return dt.datetime.fromtimestamp(ts)
+
+
+def test_interval_is_aligned_to_its_anchor() -> None:
+    trigger = Interval(60, anchor=10)
+    assert trigger.next_after(10) == 70
+    assert trigger.next_after(69.5) == 70
+    assert trigger.next_after(70) == 130
+    with pytest.raises(ValueError):
+        Interval(0)
+
+
+def test_cron_fields() -> None:
+    assert _local(Cron("*/15 * * * *").next_after(_ts(2026, 3, 1, 10, 7))) == dt.datetime(2026, 3, 1, 10, 15)
+    assert _local(Cron("30 2 * * *").next_after(_ts(2026, 3, 1, 2, 30))) == dt.datetime(2026, 3, 2, 2, 30)
+    assert _local(Cron("0 0 1 jan *").next_after(_ts(2026, 3, 1))) == dt.datetime(2027, 1, 1)
+    assert _local(Cron("@monthly").next_after(_ts(2026, 1, 31, 12))) == dt.datetime(2026, 2, 1)
+    # 7 is Sunday as well as 0; 2026-03-01 is a Sunday.
+    assert _local(Cron("0 9 * * 7").next_after(_ts(2026, 2, 27))) == dt.datetime(2026, 3, 1, 9)
+
+
+def test_cron_day_fields_combine_with_or() -> None:
+    # The 13th of any month, or any Friday; 2026-03-06 is a Friday.
+    cron = Cron("0 0 13 * fri")
+    assert _local(cron.next_after(_ts(2026, 3, 1))) == dt.datetime(2026, 3, 6)
+    assert _local(cron.next_after(_ts(2026, 3, 10))) == dt.datetime(2026, 3, 13)
+    assert _local(cron.next_after(_ts(2026, 3, 13))) == dt.datetime(2026, 3, 20)
+    # With one day field unrestricted, the other alone decides.
+    assert _local(Cron("0 0 * * fri").next_after(_ts(2026, 3, 10))) == dt.datetime(2026, 3, 13)
+    assert _local(Cron("0 0 13 * *").next_after(_ts(2026, 3, 1))) == dt.datetime(2026, 3, 13)
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* * 0 * *", "*/0 * * * *", "0 0 30 2 *"])
+def test_invalid_cron_expressions(expr: str) -> None:
+    with pytest.raises(ValueError):
+        Cron(expr).next_after(0)
+
+
+def test_failed_runs_are_retried() -> None:
+    calls = []
+
+    def flaky() -> str:
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise OSError("busy")
+        return "done"
+
+    scheduler = Scheduler()
+    scheduler.schedule("flaky", flaky, Interval(3600), retries=2, backoff=0.01)
+    run = asyncio.run(scheduler.run_job("flaky"))
+    assert (run.ok, run.attempts, run.result) == (True, 3, "done")
+
+    calls.clear()
+    scheduler.add(Job("hopeless", flaky, Interval(3600), retries=1, backoff=0.01))
+    run = asyncio.run(scheduler.run_job("hopeless"))
+    assert (run.ok, run.attempts, run.error) == (False, 2, "OSError: busy")
+    assert list(scheduler.history)[-1] is run
+
+
+def test_timeout_fails_the_attempt() -> None:
+    async def slow() -> None:
+        await asyncio.sleep(10)
+
+    scheduler = Scheduler()
+    scheduler.schedule("slow", slow, Interval(3600), timeout=0.05)
+    run = asyncio.run(scheduler.run_job("slow"))
+    assert not run.ok and run.error == "TimeoutError"
+
+
+def test_lanes_are_isolated() -> None:
+    async def scenario() -> tuple[float, int]:
+        scheduler = Scheduler({"slow": 1, "fast": 4})
+        release = asyncio.Event()
+        running = peak = 0
+
+        async def blocked() -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+
+        async def quick() -> str:
+            return "ok"
+
+        scheduler.schedule("blocked1", blocked, Interval(3600), lane="slow")
+        scheduler.schedule("blocked2", blocked, Interval(3600), lane="slow")
+        scheduler.schedule("quick", quick, Interval(3600), lane="fast")
+        slow = [asyncio.create_task(scheduler.run_job(name)) for name in ("blocked1", "blocked2")]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        run = await scheduler.run_job("quick")
+        waited = time.perf_counter() - started
+        assert run.ok
+        release.set()
+        await asyncio.gather(*slow)
+        return waited, peak
+
+    waited, peak = asyncio.run(scenario())
+    assert waited < 0.5
+    # The slow lane's limit of one kept its two jobs from overlapping.
+    assert peak == 1
+
+
+def test_unknown_lane_and_duplicate_names() -> None:
+    scheduler = Scheduler()
+    with pytest.raises(ValueError):
+        scheduler.schedule("job", print, Interval(1), lane="nope")
+    scheduler.schedule("job", print, Interval(1))
+    with pytest.raises(ValueError):
+        scheduler.schedule("job", print, Interval(1))
+
+
+def test_firing_is_skipped_while_the_previous_run_is_going() -> None:
+    async def scenario() -> tuple[int, int]:
+        scheduler = Scheduler()
+        running = peak = 0
+
+        async def long_job() -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.25)
+            running -= 1
+
+        scheduler.schedule("long", long_job, Interval(0.05), run_at_start=True)
+        runner = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.6)
+        scheduler.stop()
+        await runner
+        return len(scheduler.history), peak
+
+    runs, peak = asyncio.run(scenario())
+    assert peak == 1
+    assert 2 <= runs <= 4
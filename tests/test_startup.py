@@ -0,0 +1,27 @@
+"""The ``sysmaint status`` cold start stays within its budget.
+
+Wall time is mostly interpreter start-up and swings with the machine, so the
+test holds what this project adds: the ``-X importtime`` total of the
+``sysmaint`` modules, and no heavy module imported at all.
+``python -m benchmarks.startup`` checks the wall-clock budget.
+"""
+
+from __future__ import annotations
+
+import compileall
+import os
+
+import sysmaint
+from benchmarks import startup
+
+IMPORT_BUDGET_MS = 25.0
+
+
+def test_status_imports_within_budget() -> None:
+    # Installed copies run from bytecode; do not time a recompile of sources
+    # edited since the last import (with PYTHONDONTWRITEBYTECODE nothing
+    # else would refresh it).
+    compileall.compile_dir(os.path.dirname(sysmaint.__file__), quiet=1)
+    result = startup.run(runs=5)
+    assert result["forbidden"] == []
+    assert result["sysmaint_import_ms"] <= IMPORT_BUDGET_MS, result
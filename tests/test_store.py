@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import math
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.store import SeriesStore  # noqa: E402
+
+
+def test_append_read_and_backfill(tmp_path) -> None:
+    with SeriesStore(str(tmp_path), span=100, flush_rows=2) as store:
+        store.append(10, {"a": 1})
+        store.append(11, {"a": 2})
+        store.append(12, {"a": 3, "b": 30})
+        store.append(13, {"b": 40})
+        with pytest.raises(ValueError):
+            store.append(5, {"a": 0})
+
+    store = SeriesStore(str(tmp_path), span=100)
+    assert store.last_timestamp == 13
+    ts, columns = store.read()
+    assert ts.tolist() == [10, 11, 12, 13]
+    assert columns["a"][:3].tolist() == [1, 2, 3] and math.isnan(columns["a"][3])
+    assert np.isnan(columns["b"][:2]).all() and columns["b"][2:].tolist() == [30, 40]
+    ts, columns = store.read(11, 13, metrics=["a"])
+    assert ts.tolist() == [11, 12] and columns["a"].tolist() == [2, 3]
+
+
+def test_later_span_seals_the_previous_segment(tmp_path) -> None:
+    with SeriesStore(str(tmp_path), span=100) as store:
+        store.append_columns(np.array([10.0, 50.0, 120.0, 150.0]), {"a": np.array([1.0, 2.0, 3.0, 4.0])})
+        first, second = store.segments()
+        assert (first.start, first.sealed, second.sealed) == (0, True, False)
+        assert first.checksum
+        assert [seg.start for seg in store.segments(100, 200)] == [100]
+        with pytest.raises(ValueError):
+            store.append_columns(np.array([140.0]), {"a": np.array([0.0])})
+
+
+def test_writer_trims_columns_left_by_a_crash(tmp_path) -> None:
+    with SeriesStore(str(tmp_path), span=100) as store:
+        store.append_columns(np.array([1.0, 2.0]), {"a": np.array([1.0, 2.0])})
+    [seg] = SeriesStore(str(tmp_path), span=100).segments()
+    # A flush that wrote the metric column but died before the timestamps.
+    with open(os.path.join(seg.path, seg.meta["columns"]["a"]), "ab") as f:
+        f.write(np.array([99.0]).tobytes())
+    assert SeriesStore(str(tmp_path), span=100).read()[1]["a"].tolist() == [1, 2]
+
+    with SeriesStore(str(tmp_path), span=100) as store:
+        store.append(3, {"a": 3})
+    assert SeriesStore(str(tmp_path), span=100).read()[1]["a"].tolist() == [1, 2, 3]
+
+
+def test_compact_rolls_up_sealed_segments(tmp_path) -> None:
+    with SeriesStore(str(tmp_path), span=120) as store:
+        store.append_columns(np.arange(0.0, 120.0, 30.0), {"a": np.array([1.0, 3.0, np.nan, 8.0])})
+        store.append(130, {"a": 0})
+        store.flush()
+        assert store.compact(resolutions=[60]) == ["seg-000000000000"]
+        assert store.compact(resolutions=[60]) == []
+
+        ts, columns = store.rollup(60).read()
+    assert ts.tolist() == [0, 60]
+    assert columns["a:min"].tolist() == [1, 8]
+    assert columns["a:max"].tolist() == [3, 8]
+    assert columns["a:avg"].tolist() == [2, 8]
+    assert columns["a:count"].tolist() == [2, 1]
+    with pytest.raises(ValueError):
+        SeriesStore(str(tmp_path), span=120).compact(resolutions=[7])
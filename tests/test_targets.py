@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sys
+
+from sysmaint.cleanup.targets import CommandTarget, DirectoryTarget
+
+
+def _fill(root, count: int) -> None:
+    root.mkdir(parents=True)
+    for i in range(count):
+        (root / f"f{i}").write_bytes(b"x" * 100)
+
+
+def test_directory_target_covers_every_root(tmp_path) -> None:
+    _fill(tmp_path / "a", 0)
+    _fill(tmp_path / "b", 250)
+    _fill(tmp_path / "c", 250)
+    target = DirectoryTarget("t", [str(tmp_path / name) for name in "abc"], workers=1)
+    for _ in range(20):
+        result = target.run(dry_run=True)
+        assert (result.files, result.bytes) == (500, 50_000)
+    result = target.run()
+    assert result.ok and result.files == 500
+    assert [list(path.iterdir()) for path in (tmp_path / "b", tmp_path / "c")] == [[], []]
+
+
+def test_command_target_measures_every_root(tmp_path) -> None:
+    _fill(tmp_path / "empty", 0)
+    _fill(tmp_path / "cache", 50)
+    script = f"import shutil; shutil.rmtree({str(tmp_path / 'cache')!r})"
+    measure = [str(tmp_path / "empty"), str(tmp_path / "cache")]
+    target = CommandTarget("t", [sys.executable, "-c", script], measure=measure)
+    result = target.run()
+    assert result.ok
+    assert result.bytes > 0
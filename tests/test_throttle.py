@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+from sysmaint.cleanup.throttle import AdaptiveThrottle, DeviceLoad, TokenBucket, device_names
+
+
+def test_token_bucket_refills_and_goes_into_debt() -> None:
+    now = [0.0]
+    slept = []
+    bucket = TokenBucket(10, burst=5, clock=lambda: now[0], sleep=slept.append)
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert bucket.acquire() == pytest.approx(0.1)
+    now[0] += 10.0  # idle time refills only up to the burst
+    assert bucket.acquire(5) == 0.0
+    assert bucket.acquire(20) == pytest.approx(2.0)
+    assert slept == pytest.approx([0.1, 2.0])
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_aimd_limit() -> None:
+    throttle = AdaptiveThrottle(min_workers=1, max_workers=4, initial=4, target_latency_ms=20)
+    assert throttle.update(DeviceLoad(latency_ms=50)) == 2
+    assert throttle.update(DeviceLoad(util=0.95)) == 1
+    assert throttle.update(DeviceLoad(latency_ms=50)) == 1
+    assert throttle.backoffs == 2
+    assert [throttle.update(DeviceLoad(latency_ms=5)) for _ in range(4)] == [2, 3, 4, 4]
+    with pytest.raises(ValueError):
+        AdaptiveThrottle(min_workers=3, max_workers=2)
+
+
+def test_load_is_the_worst_watched_device() -> None:
+    def stats(**devices: tuple[int, ...]) -> dict[str, int]:
+        fields = ("reads", "writes", "read_ms", "write_ms", "io_ms", "weighted_io_ms")
+        return {f"disk.{dev}.{f}": v for dev, values in devices.items() for f, v in zip(fields, values)}
+
+    before = stats(sda=(0,) * 6, sdb=(0,) * 6)
+    after = stats(sda=(10, 10, 100, 300, 500, 2000), sdb=(1, 0, 90, 0, 900, 900))
+    load = AdaptiveThrottle()._load(before, after, 1.0)
+    assert (load.latency_ms, load.util, load.queue) == (90.0, 0.9, 2.0)
+    load = AdaptiveThrottle(["sda", "nvme0n1"])._load(before, after, 1.0)
+    assert (load.latency_ms, load.util, load.queue) == (20.0, 0.5, 2.0)
+
+
+def test_slots_never_exceed_the_limit() -> None:
+    throttle = AdaptiveThrottle(max_workers=4, initial=2)
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def work() -> None:
+        with throttle.slot():
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active == [0, 2]
+
+
+def test_device_names_resolve_partitions_to_disks(tmp_path) -> None:
+    st = os.stat(tmp_path)
+    sysfs = tmp_path / "sys"
+    part = sysfs / "devices" / "block" / "sdz" / "sdz1"
+    part.mkdir(parents=True)
+    (part / "partition").write_text("1\n")
+    (sysfs / "dev" / "block").mkdir(parents=True)
+    os.symlink(part, sysfs / "dev" / "block" / f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}")
+    assert device_names([str(tmp_path), str(tmp_path / "missing")], sysfs=str(sysfs)) == ["sdz"]
+    assert device_names([str(tmp_path)], sysfs=str(tmp_path / "empty")) == []
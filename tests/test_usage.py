@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+
+from sysmaint.cleanup.usage import UsageTree
+
+
+def _write(path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _tree(root) -> UsageTree:
+    _write(root / "a" / "one", 100)
+    _write(root / "a" / "b" / "two", 200)
+    _write(root / "c" / "three", 400)
+    tree = UsageTree(apparent=True)
+    tree.scan(str(root), workers=2)
+    return tree
+
+
+def test_totals_and_largest(tmp_path) -> None:
+    tree = _tree(tmp_path)
+    assert tree.usage(str(tmp_path)) == (700, 3)
+    assert tree.usage(str(tmp_path / "a")) == (300, 2)
+    assert tree.largest(2, under=str(tmp_path)) == [(str(tmp_path / "c"), 400), (str(tmp_path / "a"), 300)]
+    # Ancestors of the root are tracked too.
+    assert tree.usage(os.path.dirname(tmp_path))[0] == 700
+
+
+def test_refresh_applies_changes(tmp_path) -> None:
+    tree = _tree(tmp_path)
+    _write(tmp_path / "a" / "new", 50)
+    _write(tmp_path / "a" / "d" / "e" / "deep", 1000)
+    os.unlink(tmp_path / "c" / "three")
+    tree.refresh([str(tmp_path / "a"), str(tmp_path / "c")])
+    assert tree.usage(str(tmp_path)) == (1350, 4)
+    assert tree.usage(str(tmp_path / "a" / "d")) == (1000, 1)
+    os.unlink(tmp_path / "a" / "d" / "e" / "deep")
+    os.rmdir(tmp_path / "a" / "d" / "e")
+    os.rmdir(tmp_path / "a" / "d")
+    tree.refresh([str(tmp_path / "a")])
+    assert tree.usage(str(tmp_path)) == (350, 3)
+    assert str(tmp_path / "a" / "d") not in tree
+
+
+def test_empty_directories_are_not_rescanned(tmp_path, monkeypatch) -> None:
+    tree = _tree(tmp_path)
+    (tmp_path / "a" / "empty").mkdir()
+    scanned: list[list[str]] = []
+    scan = tree.scan
+
+    def recording_scan(roots, **options) -> None:
+        scanned.append(list(roots))
+        scan(roots, **options)
+
+    monkeypatch.setattr(tree, "scan", recording_scan)
+    tree.refresh([str(tmp_path / "a")])
+    assert scanned == [[str(tmp_path / "a" / "empty")]]
+    assert str(tmp_path / "a" / "empty") in tree
+    tree.refresh([str(tmp_path / "a")])
+    assert len(scanned) == 1
+    assert tree.usage(str(tmp_path)) == (700, 3)
+
+
+def test_save_and_load(tmp_path) -> None:
+    tree = _tree(tmp_path / "root")
+    db = str(tmp_path / "usage.db")
+    tree.save(db)
+    loaded = UsageTree.load(db)
+    assert loaded.apparent
+    assert len(loaded) == len(tree)
+    for path in ("root", "root/a", "root/a/b", "root/c"):
+        assert loaded.usage(str(tmp_path / path)) == tree.usage(str(tmp_path / path))
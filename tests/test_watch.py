@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+from sysmaint.watch import ChangeFeed
+
+
+def _kernel_watches(fd: int) -> int:
+    with open(f"/proc/self/fdinfo/{fd}") as f:
+        return sum(line.startswith("inotify") for line in f)
+
+
+def test_watches_of_removed_directories_are_dropped(tmp_path) -> None:
+    root, outside = tmp_path / "root", tmp_path / "outside"
+    root.mkdir()
+    outside.mkdir()
+    with ChangeFeed(str(root)) as feed:
+        for i in range(10):
+            (root / f"d{i}" / "sub").mkdir(parents=True)
+            feed.poll(0.05)
+            if i % 2:
+                shutil.rmtree(root / f"d{i}")
+            else:
+                os.rename(root / f"d{i}", outside / f"d{i}")
+            feed.poll(0.05)
+        assert feed.watches == _kernel_watches(feed.fileno()) == 1
+
+
+def test_removing_a_subtree_drops_only_its_watches(tmp_path) -> None:
+    root = tmp_path / "root"
+    for i in range(50):
+        (root / f"a{i % 5}" / f"b{i}" / "c").mkdir(parents=True)
+    with ChangeFeed(str(root)) as feed:
+        assert feed.watches == 1 + 5 + 50 + 50
+        shutil.rmtree(root / "a0")
+        os.rename(root / "a1", tmp_path / "a1")
+        while feed.poll(0.1):
+            pass
+        assert feed.watches == _kernel_watches(feed.fileno()) == 1 + 3 + 30 + 30
+        # A directory created where a removed one was is watched afresh.
+        (root / "a0" / "new").mkdir(parents=True)
+        batch = feed.poll(0.1)
+        assert str(root / "a0" / "new") in batch.dirs
+        assert feed.watches == 1 + 3 + 30 + 30 + 2
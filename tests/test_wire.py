@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sysmaint.monitoring.wire import decode_batch, encode_batch, encode_samples  # noqa: E402
+
+
+def test_round_trip_keeps_every_bit() -> None:
+    rng = np.random.default_rng(7)
+    ts = 1_700_000_000 + np.arange(200) * 10.0
+    ts[50] += 0.125
+    counter = np.cumsum(rng.integers(0, 5000, 200)).astype(float)
+    gauge = rng.normal(50, 10, 200)
+    gauge[[3, 4, 5]] = gauge[2]
+    gauge[10] = np.nan
+    negative = -counter
+
+    data = encode_batch(ts, {"counter": counter, "gauge": gauge, "negative": negative})
+    decoded_ts, columns = decode_batch(data)
+    assert decoded_ts.tolist() == ts.tolist()
+    assert list(columns) == ["counter", "gauge", "negative"]
+    assert columns["counter"].tolist() == counter.tolist()
+    assert columns["negative"].tolist() == negative.tolist()
+    assert columns["gauge"].view(np.uint64).tolist() == gauge.view(np.uint64).tolist()
+    # Fixed-interval timestamps and small counter steps stay compact.
+    assert len(data) < 200 * (1 + 3 + 8 + 3)
+
+
+def test_empty_and_single_row_batches() -> None:
+    ts, columns = decode_batch(encode_batch([], {"a": []}))
+    assert ts.tolist() == [] and columns["a"].tolist() == []
+    ts, columns = decode_batch(encode_batch([5.5], {"a": [0.1], "b": [3]}))
+    assert ts.tolist() == [5.5] and columns["a"].tolist() == [0.1] and columns["b"].tolist() == [3]
+
+
+def test_encode_samples_fills_missing_metrics() -> None:
+    ts, columns = decode_batch(encode_samples([(1.0, {"a": 1.0}), (2.0, {"a": 2.0, "b": 0.5})]))
+    assert ts.tolist() == [1, 2]
+    assert columns["a"].tolist() == [1, 2]
+    assert math.isnan(columns["b"][0]) and columns["b"][1] == 0.5
+
+
+def test_rejects_malformed_input() -> None:
+    with pytest.raises(ValueError):
+        encode_batch([1.0, 2.0], {"a": [1.0]})
+    with pytest.raises(ValueError):
+        decode_batch(b"XYZ\x01")
+    with pytest.raises(ValueError):
+        decode_batch(b"SMW\x09")